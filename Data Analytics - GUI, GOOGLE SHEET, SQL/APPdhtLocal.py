@@ -2,256 +2,38 @@
 # Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
 # this is code for dht11 sensor GUI APP. The app includes sensor reading, send data to local database and to google sheets, and realtime data analytics.
 
+import time
+STARTED = time.monotonic()  # to report the startup time
+
 #import for design
 import sys
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter.constants import *
 import os.path
-from PIL import Image, ImageTk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 
 #import libraries for basic user interface and data handling
-import requests
-import json
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.dates import DateFormatter
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from collections import deque
+from datetime import datetime
 import sqlite3
-
-#import for DHT11
-import RPi.GPIO as GPIO
-import dht11
-import time
-
-#import to connect to google sheets
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-import numpy as np
-
-# Initialize GPIO to read at pin 4
-GPIO.setwarnings(True)
-GPIO.setmode(GPIO.BCM)
-instance = dht11.DHT11(pin=4)
-    
-#----------------------------------------------------------------------------
-# Google Sheets setup: functions to manage data in google sheets
-#----------------------------------------------------------------------------
-
-# Create a service object for interacting with Google Sheets API
-def get_service():
-    # Load credentials from the service account file
-    creds = service_account.Credentials.from_service_account_file(
-        "mydata.json", # Path to your service account credentials file
-        scopes=["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    )
-
-    # Build the Sheets API service object using the credentials
-    service = build('sheets', 'v4', credentials=creds)
-    return service
-
-
-# Function to create a new sheet in the spreadsheet if it doesn't already exist
-def create_sheet_if_not_exists(service, spreadsheet_id, sheet_name):
-    try:
-        # Get metadata of the spreadsheet to check for existing sheets
-        sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = sheet_metadata.get('sheets', [])
-        sheet_names = [sheet['properties']['title'] for sheet in sheets]
-
-        # If the specified sheet name does not exist, create it
-        if sheet_name not in sheet_names:
-            requests = [{
-                "addSheet": {
-                    "properties": {
-                        "title": sheet_name
-                    }
-                }
-            }]
-            body = {
-                'requests': requests
-            }
-
-            # Send the batchUpdate request to create the sheet
-            service.spreadsheets().batchUpdate(
-                spreadsheetId=spreadsheet_id,
-                body=body
-            ).execute()
-            print(f"Sheet '{sheet_name}' created.")
-        else:
-            print(f"Sheet '{sheet_name}' already exists.")
-    except Exception as e:
-        print(f"Failed to create sheet: {str(e)}")
-
-
-# Function to ensure that the specified sheet has the correct header row
-def ensure_sheet_header(service, spreadsheet_id, sheet_name, header):
-    try:
-        # Retrieve the first row (header) from the specified sheet
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=f"{sheet_name}!A1:Z1"
-        ).execute()
-        values = result.get('values', [])
-
-        # If the header row is empty, update it with the provided header
-        if not values:  
-            body = {"values": [header]} # The header to insert
-            service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!A1:Z1",
-                valueInputOption="USER_ENTERED",  # Insert the values as entered by the user
-                body=body
-            ).execute()
-            print(f"Header created in '{sheet_name}' sheet.")
-        else:
-            print(f"Header already exists in '{sheet_name}' sheet.")
-    except Exception as e:
-        print(f"Failed to ensure header in '{sheet_name}' sheet: {str(e)}")
-
-
-# Function to log data to a Google Sheets sheet
-def log_to_gsheet(service, spreadsheet_id, sheet_name, values):
-    try:
-        # Prepare the data to be appended to the sheet
-        body = {
-            "values": [values]
-        }
-        
-        # Append the data to the next available row in column A
-        service.spreadsheets().values().append(
-            spreadsheetId=spreadsheet_id,
-            range=f"{sheet_name}!A:A",  # Append data to the next available row in column A
-            valueInputOption="USER_ENTERED",
-            body=body
-        ).execute()
-        print(f"Data logged to sheet: {sheet_name}")
-    except Exception as e:
-        if "RATE_LIMIT_EXCEEDED" in str(e):
-            print("Rate limit exceeded. Retrying after a short delay...")
-            time.sleep(10)  # Wait for 10 seconds before retrying
-            log_to_gsheet(service, spreadsheet_id, sheet_name, values) # Retry logging data
-        else:
-            print(f"Failed to log data: {str(e)}")
-
-
-# Function to retrieve data from a Google Sheets sheet
-def get_data_from_sheet(service, spreadsheet_id, sheet_name):
-    try:
-        # Retrieve all data from the specified sheet
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=f"{sheet_name}"
-        ).execute()
-        return result.get('values', [])
-    except Exception as e:
-        print(f"Failed to get data from sheet: {str(e)}")
-        return []
-
-
-# Function to clear all data from a Google Sheets sheet
-def clear_sheet(service, spreadsheet_id, sheet_name):
-    try:
-        service.spreadsheets().values().clear(
-            spreadsheetId=spreadsheet_id,
-            range=f"{sheet_name}!A1:Z1000",
-            body={}
-        ).execute()
-        print(f"Data cleared from sheet: {sheet_name}")
-    except Exception as e:
-        if "RATE_LIMIT_EXCEEDED" in str(e):
-            print("Rate limit exceeded. Retrying after a short delay...")
-            time.sleep(10)  # Wait for 10 seconds before retrying
-            clear_sheet(service, spreadsheet_id, sheet_name)
-        else:
-            print(f"Failed to clear data from sheet: {str(e)}")
-
-
-# Function to summarize data from a Google Sheets sheet
-def summarize_data(data):
-    numeric_data = []
-
-    # Process each row of data, converting valid numerical values and ignoring invalid ones
-    for row in data:
-        numeric_row = []
-        for cell in row[1:]:  # Skip the timestamp
-            try:
-                numeric_row.append(float(cell)) # Convert cell data to float
-            except ValueError:
-                continue # Skip non-numeric values
-        if numeric_row:
-            numeric_data.append(numeric_row)
-
-    # Convert the collected numerical data to a NumPy array for easier processing
-    numeric_array = np.array(numeric_data, dtype=float) if numeric_data else np.array([])
-
-    # If the array is empty, return an empty list
-    if numeric_array.size == 0:
-        return []
-
-    # Calculate mean, minimum, and maximum values for each column
-    mean_values = np.mean(numeric_array, axis=0).tolist()
-    min_values = np.min(numeric_array, axis=0).tolist()
-    max_values = np.max(numeric_array, axis=0).tolist()
+import threading
+from aggregates import WindowAggregator
+from scheduler import StageTimer, report_startup
+from historyview import HistoryPager, HistoryTable
+from sensors import sensor_ids
+from alerts import FIRED, read_active_alerts
+
+# PIL, matplotlib and numpy are slow to import (seconds on a Pi), so they are imported after the
+# window is shown (see load_logo and create_graph). The sensor, database and google sheets part
+# is in collector.py (it is imported in the main part below; the viewer only takes its settings)
+
+# Graph and labels refreshes per second (the sensor is read every 2 seconds by the collector)
+FRAME_RATE = 1.0
+
+# Viewer mode: most RawHistory rows read from sensors.db per frame
+VIEWER_POLL_ROWS = 1000
     
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    return [timestamp] + mean_values + min_values + max_values # Return the summary data
-
-
-# Function to trim the 'RawHistory' sheet if it exceeds a certain number of rows
-def check_and_trim_rawhistory(service, spreadsheet_id, sheet_name, max_rows=200):
-    try:
-        # Get sheet metadata
-        sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = sheet_metadata.get('sheets', [])
-        sheet_id = None
-
-        # Find the sheet ID for the specified sheet name
-        for sheet in sheets:
-            if sheet['properties']['title'] == sheet_name:
-                sheet_id = sheet['properties']['sheetId']
-                break
-
-        if sheet_id is None:
-            print(f"Sheet ID for '{sheet_name}' not found.")
-            return
-
-        # Retrieve all rows from the sheet
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=f"{sheet_name}"
-        ).execute()
-        rows = result.get('values', [])
-
-        # If the number of rows exceeds the maximum, trim the sheet
-        if len(rows) > max_rows:
-            # Calculate how many rows to delete
-            rows_to_delete = len(rows) - max_rows + 20
-            print(f"Trimming {rows_to_delete} rows from {sheet_name} sheet")
-
-            # Create a batch request to delete rows from the top (excluding the header row)
-            batch_request = [{
-                "deleteDimension": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "dimension": "ROWS",
-                        "startIndex": 1,  # Skip the header row
-                        "endIndex": 1 + rows_to_delete # Specify the range of rows to delete
-                    }
-                }
-            }]
-
-            # Send the batchUpdate request to delete the rows
-            body = {'requests': batch_request}
-            service.spreadsheets().batchUpdate(
-                spreadsheetId=spreadsheet_id,
-                body=body
-            ).execute()
-            print(f"Trimmed {rows_to_delete} rows from {sheet_name} sheet")
-    except Exception as e:
-        print(f"Failed to trim data from {sheet_name}: {str(e)}")
-
 #----------------------------------------------------------------------------------
 
 
@@ -286,9 +68,6 @@ class BaseToplevel:
         #Initialize the main window
         self.top = top
         
-        #self.original_image = original_image
-        self.original_image = Image.open(os.path.join(os.path.dirname(__file__), 'asd.jpg')) 
-
         
         top.geometry("812x574+340+107")# Set window size and position
         top.minsize(120, 1) # Set minimum size for the window
@@ -330,23 +109,31 @@ class BaseToplevel:
         self.Frame1.configure(highlightcolor="Black")
         self.Frame1.configure(background="#090033")
         
-        # Add the image to TFrame1 and Frame 1
-        self.original_image = Image.open(os.path.join(os.path.dirname(__file__), 'asd.jpg')) 
-        self.logo_photo = ImageTk.PhotoImage(self.original_image)
+        # Add the image to TFrame1 and Frame 1 (the image is loaded when the window is shown)
+        self.original_image = None
        
-        self.label_logo_1 = tk.Label(self.TFrame1, image=self.logo_photo)
-        self.label_logo_1.image = self.logo_photo  # Keep a reference to the image
+        self.label_logo_1 = tk.Label(self.TFrame1)
         self.label_logo_1.pack(expand=True)
         
-        self.label_logo_2 = tk.Label(self.Frame1, image=self.logo_photo)
-        self.label_logo_2.image = self.logo_photo  # Keep a reference to the image
+        self.label_logo_2 = tk.Label(self.Frame1)
         self.label_logo_2.pack(expand=True)
         # Bind the frame's configure event to resize the image dynamically with window resizing
         self.Frame1.bind("<Configure>", self.resize_image)
+        self.top.after_idle(self.load_logo)
 
         #---------------------------------------------------------------------- 
+
+    def load_logo(self):
+        # Load the logo and show it at the size of the frames
+        from PIL import Image
+        self.original_image = Image.open(os.path.join(os.path.dirname(__file__), 'asd.jpg')) 
+        self.resize_image(None)
         
     def resize_image(self, event):
+        if self.original_image is None:  # Not loaded yet
+            return
+        from PIL import Image, ImageTk
+
         # Resize the image to fit the Frame1 dimensions
         frame_width = self.Frame1.winfo_width()
         frame_height = self.Frame1.winfo_height()
@@ -362,11 +149,15 @@ class BaseToplevel:
             self.label_logo_2.image = self.logo_photo  # Keep a reference to the image
 
 # This class defines additional GUI elements for the main application window (page1)
+# collector is the Collector that reads the sensor, or None to only show the data of sensors.db.
+# compression is the CompressionPolicy of the collector (see compression.py), None if every
+# reading is saved: the graphs use it to rebuild the series from the saved readings
 class Toplevel1(BaseToplevel):
-    def __init__(self, top=None):
+    def __init__(self, top=None, collector=None, db_path='sensors.db', compression=None):
         super().__init__(top)
         self.top = top
         top.title("DHT11")
+        self.compression = compression
 
         #####FRAME to display statistics---------------------------
         self.Frame3 = tk.Frame(self.top)
@@ -512,38 +303,119 @@ class Toplevel1(BaseToplevel):
         self.Button4.configure(text='''History''')
         self.Button4.configure(command=self.open_history_page)
 
+        #choose the sensor shown on the page, or all of them on the same graph
+        self.label_sensor = tk.Label(self.Frame2)
+        self.label_sensor.place(relx=0.327, rely=0.56, height=21, width=107)
+        self.label_sensor.configure(**self.common_config)
+        self.label_sensor.configure(background="#4d5a69")
+        self.label_sensor.configure(foreground="#ffffff")
+        self.label_sensor.configure(text='''Sensor''')
+
+        self.combo_sensor = ttk.Combobox(self.Frame2, state='readonly')
+        self.combo_sensor.place(relx=0.327, rely=0.62, height=26, width=107)
+        self.combo_sensor.bind("<<ComboboxSelected>>", self.select_sensor)
+
         #####LIVE GRAPH########################--------------------------
         self.Framegraph = tk.Frame(self.top)
         self.Framegraph.place(relx=0.025, rely=0.261, relheight=0.484, relwidth=0.606)
 
-        self.figure, self.ax = plt.subplots(2, 1, figsize=(8, 6))
-        self.canvas = FigureCanvasTkAgg(self.figure, master=self.Framegraph)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # The graph is created by create_graph once the window is shown
+        self.chart = None
+        self.readings = None
+        self.top.after_idle(self.create_graph)
 
         #####INITIALIZATION OF PROGRAM#############------------------------------
-        # Initialize the data lists and fetching control
-        self.temperature_data = []
-        self.humidity_data = []
+        # Initialize fetching control
         self.fetching_data = False
 
-        # Connect to SQLite database
-        self.conn = sqlite3.connect('sensors.db')
-        self.cursor = self.conn.cursor()
+        # New readings are handed to the GUI through new_readings, and render_frame shows them
+        # FRAME_RATE times a second. session_stats is for the max/min shown on the page, and
+        # latest_readings for the current values, both per sensor
+        self.new_readings = deque()
+        self.frame_rate = FRAME_RATE
+        self.session_stats = {}
+        self.latest_readings = {}
+
+        # With a collector, the readings come from its sampler thread (deque append is thread safe).
+        # Without one (viewer mode), the new RawHistory rows written by a collector running in
+        # another process are read from the database
+        self.collector = collector
+        self.db_path = db_path
+        # The alerts (see alerts.py) come the same way, as (sensor_id, rule, state, message) in
+        # new_alerts. active_alerts are the ones shown, until they clear or Reset Warning is pressed
+        self.new_alerts = deque()
+        self.active_alerts = {}  # (sensor_id, rule) -> message
+        if collector is not None:
+            self.timer = collector.timer
+            collector.on_reading = lambda now, temperature, humidity, sensor_id: \
+                self.new_readings.append((now, temperature, humidity, sensor_id))
+            collector.on_alert = lambda fired: \
+                self.new_alerts.extend((alert.sensor_id, alert.rule, alert.state, alert.message) for alert in fired)
+            for sensor_id, rule, message in collector.alerts.active():
+                self.new_alerts.append((sensor_id, rule, FIRED, message))
+        else:
+            self.timer = StageTimer()
+            self.viewer_conn = sqlite3.connect(db_path)
+            self.last_row_id = None
+            self.last_alert_id = None
+
+        # The sensors of the collector (or of sensors.json in viewer mode). With several sensors
+        # the page starts with all of them on the graph; selected_sensor None means all
+        self.sensor_ids = collector.sensor_ids() if collector is not None else sensor_ids()
+        self.selected_sensor = None if len(self.sensor_ids) > 1 else self.sensor_ids[0]
+        self.update_sensor_choices()
+
+        # Print the graph frame time and the stage timing every 2 minutes
+        self.top.after(120000, self.report_stats)
+
+    def create_graph(self):
+        #import for the live graph
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from ringbuffer import RingBuffer
+        from livechart import LiveChart
 
-        # Create tables if they don't exist
-        self.create_tables()
+        self.figure, self.ax = plt.subplots(2, 1, figsize=(8, 6))
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.Framegraph)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-        # Schedule daily summary task
-        # choose between schedule daily summary or schedule minute summary.
-        #if choose daily summary, change the next line to "self.schedule_daily_summary():
-        self.schedule_minute_summary()
+        # Lines are updated in place and only the plot area is redrawn (blit) for a new reading.
+        # The collector gives every reading, the viewer only gets the saved ones from the database
+        drawstyle = 'default'
+        if self.collector is None and self.compression is not None:
+            drawstyle = self.compression.drawstyle()
+        self.chart = LiveChart(self.figure, self.ax, self.canvas, window_seconds=600, blit=True, drawstyle=drawstyle)
+
+        # Initialize the buffers of latest readings (time, temperature, humidity), one per sensor.
+        # 1024 readings is more than the 10 minutes shown on the graph at one reading every 2 seconds
+        self.readings = {}
+        self.new_buffer = lambda: RingBuffer(capacity=1024)
+
+    def update_sensor_choices(self):
+        # "All" is only offered when there is more than one sensor
+        choices = (["All"] if len(self.sensor_ids) > 1 else []) + self.sensor_ids
+        self.combo_sensor.configure(values=choices)
+        self.combo_sensor.set(self.selected_sensor or "All")
+
+    def select_sensor(self, event=None):
+        choice = self.combo_sensor.get()
+        self.selected_sensor = None if choice == "All" else choice
+        # Show the values of the chosen sensor (the newest reading of all sensors for "All")
+        shown = [reading for reading in self.latest_readings.values() if self.is_shown(reading[3])]
+        if shown:
+            self.show_reading(*max(shown, key=lambda reading: reading[0]))
+        if self.readings:
+            self.update_plot()
+
+    def is_shown(self, sensor_id):
+        return self.selected_sensor is None or sensor_id == self.selected_sensor
 
     def open_history_page(self):
         # Create a new top-level window for the history page
         self.history_window = tk.Toplevel(self.top)
 
         # Initialize the history page within the new window
-        self.history_page = Toplevel2(top=self.history_window)
+        self.history_page = Toplevel2(top=self.history_window, db_path=self.db_path, compression=self.compression)
 
         # Make the new window a child of the main window
         self.history_window.transient(self.top)
@@ -551,109 +423,14 @@ class Toplevel1(BaseToplevel):
         # Make the new window modal (i.e., block interaction with the main window)
         self.history_window.grab_set() 
 
-    def create_tables(self):
-        # Create the necessary SQlite database tables if it doesn't exist
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS monitoring (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            time TEXT NOT NULL,
-            temperature REAL NOT NULL,
-            humidity REAL NOT NULL
-        )
-        ''')
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL,
-            mean_temperature REAL,
-            max_temperature REAL,
-            min_temperature REAL,
-            mean_humidity REAL,
-            max_humidity REAL,
-            min_humidity REAL
-        )
-        ''')
-
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS RawHistory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            time TEXT NOT NULL,
-            temperature REAL NOT NULL,
-            humidity REAL NOT NULL
-        )
-        ''')
-
-        # Commit the tables creation to the database
-        self.conn.commit()
-
-    def schedule_daily_summary(self):
-        # Get the current date and time
-        now = datetime.now()
-
-        # Set the next run time to 23:30:00 on the current day
-        next_run = now.replace(hour=23, minute=30, second=0, microsecond=0)
-
-        # If the current time is past the next run time, schedule for the next day
-        if now > next_run:
-            next_run += timedelta(days=1)
-
-        # Calculate the wait time in seconds
-        wait_time = (next_run - now).total_seconds()
-
-        # Schedule the daily summary task
-        self.top.after(int(wait_time * 1000), self.daily_summary)
-        
-    def schedule_minute_summary(self):
-        now = datetime.now()
-
-        # Schedule the next summary to run in 2 minutes
-        next_run  = now + timedelta(minutes=2)
-        if now > next_run:
-            next_run += timedelta(minutes=2)
-        wait_time = (next_run - now).total_seconds()
-
-        # Schedule the minute summary task
-        self.top.after(int(wait_time * 1000), self.minute_summary)
-        
-
-    #******************************READ THIS FOR SCHEDULING***********
-    #current code use minute summary 2min, if want to use daily summary,
-    #just change the function name from def minute_summary(self): to
-    #def daily_summary(self):
-    def minute_summary(self):
-        # Get the current date for history record
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Calculate daily statistics
-        self.cursor.execute('''
-        SELECT AVG(temperature), MAX(temperature), MIN(temperature),
-               AVG(humidity), MAX(humidity), MIN(humidity)
-        FROM monitoring
-        ''')
-        stats = self.cursor.fetchone()
-        
-        # Check if stats are valid (not empty)
-        if stats and stats[0] is not None:
-            history_data =(current_date, *stats)
-
-            # Insert into local database
-            self.cursor.execute('''
-            INSERT INTO history (date, mean_temperature, max_temperature, min_temperature, mean_humidity, max_humidity, min_humidity)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', history_data)
-            self.conn.commit()
-            
-            log_to_gsheet(service, spreadsheet_id, "History", history_data)
-        
-
-        self.cursor.execute('DELETE FROM monitoring')
-        self.conn.commit()
-            
-        # Clear Monitoring sheet
-        clear_sheet(service, spreadsheet_id, "Monitoring")
-
-        # Reschedule the daily summary task
-        self.schedule_minute_summary();
+    def report_stats(self):
+        # Report the graph frame time and the time of each stage, to compare the modes on the Pi
+        if self.chart is not None:
+            print(f"Graph frame time: {self.chart.format_frame_stats()}")
+        print(f"Stage timing: {self.timer.format()}")
+        if self.collector is not None:
+            print(self.collector.format_sensor_stats())
+        self.top.after(120000, self.report_stats)
 
     def start_fetching(self):
         global start_time
@@ -662,162 +439,165 @@ class Toplevel1(BaseToplevel):
         # Start fetching data if it's not already being fetched
         if not self.fetching_data:
             self.fetching_data = True
-            self.load_sensor_data()
+            if self.collector is not None:
+                self.collector.start_sampling()
+            self.render_frame()
 
     def stop_fetching(self):
         self.fetching_data = False
+        if self.collector is not None:
+            self.collector.stop_sampling()
 
-    def load_sensor_data(self):
-    # If fetching data is stopped, exit the function
-        if not self.fetching_data:
-            return
-
+    def poll_database(self):
+        # Viewer mode: queue the RawHistory rows added since the last poll
         try:
-            result = instance.read()
-            if result.is_valid():
-                    temperature = result.temperature
-                    humidity = result.humidity
-            
-                    # Update the temperature and humidity display in the GUI
-                    self.entry_temperature.config(text= f"{temperature} C")
-                    self.entry_humidity.config(text= f"{humidity} %")
-
-                    # Append the temperature and humidity data for plotting
-                    now = datetime.now()
-                    self.temperature_data.append((now, temperature))
-                    self.humidity_data.append((now, humidity))
-
-                    # Insert data into the SQLite Local database
-                    self.cursor.execute('''
-                    INSERT INTO monitoring (time, temperature, humidity) VALUES (?, ?, ?)
-                    ''', (now.strftime("%Y-%m-%d %H:%M:%S"), temperature, humidity))
-                    self.conn.commit()
-
-                    self.cursor.execute('''
-                    INSERT INTO RawHistory (time, temperature, humidity) VALUES (?, ?, ?)
-                    ''', (now.strftime("%Y-%m-%d %H:%M:%S"), temperature, humidity))
-                    self.conn.commit()
-                    
-                    # Log data to Google Sheets
-                    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                    log_to_gsheet(service, spreadsheet_id, "RawHistory", [timestamp, temperature, humidity])
-                    log_to_gsheet(service, spreadsheet_id, "Monitoring", [timestamp, temperature, humidity])
-                        
-                    # Check and trim RawHistory if it exceeds the threshold
-                    check_and_trim_rawhistory(service, spreadsheet_id, "RawHistory", max_rows=1000)
-
-                    # Update the last updated label
-                    self.label_last_updatedr.config(text=f"Last Updated: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-
-                    # Check for alerts
-                    self.check_for_alerts(temperature, humidity)
-
-                    # Calculate and display statistics
-                    self.display_statistics()
-
-                    # Clear previous data from the plots
-                    self.ax[0].cla()
-                    self.ax[1].cla()
-
-                    # Extract time and data for plotting
-                    times, temps = zip(*self.temperature_data) if self.temperature_data else ([], [])
-                    _, hums = zip(*self.humidity_data) if self.humidity_data else ([], [])
-
-                    # Plot the temperature and humidity data
-                    self.ax[0].plot(times, temps, '-', color='tab:red', label='Temperature')
-                    self.ax[1].plot(times, hums, '-', color='tab:blue', label='Humidity')
-
-                    # Set axis labels
-                    self.ax[0].set_ylabel("Temperature (C)")
-                    self.ax[1].set_ylabel("Humidity (%)")
-                    #self.ax[1].set_xlabel("Time")
-
-                    # Set date format for x-axis
-                    for axis in self.ax:
-                        axis.xaxis.set_major_formatter(DateFormatter('%H:%M'))
-
-                        # Set locator to show only the start and end ticks
-                        if times:
-                            current_time = datetime.now()
-                            if current_time - start_time >= timedelta(minutes=2):
-                                if current_time - start_time >= timedelta(minutes=10):
-                                    # Show ticks for 10 minutes ago and the current time
-                                    ten_minutes_ago = times[-1] - timedelta(minutes=9)
-                                    first_tick = min(times, key=lambda x: abs(x - ten_minutes_ago))
-                                    axis.set_xticks([first_tick, times[-1]])
-                                else:
-                                    # Show ticks for the first and last time points
-                                    axis.set_xticks([times[0], times[-1]])
-                                     
-                            else:
-                                #print("Less than 2 minutes have passed")
-                                axis.set_xticks([times[0]])
-                        else:
-                            axis.set_xticks([])
-
-                        axis.legend()
-                        axis.grid(True)
-
-                    # Adjust x-axis limits to show the last 10 minutes of data
-                    if times:
-                        max_time = max(times)
-                        min_time = max_time - timedelta(minutes=10)
-                        self.ax[0].set_xlim(min_time, max_time)
-                        self.ax[1].set_xlim(min_time, max_time)
-
-                    # Draw the updated plots
-                    self.canvas.draw()
-
-                    # Repeat every 2 seconds if fetching is active
-                    if self.fetching_data:
-                        self.top.after(2000, self.load_sensor_data)
+            if self.last_row_id is None:
+                # First poll: start with the readings of the last 10 minutes (the ts index finds the
+                # first one), or after the newest row if there is none
+                first = self.viewer_conn.execute('SELECT min(id) FROM RawHistory WHERE ts >= ?',
+                                                 (int(time.time()) - 600,)).fetchone()[0]
+                if first is not None:
+                    self.last_row_id = first - 1
+                else:
+                    self.last_row_id = self.viewer_conn.execute(
+                        'SELECT coalesce(max(id), 0) FROM RawHistory').fetchone()[0]
+            # At most VIEWER_POLL_ROWS rows per frame, the rest comes with the next frames
+            rows = self.viewer_conn.execute(
+                'SELECT id, ts, temperature, humidity, sensor_id FROM RawHistory WHERE id > ? ORDER BY id LIMIT ?',
+                (self.last_row_id, VIEWER_POLL_ROWS))
+            for row_id, ts, temperature, humidity, sensor_id in rows:
+                self.new_readings.append((datetime.fromtimestamp(ts), temperature, humidity, sensor_id))
+                self.last_row_id = row_id
+
+            # And the alerts: the active ones at the first poll, then the new rows of the alerts table
+            if self.last_alert_id is None:
+                for sensor_id, rule, message in read_active_alerts(self.viewer_conn):
+                    self.new_alerts.append((sensor_id, rule, FIRED, message))
+                self.last_alert_id = self.viewer_conn.execute('SELECT max(id) FROM alerts').fetchone()[0] or 0
             else:
-                    print("Error: %d" % result.error_code)
-                    self.top.after(1000, self.load_sensor_data)
-        except Exception as ex:
-            print(f"Error: {ex}")
-            self.top.after(1000, self.load_sensor_data)
-            
-    def display_statistics(self):
+                for row_id, sensor_id, rule, state, message in self.viewer_conn.execute(
+                        'SELECT id, sensor_id, rule, state, message FROM alerts WHERE id > ? ORDER BY id',
+                        (self.last_alert_id,)):
+                    self.new_alerts.append((sensor_id, rule, state, message))
+                    self.last_alert_id = row_id
+        except sqlite3.OperationalError as e:
+            # The collector has not created the database yet
+            print(f"Failed to read new readings: {str(e)}")
+
+    def render_frame(self):
+        # This runs in the GUI thread FRAME_RATE times a second and shows all the readings
+        # that arrived since the last frame
+        with self.timer.stage('render'):
+            if self.collector is None:
+                self.poll_database()
+
+            latest = None
+            while self.new_readings and self.readings is not None:
+                now, temperature, humidity, sensor_id = self.new_readings.popleft()
+                if sensor_id not in self.sensor_ids:
+                    # Viewer mode: a sensor that is not in sensors.json here
+                    self.sensor_ids.append(sensor_id)
+                    self.update_sensor_choices()
+
+                # Append the temperature and humidity data for plotting
+                if sensor_id not in self.readings:
+                    self.readings[sensor_id] = self.new_buffer()
+                    self.session_stats[sensor_id] = WindowAggregator()
+                self.readings[sensor_id].append(now.timestamp(), temperature, humidity)
+                self.session_stats[sensor_id].add(temperature, humidity)
+                self.latest_readings[sensor_id] = (now, temperature, humidity, sensor_id)
+                if self.is_shown(sensor_id):
+                    latest = (now, temperature, humidity, sensor_id)
+
+            # Show the alerts that fired or cleared
+            if self.new_alerts:
+                self.check_for_alerts()
+
+            if latest is not None:
+                # Update the values shown on the page
+                self.show_reading(*latest)
+
+                # Draw the updated plots
+                self.update_plot()
+
+        # Repeat if fetching is active
+        if self.fetching_data:
+            self.top.after(int(1000 / self.frame_rate), self.render_frame)
+
+    def show_reading(self, now, temperature, humidity, sensor_id):
+        # Update the temperature and humidity display in the GUI
+        self.entry_temperature.config(text= f"{temperature} C")
+        self.entry_humidity.config(text= f"{humidity} %")
+        self.labelp.config(text=f"Current Live Data ({sensor_id})" if len(self.sensor_ids) > 1 else "Current Live Data")
+
+        # Update the last updated label
+        self.label_last_updatedr.config(text=f"Last Updated: {now.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        # Calculate and display statistics
+        self.display_statistics(sensor_id)
+
+    def update_plot(self):
+        # Only the readings in the graph window of the shown sensors are plotted, read as views of
+        # the ring buffers (no copy)
+        buffers = {sensor_id: buffer for sensor_id, buffer in self.readings.items()
+                   if self.is_shown(sensor_id) and len(buffer)}
+        if not buffers:
+            return
+        latest = max(buffer.last()[buffer.TIME] for buffer in buffers.values())
+        series = {}
+        for sensor_id, buffer in buffers.items():
+            window = buffer.since(latest - self.chart.window_seconds - self.chart.step_seconds)
+            series[sensor_id] = (window[buffer.TIME], window[buffer.TEMPERATURE], window[buffer.HUMIDITY])
+        elapsed = (datetime.now() - start_time).total_seconds()
+        self.chart.update_series(series, elapsed)
+
+    def display_statistics(self, sensor_id):
         # Display max and min temperature and humidity if data is available
-        if self.temperature_data:
-            temperatures = [temp for _, temp in self.temperature_data]
-            humidity = [hum for _, hum in self.humidity_data]
-            self.label_max_temperature.config(text=f"{max(temperatures):.2f} C")
-            self.label_min_temperature.config(text=f"{min(temperatures):.2f} C")
-            self.label_max_humidity.config(text=f"{max(humidity):.2f} %")
-            self.label_min_humidity.config(text=f"{min(humidity):.2f} %")
+        session_stats = self.session_stats.get(sensor_id)
+        if session_stats is not None and session_stats.count():
+            temperature = session_stats.temperature
+            humidity = session_stats.humidity
+            self.label_max_temperature.config(text=f"{temperature.max:.2f} C")
+            self.label_min_temperature.config(text=f"{temperature.min:.2f} C")
+            self.label_max_humidity.config(text=f"{humidity.max:.2f} %")
+            self.label_min_humidity.config(text=f"{humidity.min:.2f} %")
 
            
             
 
-    def check_for_alerts(self, max_temp, max_hum):
-        # Check if temperature or humidity exceeds threshold
+    def check_for_alerts(self):
+        # Update the active alerts with the ones that fired or cleared (the rules are checked by
+        # the collector, see alerts.py) and show them (the sensor is named if there are several)
+        while self.new_alerts:
+            sensor_id, rule, state, message = self.new_alerts.popleft()
+            if state == FIRED:
+                self.active_alerts[(sensor_id, rule)] = message
+            else:
+                self.active_alerts.pop((sensor_id, rule), None)
+
         alert_message = ""
-        if max_temp > 30:
-            alert_message += f"Alert: Temperature exceeded 30 C!\n"
-        if max_hum > 70:
-            alert_message += f"Alert: Humidity exceeded 70 %!\n"
+        for (sensor_id, rule), message in self.active_alerts.items():
+            where = f" ({sensor_id})" if len(self.sensor_ids) > 1 else ""
+            alert_message += f"Alert{where}: {message}\n"
+        self.label_warnings.config(text=alert_message)
 
-        if alert_message:
-            self.label_warnings.config(text=alert_message)
-        else:
-            pass
-        
     def refresh_warnings(self):
-        # Clear the warnings display
+        # Clear the warnings display. The alerts still active are not shown again until they
+        # clear and fire again (they are kept in the alerts table of the database)
+        self.active_alerts.clear()
         self.label_warnings.config(text="")  # Clear warnings
 
 #This is for the second page of the APP - Show History table from local database
 class Toplevel2(BaseToplevel):
-    def __init__(self, top=None):
+    def __init__(self, top=None, db_path='sensors.db', compression=None):
         super().__init__(top)
         self.top = top
         top.title("Toplevel 1")
+        self.compression = compression
 
         #title for the data history section
         self.Label16 = tk.Label(self.top)
-        self.Label16.place(relx=0.024, rely=0.205, height=21, width=204)
+        self.Label16.place(relx=0.024, rely=0.205, height=21, width=150)
         self.Label16.configure(activebackground="#99b4d1")
         self.Label16.configure(activeforeground="black")
         self.Label16.configure(anchor='w')
@@ -828,6 +608,51 @@ class Toplevel2(BaseToplevel):
         self.Label16.configure(foreground="Black")
         self.Label16.configure(highlightcolor="Black")
         self.Label16.configure(text='''Data History''')
+
+        #open the trend graph of the readings (3rd page)
+        self.button_trend = tk.Button(self.top)
+        self.button_trend.place(relx=0.22, rely=0.2, height=26, width=70)
+        self.button_trend.configure(**self.common_configbutton)
+        self.button_trend.configure(text='''Trend''')
+        self.button_trend.configure(command=self.open_trend_page)
+
+        #date filters (YYYY-MM-DD, both optional)
+        self.label_from = tk.Label(self.top)
+        self.label_from.place(relx=0.33, rely=0.205, height=21, width=40)
+        self.label_from.configure(**self.common_config)
+        self.label_from.configure(background="#99b4d1")
+        self.label_from.configure(text='''From''')
+
+        self.entry_from = tk.Entry(self.top)
+        self.entry_from.place(relx=0.385, rely=0.205, height=21, width=90)
+
+        self.label_to = tk.Label(self.top)
+        self.label_to.place(relx=0.5, rely=0.205, height=21, width=30)
+        self.label_to.configure(**self.common_config)
+        self.label_to.configure(background="#99b4d1")
+        self.label_to.configure(text='''To''')
+
+        self.entry_to = tk.Entry(self.top)
+        self.entry_to.place(relx=0.54, rely=0.205, height=21, width=90)
+
+        self.button_filter = tk.Button(self.top)
+        self.button_filter.place(relx=0.67, rely=0.2, height=26, width=70)
+        self.button_filter.configure(**self.common_configbutton)
+        self.button_filter.configure(text='''Filter''')
+        self.button_filter.configure(command=self.apply_filter)
+
+        self.button_clear = tk.Button(self.top)
+        self.button_clear.place(relx=0.77, rely=0.2, height=26, width=70)
+        self.button_clear.configure(**self.common_configbutton)
+        self.button_clear.configure(text='''Clear''')
+        self.button_clear.configure(command=self.clear_filter)
+
+        #export the raw readings of the selected dates (database and archive) to a CSV file
+        self.button_export = tk.Button(self.top)
+        self.button_export.place(relx=0.87, rely=0.2, height=26, width=70)
+        self.button_export.configure(**self.common_configbutton)
+        self.button_export.configure(text='''Export''')
+        self.button_export.configure(command=self.export_raw)
         
         #frame to hold treeview and scrollbars
         self.Frame4 = tk.Frame(self.top)
@@ -839,8 +664,9 @@ class Toplevel2(BaseToplevel):
 
   
         # the treeview widget with columns for displaying data
-        self.tree = ttk.Treeview(self.Frame4, columns=("date", "mean_temp", "max_temp", "min_temp", "mean_hum", "max_hum", "min_hum"), show='headings')
+        self.tree = ttk.Treeview(self.Frame4, columns=("date", "sensor", "mean_temp", "max_temp", "min_temp", "mean_hum", "max_hum", "min_hum"), show='headings')
         self.tree.heading("date", text="Date")
+        self.tree.heading("sensor", text="Sensor")
         self.tree.heading("mean_temp", text="Mean Temp (C)")
         self.tree.heading("max_temp", text="Max Temp (C)")
         self.tree.heading("min_temp", text="Min Temp (C)")
@@ -850,6 +676,7 @@ class Toplevel2(BaseToplevel):
         
         # Set column widths and alignment for the treeview
         self.tree.column("date", width=180, anchor='w')
+        self.tree.column("sensor", width=100, anchor='w')
         self.tree.column("mean_temp", width=150, anchor='w')
         self.tree.column("max_temp", width=150, anchor='w')
         self.tree.column("min_temp", width=150, anchor='w')
@@ -860,7 +687,7 @@ class Toplevel2(BaseToplevel):
         # Create scrollbars
         self.vsb = ttk.Scrollbar(self.Frame4, orient="vertical", command=self.tree.yview)
         self.hsb = ttk.Scrollbar(self.Frame4, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=self.vsb.set, xscrollcommand=self.hsb.set)
+        self.tree.configure(xscrollcommand=self.hsb.set)
         
         # Place the treeview and scrollbars within the frame
         self.tree.grid(row=0, column=0, sticky='nsew')
@@ -871,72 +698,197 @@ class Toplevel2(BaseToplevel):
         self.Frame4.grid_rowconfigure(0, weight=1)
         self.Frame4.grid_columnconfigure(0, weight=1)
         
-        # Fetch data from the database and insert it into the treeview
+        # Only the rows around the visible part of the table are read from the database, more rows
+        # are loaded while scrolling (see historyview.py). The page opens on the newest rows
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.history = HistoryTable(self.tree, self.vsb, HistoryPager(self.conn, page_size=100), max_rows=500)
+        self.top.bind("<Destroy>", self.on_destroy)
         self.load_history_data()
 
-  
     def load_history_data(self):
-        # Connect to SQLite database
-        conn = sqlite3.connect('sensors.db')
-        cursor = conn.cursor()
-        
-        # Fetch all records from the history table
-        cursor.execute('SELECT date, mean_temperature, max_temperature, min_temperature, mean_humidity, max_humidity, min_humidity FROM history')
-        rows = cursor.fetchall()
-        
-        # Insert records into the treeview
-        for row in rows:
-                formatted_row = (
-                    row[0],  # date
-                    f"{row[1]:.2f}",  # mean_temperature
-                    f"{row[2]:.2f}",  # max_temperature
-                    f"{row[3]:.2f}",  # min_temperature
-                    f"{row[4]:.2f}",  # mean_humidity
-                    f"{row[5]:.2f}",  # max_humidity
-                    f"{row[6]:.2f}"   # min_humidity
-                )
-                self.tree.insert("", "end", values=formatted_row)
-    
-        # Close the database connection
-        conn.close()
+        try:
+            self.history.reload(newest=True)
+        except sqlite3.OperationalError as e:
+            # The collector has not created the database yet
+            print(f"Failed to load history: {str(e)}")
+
+    def apply_filter(self):
+        try:
+            self.history.pager.set_dates(self.entry_from.get().strip(), self.entry_to.get().strip())
+        except ValueError:
+            messagebox.showerror("Date filter", "Dates must be written as YYYY-MM-DD", parent=self.top)
+            return
+        self.load_history_data()
+
+    def clear_filter(self):
+        self.entry_from.delete(0, tk.END)
+        self.entry_to.delete(0, tk.END)
+        self.history.pager.set_dates()
+        self.load_history_data()
+
+    def export_raw(self):
+        # Export the raw readings of the From/To dates (all of them if empty). Old readings are
+        # read from the archive files (see archive.py). This runs in its own thread with its own
+        # connection, so the window stays responsive for long ranges
+        path = filedialog.asksaveasfilename(parent=self.top, defaultextension=".csv",
+                                            filetypes=[("CSV files", "*.csv")], initialfile="readings.csv")
+        if not path:
+            return
+        start, end = self.history.pager.start, self.history.pager.end
+        self.button_export.configure(state='disabled')
+        self.export_message = None
+
+        def export():
+            from archive import export_csv
+            try:
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    self.export_message = f"{export_csv(path, conn, start, end)} readings exported to {path}"
+                finally:
+                    conn.close()
+            except Exception as e:
+                self.export_message = f"Export failed: {str(e)}"
+
+        threading.Thread(target=export, name="export", daemon=True).start()
+        self.top.after(200, self.check_export)
+
+    def check_export(self):
+        # Tk must only be used from the GUI thread, so the result of the export is checked here
+        if self.export_message is None:
+            self.top.after(200, self.check_export)
+            return
+        self.button_export.configure(state='normal')
+        messagebox.showinfo("Export", self.export_message, parent=self.top)
+
+    def open_trend_page(self):
+        # The trend graph opens on the From/To dates (the last 7 days if they are empty)
+        end = self.history.pager.end or time.time()
+        start = self.history.pager.start or end - 7 * 86400
+        self.trend_window = tk.Toplevel(self.top)
+        self.trend_page = Toplevel3(top=self.trend_window, db_path=self.db_path, start=start, end=end,
+                                    compression=self.compression)
+        self.trend_window.transient(self.top)
+
+    def on_destroy(self, event):
+        # Close the database connection when the history window is closed
+        if event.widget is self.top:
+            self.conn.close()
+
+
+#This is for the third page of the APP - trend graph of the readings of one sensor, from hours to
+#months, with zoom and pan (see trendchart.py)
+class Toplevel3(BaseToplevel):
+    # Range buttons: text and seconds
+    RANGES = (("Day", 86400), ("Week", 7 * 86400), ("Month", 30 * 86400), ("Year", 365 * 86400))
+
+    def __init__(self, top=None, db_path='sensors.db', start=None, end=None, compression=None):
+        super().__init__(top)
+        self.top = top
+        top.title("Trend")
+
+        #title for the trend section
+        self.label_title = tk.Label(self.top)
+        self.label_title.place(relx=0.024, rely=0.205, height=21, width=150)
+        self.label_title.configure(anchor='w')
+        self.label_title.configure(background="#99b4d1")
+        self.label_title.configure(font="-family {Lucida Console} -size 14 -weight bold -underline 1")
+        self.label_title.configure(foreground="Black")
+        self.label_title.configure(text='''Trend''')
+
+        #sensor shown on the graph
+        self.sensor_ids = sensor_ids()
+        self.combo_sensor = ttk.Combobox(self.top, state='readonly', values=self.sensor_ids)
+        self.combo_sensor.place(relx=0.25, rely=0.2, height=26, width=107)
+        self.combo_sensor.set(self.sensor_ids[0])
+        self.combo_sensor.bind("<<ComboboxSelected>>", self.select_sensor)
+
+        #buttons to show the last day, week, month or year
+        for i, (text, seconds) in enumerate(self.RANGES):
+            button = tk.Button(self.top)
+            button.place(relx=0.45 + i * 0.1, rely=0.2, height=26, width=70)
+            button.configure(**self.common_configbutton)
+            button.configure(text=text)
+            button.configure(command=lambda seconds=seconds: self.show_last(seconds))
+
+        #frame to hold the graph and its zoom/pan toolbar
+        self.Frame5 = tk.Frame(self.top)
+        self.Frame5.place(relx=0.024, rely=0.253, relheight=0.719, relwidth=0.95)
+        self.Frame5.configure(relief='groove')
+        self.Frame5.configure(borderwidth="2")
+
+        #import for the trend graph
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        from trendchart import TrendChart, TrendTiles
+
+        self.figure, self.ax = plt.subplots(2, 1, figsize=(8, 5), sharex=True)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.Frame5)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.Frame5)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+        # The graph has its own connection; the tiles read for each zoom level are cached, so
+        # panning and going back to a zoom level doesn't read the database again
+        self.conn = sqlite3.connect(db_path)
+        self.tiles = TrendTiles(self.conn, compression=compression)
+        self.chart = TrendChart(self.figure, self.ax, self.canvas, self.tiles, sensor_id=self.sensor_ids[0])
+        self.top.bind("<Destroy>", self.on_destroy)
+
+        end = end or time.time()
+        self.show_range(start or end - 7 * 86400, end)
+
+    def show_range(self, start, end):
+        try:
+            self.chart.show_range(start, end)
+        except sqlite3.OperationalError as e:
+            # The collector has not created the database yet
+            print(f"Failed to load trend: {str(e)}")
+
+    def show_last(self, seconds):
+        now = time.time()
+        self.show_range(now - seconds, now)
+
+    def select_sensor(self, event=None):
+        self.chart.sensor_id = self.combo_sensor.get()
+        self.show_range(*self.chart.time_range())
+
+    def on_destroy(self, event):
+        # Close the database connection and the archive files when the trend window is closed
+        if event.widget is self.top:
+            import matplotlib.pyplot as plt
+            plt.close(self.figure)
+            self.tiles.close()
+            self.conn.close()
 #--------------------------------------------------------------------------------
 #Functions to make app open and close properly
 def on_close():
 	if messagebox.askokcancel("Quit", "Do you want to quit?"):
-	    GPIO.cleanup()
+	    if app.collector is not None:
+	        app.collector.close()
 	    root.quit()
 	    root.destroy() 
-	
-def initialize_gpio():
-    GPIO.setwarnings(True)
-    GPIO.setmode(GPIO.BCM)
-    instance = dht11.DHT11(pin=4)
 
 # Main application entry point
+#   python APPdhtLocal.py           - GUI that reads the sensor (same as the headless collector + GUI)
+#   python APPdhtLocal.py --viewer  - GUI only, shows what `python collector.py` writes to sensors.db
 if __name__ == '__main__':
-	
-    # Your Google Sheets ID
-    spreadsheet_id = "12HvdgVRrjt13X6ltcFCL0Hj6tkq0AAwZBulBHkAPHVI"
-    
-    
-    service = get_service()
-    
-    # Create necessary sheets if they don't exist
-    sheet_names = ["RawHistory", "Monitoring", "History"]
-    for sheet_name in sheet_names:
-        create_sheet_if_not_exists(service, spreadsheet_id, sheet_name)
-    
-    # Ensure headers exist in each sheet
-    ensure_sheet_header(service, spreadsheet_id, "RawHistory", ["Time", "Temperature", "Humidity"])
-    ensure_sheet_header(service, spreadsheet_id, "Monitoring", ["Time", "Temperature", "Humidity"])
-    ensure_sheet_header(service, spreadsheet_id, "History", ["Time", "Mean Temperature", "Mean Humidity", "Min Temperature", "Min Humidity", "Max Temperature", "Max Humidity"])
-  
-    initialize_gpio()
+    viewer = '--viewer' in sys.argv
+
+    collector = None
+    if not viewer:
+        from collector import Collector
+        collector = Collector()
+        collector.start_uplink_and_summary()
+        compression = collector.compression
+    else:
+        # Same compression setting as the collector writing sensors.db
+        from collector import RAW_COMPRESSION as compression
 	
     #create gui window
     root = tk.Tk()
     root.protocol( 'WM_DELETE_WINDOW' , on_close)
-    app = Toplevel1(root)
+    app = Toplevel1(root, collector=collector, compression=compression)
+    root.after_idle(report_startup, "GUI viewer" if viewer else "GUI", STARTED)
     root.mainloop()
 
 
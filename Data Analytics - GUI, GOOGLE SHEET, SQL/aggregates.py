@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the realtime statistics part of the dht11 APP. Statistics are updated with every
+# reading (O(1) per reading), so no table or list has to be scanned to get them.
+
+import math
+
+from rollups import TIERS
+
+
+# This class keeps count, sum, min, max, mean and variance of a stream of values.
+# The variance uses Welford's method, which stays accurate even after many readings.
+class RunningStats:
+    __slots__ = ('count', 'total', 'min', 'max', 'mean', 'm2')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+
+    def add(self, value):
+        # Update all statistics with one new value
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @classmethod
+    def from_totals(cls, count, total, low, high):
+        # Statistics of values known only by their count, sum, min and max (a rollup row).
+        # Their variance is not known and is left out (m2 = 0)
+        stats = cls()
+        if count:
+            stats.count, stats.total, stats.min, stats.max = count, total, low, high
+            stats.mean = total / count
+        return stats
+
+    def merge(self, other):
+        # Add the statistics of another RunningStats (e.g. to combine two windows)
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.total, self.min, self.max, self.mean, self.m2 = \
+                other.count, other.total, other.min, other.max, other.mean, other.m2
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def average(self):
+        # Same value as SQL AVG(), None when there is no data
+        return self.total / self.count if self.count else None
+
+    def variance(self, ddof=0):
+        # Population variance by default, ddof=1 gives the sample variance
+        if self.count - ddof <= 0:
+            return None
+        return self.m2 / (self.count - ddof)
+
+    def stddev(self, ddof=0):
+        variance = self.variance(ddof)
+        return math.sqrt(variance) if variance is not None else None
+
+
+# This class keeps the statistics of temperature and humidity for one summary window
+# (the readings since the last minute/daily summary).
+class WindowAggregator:
+    def __init__(self):
+        self.temperature = RunningStats()
+        self.humidity = RunningStats()
+
+    def add(self, temperature, humidity):
+        self.temperature.add(temperature)
+        self.humidity.add(humidity)
+
+    def reset(self):
+        self.temperature.reset()
+        self.humidity.reset()
+
+    def count(self):
+        return self.temperature.count
+
+    def summary_row(self, date):
+        # Row for the history table: (date, mean, max, min temperature, mean, max, min humidity)
+        # None if there was no reading in the window
+        if self.temperature.count == 0:
+            return None
+        return (date,
+                self.temperature.average(), self.temperature.max, self.temperature.min,
+                self.humidity.average(), self.humidity.max, self.humidity.min)
+
+    def load(self, conn, table='monitoring', sensor_id=None):
+        # Rebuild the window from the readings already in the database (e.g. after a restart in
+        # the middle of a window), of one sensor or of all of them if sensor_id is None.
+        # The rows are read one by one, not loaded in memory all at once.
+        self.reset()
+        if sensor_id is None:
+            rows = conn.execute(f'SELECT temperature, humidity FROM {table}')
+        else:
+            rows = conn.execute(f'SELECT temperature, humidity FROM {table} WHERE sensor_id = ?', (sensor_id,))
+        for temperature, humidity in rows:
+            self.add(temperature, humidity)
+        return self.count()
+
+    def load_rollups(self, conn, start, sensor_id, table='monitoring'):
+        # Rebuild the window of the readings since start (epoch seconds) from the minute rollups,
+        # which get every reading: with compression, monitoring only has the saved readings.
+        # The minute of start also has readings of the window before, so its readings come from
+        # monitoring. Count, mean, min and max are the ones of every reading
+        self.reset()
+        minute_table, size, _ = TIERS['minute']
+        first_minute = start if start % size == 0 else start - start % size + size
+        for temperature, humidity in conn.execute(
+                f'SELECT temperature, humidity FROM {table} WHERE sensor_id = ? AND ts >= ? AND ts < ?',
+                (sensor_id, start, first_minute)):
+            self.add(temperature, humidity)
+        for samples, temp_sum, temp_min, temp_max, hum_sum, hum_min, hum_max in conn.execute(
+                f'SELECT samples, temp_sum, temp_min, temp_max, hum_sum, hum_min, hum_max FROM {minute_table} '
+                f'WHERE sensor_id = ? AND bucket >= ?', (sensor_id, first_minute)):
+            self.temperature.merge(RunningStats.from_totals(samples, temp_sum, temp_min, temp_max))
+            self.humidity.merge(RunningStats.from_totals(samples, hum_sum, hum_min, hum_max))
+        return self.count()
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the alert part of the dht11 APP: the alert rules are listed in alerts.json and checked
+# by the collector with every reading of every sensor. Example alerts.json:
+#     [
+#         {"name": "hot", "value": "temperature", "above": 30, "clear": 29},
+#         {"name": "dry", "value": "humidity", "below": 30, "clear": 33, "for": 60},
+#         {"name": "warm", "value": "temperature", "stat": "mean", "window": 300, "above": 28},
+#         {"name": "heating", "value": "temperature", "stat": "rise", "window": 300, "above": 0.5,
+#          "sensors": ["kitchen"]}
+#     ]
+# Keys of a rule:
+#   "name"    - name of the rule, saved with its alerts
+#   "value"   - "temperature" or "humidity"
+#   "stat"    - "value" (the reading itself, default), or over the last "window" seconds:
+#               "mean", "min", "max", or "rise" (change per minute, slope of the least squares line)
+#   "above" / "below" - the alert fires when the stat goes above / below this level
+#   "clear"   - the alert only clears when the stat is back past this level (hysteresis, so a
+#               value going up and down around the level doesn't fire again and again). Default:
+#               the level itself
+#   "for"     - seconds the stat must stay past the level (or the clear level) before the alert
+#               fires (or clears), 0 by default
+#   "sensors" - ids of the sensors the rule is for, all of them by default
+#   "message" - text shown in the app, made from the rule by default
+# Without alerts.json the app uses the alerts it always had: temperature above 30 C and humidity
+# above 70 %.
+#
+# A window rule doesn't go through the readings of its window again for each reading: the window
+# keeps the sums of its readings (mean and slope) and the readings that can still be the min or
+# max, updated when a reading comes in and when one gets too old. So each reading costs the same
+# whatever the length of the window.
+#
+# Each alert that fires or clears is saved in the alerts table of sensors.db, with its time, the
+# stat and the level, so they can be read back with read_alerts().
+
+import json
+import os
+from collections import deque
+from datetime import datetime
+
+ALERTS_FILE = 'alerts.json'
+
+VALUES = ('temperature', 'humidity')
+STATS = ('value', 'mean', 'min', 'max', 'rise')
+UNITS = {'temperature': 'C', 'humidity': '%'}
+
+FIRED = 'fired'
+CLEARED = 'cleared'
+
+
+# Settings of one alert rule from alerts.json
+class AlertRule:
+    def __init__(self, name, value='temperature', stat='value', window=None, above=None, below=None, clear=None,
+                 debounce=0.0, sensors=None, message=None):
+        if value not in VALUES:
+            raise ValueError(f"Alert '{name}': unknown value '{value}' (known: {', '.join(VALUES)})")
+        if stat not in STATS:
+            raise ValueError(f"Alert '{name}': unknown stat '{stat}' (known: {', '.join(STATS)})")
+        if (above is None) == (below is None):
+            raise ValueError(f"Alert '{name}' needs one of \"above\" or \"below\"")
+        if stat != 'value' and not (window and float(window) > 0):
+            raise ValueError(f"Alert '{name}': the {stat} needs a \"window\" in seconds")
+        self.name = name
+        self.value = value
+        self.stat = stat
+        self.window = float(window) if stat != 'value' else None
+        self.above = above is not None
+        self.level = float(above if above is not None else below)
+        self.clear = float(clear) if clear is not None else self.level
+        if (self.clear > self.level) if self.above else (self.clear < self.level):
+            raise ValueError(f"Alert '{name}': \"clear\" must be on the other side of the level")
+        self.debounce = float(debounce)
+        self.sensors = set(sensors) if sensors is not None else None
+        self.message = message or self.default_message()
+
+    def default_message(self):
+        unit = UNITS[self.value]
+        what = self.value.capitalize()
+        if self.stat == 'rise':
+            what += f" rise over {self.window:g} s"
+            unit += "/min"
+        elif self.stat != 'value':
+            what += f" {self.stat} over {self.window:g} s"
+        return f"{what} {'exceeded' if self.above else 'fell below'} {self.level:g} {unit}!"
+
+    def applies_to(self, sensor_id):
+        return self.sensors is None or sensor_id in self.sensors
+
+    def fires(self, stat):
+        return stat > self.level if self.above else stat < self.level
+
+    def clears(self, stat):
+        return stat < self.clear if self.above else stat > self.clear
+
+    def __repr__(self):
+        return f"AlertRule({self.name!r}, {self.value} {self.stat} {'>' if self.above else '<'} {self.level:g})"
+
+
+DEFAULT_RULES = [
+    AlertRule('temperature', 'temperature', above=30, clear=29),
+    AlertRule('humidity', 'humidity', above=70, clear=68),
+]
+
+
+# Function to read the rules of alerts.json (the default rules if the file doesn't exist).
+# A wrong file raises ValueError, like sensors.json
+def load_rules(path=ALERTS_FILE):
+    if not os.path.exists(path):
+        return list(DEFAULT_RULES)
+    with open(path, encoding='utf-8') as file:
+        try:
+            entries = json.load(file)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path} is not valid JSON: {str(e)}")
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must be a list of alert rules")
+
+    rules = []
+    for entry in entries:
+        try:
+            rules.append(AlertRule(entry['name'], entry.get('value', 'temperature'), entry.get('stat', 'value'),
+                                   entry.get('window'), entry.get('above'), entry.get('below'), entry.get('clear'),
+                                   entry.get('for', 0.0), entry.get('sensors'), entry.get('message')))
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError(f"{path}: each alert rule needs at least a \"name\": {entry!r}")
+    names = [rule.name for rule in rules]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: alert rule names must be different")
+    return rules
+
+
+# This class keeps the readings of the last `seconds` seconds and gives their mean, min, max
+# and slope without going through them:
+#   - the count and sums (of t, v, t*t, t*v) are updated when a reading comes in or gets too old.
+#     The times are kept from `base` (the oldest reading), so the sums stay small numbers, and
+#     the sums are made again from the readings once as many readings were removed as there are
+#     in the window (rounding errors don't add up, and it is still O(1) per reading on average)
+#   - lows / highs only keep the readings that can still become the min / max (each one is lower /
+#     higher than the ones before it), so the min / max is the first one
+class SlidingWindow:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.readings = deque()  # (time, value)
+        self.lows = deque()
+        self.highs = deque()
+        self.since = None  # time of the first reading since the window was last empty
+        self.base = 0.0
+        self.clear_sums()
+
+    def clear_sums(self):
+        self.count = 0
+        self.sum_t = self.sum_v = self.sum_tt = self.sum_tv = 0.0
+        self.removed = 0
+
+    def add(self, time, value):
+        self.remove_before(time - self.seconds)
+        if not self.readings:
+            self.since = time
+            self.base = time
+        self.readings.append((time, value))
+        while self.lows and self.lows[-1][1] >= value:
+            self.lows.pop()
+        self.lows.append((time, value))
+        while self.highs and self.highs[-1][1] <= value:
+            self.highs.pop()
+        self.highs.append((time, value))
+        self.add_to_sums(time, value, 1)
+
+    def add_to_sums(self, time, value, sign):
+        t = time - self.base
+        self.count += sign
+        self.sum_t += sign * t
+        self.sum_v += sign * value
+        self.sum_tt += sign * t * t
+        self.sum_tv += sign * t * value
+
+    def remove_before(self, start):
+        while self.readings and self.readings[0][0] < start:
+            time, value = self.readings.popleft()
+            self.add_to_sums(time, value, -1)
+            self.removed += 1
+            if self.lows[0][0] == time:
+                self.lows.popleft()
+            if self.highs[0][0] == time:
+                self.highs.popleft()
+        if self.removed and self.removed >= len(self.readings):
+            self.rebuild_sums()
+
+    def rebuild_sums(self):
+        self.clear_sums()
+        if self.readings:
+            self.base = self.readings[0][0]
+        for time, value in self.readings:
+            self.add_to_sums(time, value, 1)
+
+    def full(self, time):
+        # True once the window has had readings for its whole length (a mean over the first
+        # seconds after a start, or after a hole in the readings, is not a mean over the window)
+        return self.since is not None and time - self.since >= self.seconds
+
+    def mean(self):
+        return self.sum_v / self.count
+
+    def min(self):
+        return self.lows[0][1]
+
+    def max(self):
+        return self.highs[0][1]
+
+    def slope(self):
+        # Least squares slope, per second (None with fewer than two reading times)
+        spread = self.count * self.sum_tt - self.sum_t * self.sum_t
+        if self.count < 2 or spread <= 1e-9 * self.count * self.sum_tt:
+            return None
+        return (self.count * self.sum_tv - self.sum_t * self.sum_v) / spread
+
+
+# One alert that fired or cleared: time in epoch seconds, sensor, rule name, FIRED or CLEARED,
+# the stat of the rule and its level (the clear level for CLEARED)
+class Alert:
+    __slots__ = ('ts', 'sensor_id', 'rule', 'state', 'value', 'level', 'message')
+
+    def __init__(self, ts, sensor_id, rule, state, value, level, message):
+        self.ts = ts
+        self.sensor_id = sensor_id
+        self.rule = rule
+        self.state = state
+        self.value = value
+        self.level = level
+        self.message = message
+
+    def row(self):
+        # Row for the alerts table
+        return (datetime.fromtimestamp(self.ts).strftime("%Y-%m-%d %H:%M:%S"), int(self.ts), self.sensor_id,
+                self.rule, self.state, self.value, self.level, self.message)
+
+    def text(self):
+        return self.message if self.state == FIRED else f"Cleared: {self.message}"
+
+    def __repr__(self):
+        return f"Alert({self.sensor_id!r}, {self.rule!r}, {self.state}, {self.value:.2f})"
+
+
+# This class checks one rule for one sensor: the stat of the rule (from its window), and whether
+# the alert is active, with the debounce (`pending` is the time the stat went past the level)
+class RuleState:
+    __slots__ = ('rule', 'window', 'active', 'pending')
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.window = SlidingWindow(rule.window) if rule.window is not None else None
+        self.active = False
+        self.pending = None
+
+    def stat(self, time, value):
+        rule = self.rule
+        if self.window is None:
+            return value
+        self.window.add(time, value)
+        if not self.window.full(time):
+            return None
+        if rule.stat == 'mean':
+            return self.window.mean()
+        if rule.stat == 'min':
+            return self.window.min()
+        if rule.stat == 'max':
+            return self.window.max()
+        slope = self.window.slope()
+        return slope * 60.0 if slope is not None else None
+
+    def check(self, time, value, sensor_id):
+        # Returns the Alert if the alert fires or clears with this reading, else None
+        rule = self.rule
+        stat = self.stat(time, value)
+        if stat is None:
+            self.pending = None
+            return None
+        if not (rule.clears(stat) if self.active else rule.fires(stat)):
+            self.pending = None
+            return None
+        if self.pending is None:
+            self.pending = time
+        if time - self.pending < rule.debounce:
+            return None
+        self.pending = None
+        self.active = not self.active
+        return Alert(time, sensor_id, rule.name, FIRED if self.active else CLEARED, stat,
+                     rule.level if self.active else rule.clear, rule.message)
+
+
+# This class checks the rules for every reading of every sensor. add() returns the alerts that
+# fired or cleared with the reading. It is only used by one thread at a time (the collector
+# calls it with its lock held).
+class AlertEngine:
+    def __init__(self, rules=None):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.states = {}  # sensor_id -> [RuleState of each rule for this sensor]
+
+    def rule_states(self, sensor_id):
+        states = self.states.get(sensor_id)
+        if states is None:
+            states = self.states[sensor_id] = [RuleState(rule) for rule in self.rules
+                                               if rule.applies_to(sensor_id)]
+        return states
+
+    def add(self, sensor_id, time, temperature, humidity):
+        alerts = []
+        for state in self.rule_states(sensor_id):
+            alert = state.check(time, temperature if state.rule.value == 'temperature' else humidity, sensor_id)
+            if alert is not None:
+                alerts.append(alert)
+        return alerts
+
+    def active(self):
+        # (sensor_id, rule name, message) of the active alerts, like read_active_alerts()
+        return [(sensor_id, state.rule.name, state.rule.message) for sensor_id, states in self.states.items()
+                for state in states if state.active]
+
+    def load(self, conn):
+        # Set the alerts that were active when the app stopped (the last row of their rule and
+        # sensor is FIRED), so they don't fire again after a restart. Returns their count
+        active = 0
+        for sensor_id, rule, _ in read_active_alerts(conn):
+            for state in self.rule_states(sensor_id):
+                if state.rule.name == rule:
+                    state.active = True
+                    active += 1
+        return active
+
+
+# Function to create the alerts table if it doesn't exist (called by SensorStore.create_tables)
+def create_alerts_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        time TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        sensor_id TEXT NOT NULL,
+        rule TEXT NOT NULL,
+        state TEXT NOT NULL,
+        value REAL,
+        level REAL,
+        message TEXT
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS alerts_ts ON alerts(ts)')
+    conn.execute('CREATE INDEX IF NOT EXISTS alerts_sensor_rule ON alerts(sensor_id, rule, id)')
+
+
+# Function to save alerts in the alerts table (in the transaction of the caller)
+def insert_alerts(conn, alerts):
+    conn.executemany('''
+    INSERT INTO alerts (time, ts, sensor_id, rule, state, value, level, message) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [alert.row() for alert in alerts])
+
+
+# Function to read the alerts with start <= ts < end (epoch seconds), oldest first, as rows
+# (id, ts, sensor_id, rule, state, value, level, message). sensor_id None reads all the sensors
+def read_alerts(conn, start, end, sensor_id=None):
+    columns = 'id, ts, sensor_id, rule, state, value, level, message'
+    if sensor_id is None:
+        return conn.execute(f'SELECT {columns} FROM alerts WHERE ts >= ? AND ts < ? ORDER BY id',
+                            (int(start), int(end)))
+    return conn.execute(f'SELECT {columns} FROM alerts WHERE sensor_id = ? AND ts >= ? AND ts < ? ORDER BY id',
+                        (sensor_id, int(start), int(end)))
+
+
+# Function to read the alerts that are active: (sensor_id, rule, message) of the rules and
+# sensors whose last alert is FIRED
+def read_active_alerts(conn):
+    return conn.execute('''
+    SELECT sensor_id, rule, message FROM alerts
+    WHERE id IN (SELECT max(id) FROM alerts GROUP BY sensor_id, rule) AND state = ?
+    ORDER BY id
+    ''', (FIRED,)).fetchall()
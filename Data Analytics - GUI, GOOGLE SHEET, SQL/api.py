@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the HTTP API of the dht11 APP: the data of sensors.db as JSON, to look at it from another
+# computer without going through google sheets (slow, limited requests, and RawHistory there only
+# keeps the last 1000 rows). It is read only and has no login, so by default it only answers on
+# this computer (127.0.0.1). The collector starts it (see API_ADDRESS in collector.py), or it runs
+# on its own next to a collector running in another process:
+#     python api.py [sensors.db] [port] [host]     (host 0.0.0.0 to answer the whole network)
+#
+#   GET /api/sensors                                   - the sensor ids
+#   GET /api/latest[?sensor=id]                        - latest reading of each sensor
+#   GET /api/range?start=&end=[&sensor=&table=&limit=] - rows of RawHistory (default) or history
+#   GET /api/range?start=&end=&step=[&sensor=]         - readings of one sensor rebuilt every step
+#                                                        seconds (see compression.read_interpolated)
+#   GET /api/rollup?start=&end=[&sensor=&tier=&max_points=]
+#                                                      - minute / hour / day rollups (see rollups.py)
+#   GET /api/alerts?start=&end=[&sensor=]              - alerts that fired or cleared (see alerts.py)
+# start and end are epoch seconds (end defaults to now, start to one hour before end). The routes
+# of one sensor use the first sensor of sensors.json when sensor= is not given.
+# Rows are sent as lists, with the names of their columns in "columns", e.g.
+#     curl "http://127.0.0.1:8080/api/range?sensor=dht11&start=1700000000&end=1700003600"
+#
+# The requests are answered with a pool of read-only connections (WAL mode: readers don't wait for
+# the collector writing, and the collector doesn't wait for them), and the answers are kept in a
+# small cache. An answer is used again as long as the database did not change, which is checked
+# with the first/last row ids of the tables (a lookup in their primary key, not a count) and with
+# PRAGMA data_version for the other changes (the rollups rebuilt by a backfill or pruned).
+# Each answer has an ETag: a client sending it back in If-None-Match gets "304 Not Modified" and
+# no body when nothing changed.
+
+import hashlib
+import json
+import math
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import rollups
+from alerts import read_alerts
+from sensors import SENSOR_ID_PATTERN, sensor_ids
+from storage import read_range
+
+API_PORT = 8080
+MAX_ROWS = 100000      # most rows in one answer of /api/range
+DEFAULT_ROWS = 10000
+
+# Tables of /api/range with the names of their columns
+RANGE_COLUMNS = {
+    'RawHistory': ['id', 'ts', 'temperature', 'humidity', 'sensor_id'],
+    'history': ['id', 'ts', 'mean_temperature', 'max_temperature', 'min_temperature',
+                'mean_humidity', 'max_humidity', 'min_humidity', 'sensor_id'],
+}
+REBUILT_COLUMNS = ['ts', 'temperature', 'humidity']
+ROLLUP_COLUMNS = ['bucket', 'samples', 'mean_temperature', 'min_temperature', 'max_temperature',
+                  'mean_humidity', 'min_humidity', 'max_humidity']
+ALERT_COLUMNS = ['id', 'ts', 'sensor_id', 'rule', 'state', 'value', 'level', 'message']
+
+# Changes when a reading, summary or alert is written, or old readings are removed
+VERSION_SQL = '''
+SELECT (SELECT min(id) FROM RawHistory), (SELECT max(id) FROM RawHistory),
+       (SELECT max(id) FROM history), (SELECT max(id) FROM alerts)
+'''
+
+
+# An error of the request, answered with its HTTP status and {"error": message}
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# This class keeps up to `size` read-only connections to the database. A request takes one and
+# gives it back; when all are in use it waits up to `timeout` seconds (then the answer is
+# "503 busy"), so the Pi never has more than `size` queries running at once.
+class ReadPool:
+    def __init__(self, db_path, size=4, timeout=5.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()  # the last used connection first, its cache is warm
+        self.opened = 0
+        self.lock = threading.Lock()
+        # PRAGMA data_version last seen by each connection, and a number that goes up each time a
+        # connection sees a change (data_version is only comparable on the same connection)
+        self.data_versions = {}
+        self.generation = 0
+
+    def open(self):
+        conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, timeout=self.timeout,
+                               check_same_thread=False)
+        conn.execute('PRAGMA query_only=1')
+        return conn
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            new = self.opened < self.size
+            if new:
+                self.opened += 1
+        if new:
+            try:
+                return self.open()
+            except sqlite3.Error:
+                with self.lock:
+                    self.opened -= 1
+                raise
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ApiError(503, "Too many requests, try again")
+
+    def release(self, conn):
+        self.idle.put(conn)
+
+    def version(self, conn):
+        # Version of the database: the row ids of VERSION_SQL, and the generation for the commits
+        # that don't change them (a rollup table rebuilt or pruned). A connection used for the first
+        # time also starts a new generation, it can't tell what changed before it was opened
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        with self.lock:
+            if self.data_versions.get(conn) != data_version:
+                self.data_versions[conn] = data_version
+                self.generation += 1
+            generation = self.generation
+        return conn.execute(VERSION_SQL).fetchone() + (generation,)
+
+    def close(self):
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.data_versions.pop(conn, None)
+            conn.close()
+
+
+# Function to make the ETag of an answer (a hash of its body, in quotes as HTTP wants it)
+def make_etag(body):
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+# This class keeps the last max_entries answers: (request) -> (database version, ETag, body).
+# It is used by the request threads, so it has a lock (held only to look up or add an answer).
+class ResponseCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body):
+        entry = (version, make_etag(body), body)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+
+# This class answers the requests (one thread per connection, see ApiServer). The routes are the
+# methods of ApiServer called query_<name>.
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, a client doesn't open a connection per request
+    server_version = 'dht11-api'
+    # The headers and the body are two writes: without this, the second one waits for the ACK of
+    # the first (Nagle's algorithm), 40 ms per request
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        api = self.server.api
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        try:
+            status, etag, body = 200, *api.answer(url.path, parse_qs(url.query))
+        except ApiError as e:
+            status, etag, body = e.status, None, json.dumps({'error': str(e)}).encode()
+        except sqlite3.Error as e:
+            print(f"API error ({url.path}): {str(e)}")
+            status, etag, body = 500, None, json.dumps({'error': "Database error"}).encode()
+        except Exception as e:
+            # Any other bug still gets an answer, the connection is not dropped
+            print(f"API error ({url.path}): {type(e).__name__}: {str(e)}")
+            status, etag, body = 500, None, json.dumps({'error': "Internal error"}).encode()
+
+        if etag is not None and etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+        else:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if etag is not None:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')  # the client asks again, with the ETag
+            self.end_headers()
+            self.wfile.write(body)
+        if api.timer is not None:
+            api.timer.record('api', (time.perf_counter() - start) * 1000.0)
+
+    def log_message(self, format, *args):
+        # No line for each request (hundreds a second), errors are printed by do_GET
+        pass
+
+
+# This class is the API server: an HTTP server in its own thread, the connection pool and the
+# answer cache. latest(sensor_id) can be given to answer /api/latest from memory (the collector
+# gives the last reading of its readers, which can be newer than the database with compression).
+# compression is the CompressionPolicy of the collector, used to rebuild the readings for step=.
+class ApiServer:
+    def __init__(self, db_path='sensors.db', address=('127.0.0.1', API_PORT), pool_size=4, cache_size=256,
+                 sensors=None, latest=None, timer=None, compression=None):
+        self.db_path = db_path
+        self.address = address
+        self.pool = ReadPool(db_path, size=pool_size)
+        self.cache = ResponseCache(cache_size)
+        self.sensors = sensors  # the sensor ids (of sensors.json if None)
+        self.latest = latest
+        self.timer = timer
+        self.compression = compression
+        self.requests = 0
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        # Start the server thread. Returns False (and the app goes on without the API) when the
+        # port can't be used
+        try:
+            self.httpd = ThreadingHTTPServer(self.address, ApiHandler)
+        except OSError as e:
+            print(f"Failed to start the API on port {self.address[1]}: {str(e)}")
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="api", daemon=True)
+        self.thread.start()
+        print(f"API on http://{self.address[0]}:{self.httpd.server_address[1]}/api/")
+        return True
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        self.pool.close()
+
+    def port(self):
+        return self.httpd.server_address[1] if self.httpd is not None else None
+
+    def sensor_ids(self):
+        return list(self.sensors) if self.sensors is not None else sensor_ids()
+
+    def answer(self, path, params):
+        # (ETag, body) of a request, from the cache when the database did not change
+        self.requests += 1
+        name = path.rstrip('/').rsplit('/', 1)[-1]
+        query = getattr(self, f'query_{name}', None)
+        if not path.startswith('/api/') or query is None:
+            raise ApiError(404, f"Unknown path {path}")
+        if name == 'latest' and self.latest is not None:
+            # From memory, not cached (it changes with every reading)
+            body = self.encode(self.query_latest(None, params))
+            return make_etag(body), body
+
+        key = (name, tuple(sorted((key, tuple(values)) for key, values in params.items())))
+        if 'end' not in params:
+            # The range ends now: the same answer can only be used within the same second
+            key += (int(time.time()),)
+        conn = self.pool.acquire()
+        try:
+            version = self.pool.version(conn)
+            entry = self.cache.get(key, version)
+            if entry is None:
+                entry = self.cache.put(key, version, self.encode(query(conn, params)))
+        finally:
+            self.pool.release(conn)
+        return entry[1:]
+
+    @staticmethod
+    def encode(result):
+        return json.dumps(result, separators=(',', ':')).encode()
+
+    #------------------------------------------------------------------------
+    # The routes: query_<name>(conn, params) returns the answer (conn is None for the latest
+    # readings from memory). params are the query string values, as lists
+    #------------------------------------------------------------------------
+
+    def query_sensors(self, conn, params):
+        return {'sensors': self.sensor_ids()}
+
+    def query_latest(self, conn, params):
+        wanted = [self.sensor(params)] if 'sensor' in params else self.sensor_ids()
+        readings = {}
+        for sensor_id in wanted:
+            if conn is None:
+                latest = self.latest(sensor_id)
+                if latest is not None:
+                    readings[sensor_id] = {'ts': latest[0], 'temperature': latest[1], 'humidity': latest[2]}
+            else:
+                # The (sensor_id, ts) index gives the last row without reading the others
+                row = conn.execute('SELECT ts, temperature, humidity FROM RawHistory WHERE sensor_id = ? '
+                                   'ORDER BY ts DESC LIMIT 1', (sensor_id,)).fetchone()
+                if row is not None:
+                    readings[sensor_id] = {'ts': row[0], 'temperature': row[1], 'humidity': row[2]}
+        return {'latest': readings}
+
+    def query_range(self, conn, params):
+        start, end = self.time_range(params)
+        table = self.param(params, 'table', 'RawHistory')
+        if table not in RANGE_COLUMNS:
+            raise ApiError(400, f"Unknown table '{table}' (known: {', '.join(RANGE_COLUMNS)})")
+        if 'step' in params:
+            return self.rebuilt_range(conn, params, start, end, table)
+        limit = self.number(params, 'limit', DEFAULT_ROWS, int)
+        if not 0 < limit <= MAX_ROWS:
+            raise ApiError(400, f"limit must be 1 to {MAX_ROWS}")
+        sensor_id = self.sensor(params) if 'sensor' in params else None
+        # One row more than the limit, to tell the client there are more (ask again from the last ts)
+        rows = read_range(conn, start, end, table, sensor_id).fetchmany(limit + 1)
+        return {'start': start, 'end': end, 'table': table, 'columns': RANGE_COLUMNS[table],
+                'rows': rows[:limit], 'more': len(rows) > limit}
+
+    def rebuilt_range(self, conn, params, start, end, table):
+        # The readings of one sensor every step seconds, rebuilt from the saved ones (with
+        # compression RawHistory only has the readings needed to rebuild the series). Times where
+        # the sensor was not read are null
+        step = self.number(params, 'step', None)
+        if table != 'RawHistory':
+            raise ApiError(400, "step can only be used with the RawHistory table")
+        if step <= 0 or (end - start) / step > MAX_ROWS:
+            raise ApiError(400, f"step must be more than 0 and give at most {MAX_ROWS} rows")
+
+        from archive import ArchiveReader
+        from compression import read_interpolated
+
+        reader = ArchiveReader(sensor_id=self.sensor(params))
+        try:
+            times, temperature, humidity = read_interpolated(conn, start, end, step, self.compression, reader)
+        finally:
+            reader.close()
+        rows = [[t, temp if math.isfinite(temp) else None, hum if math.isfinite(hum) else None]
+                for t, temp, hum in zip(times.tolist(), temperature.tolist(), humidity.tolist())]
+        return {'start': start, 'end': end, 'table': table, 'step': step, 'columns': REBUILT_COLUMNS,
+                'rows': rows, 'more': False}
+
+    def query_rollup(self, conn, params):
+        start, end = self.time_range(params)
+        tier = self.param(params, 'tier', None)
+        if tier is not None and tier not in rollups.TIERS:
+            raise ApiError(400, f"Unknown tier '{tier}' (known: {', '.join(rollups.TIERS)})")
+        max_points = self.number(params, 'max_points', 1000, int)
+        if not 0 < max_points <= MAX_ROWS:
+            raise ApiError(400, f"max_points must be 1 to {MAX_ROWS}")
+        tier = tier or rollups.choose_tier(start, end, max_points)
+        rows = rollups.read_rollup(conn, start, end, tier, max_points, self.sensor(params)).fetchall()
+        return {'start': start, 'end': end, 'tier': tier, 'bucket_seconds': rollups.TIERS[tier][1],
+                'columns': ROLLUP_COLUMNS, 'rows': rows}
+
+    def query_alerts(self, conn, params):
+        start, end = self.time_range(params)
+        sensor_id = self.sensor(params) if 'sensor' in params else None
+        rows = read_alerts(conn, start, end, sensor_id).fetchmany(MAX_ROWS)
+        return {'start': start, 'end': end, 'columns': ALERT_COLUMNS, 'rows': rows}
+
+    #------------------------------------------------------------------------
+    # Checks of the query string values (a wrong value is "400 Bad Request")
+    #------------------------------------------------------------------------
+
+    @staticmethod
+    def param(params, name, default):
+        values = params.get(name)
+        return values[-1] if values else default
+
+    def number(self, params, name, default, kind=float):
+        value = self.param(params, name, None)
+        if value is None:
+            return default
+        try:
+            number = kind(value)
+        except ValueError:
+            raise ApiError(400, f"{name} must be a number, not '{value}'")
+        # float() takes 'nan' and 'inf', which are not times nor counts
+        if not math.isfinite(number):
+            raise ApiError(400, f"{name} must be a finite number, not '{value}'")
+        return number
+
+    def time_range(self, params):
+        end = self.number(params, 'end', None)
+        if end is None:
+            end = int(time.time()) + 1
+        start = self.number(params, 'start', end - 3600)
+        if start >= end:
+            raise ApiError(400, "start must be before end")
+        return start, end
+
+    def sensor(self, params):
+        # The sensor of the request, or the first configured sensor
+        if 'sensor' in params:
+            sensor_id = self.param(params, 'sensor', '')
+        else:
+            configured = self.sensor_ids()
+            if not configured:
+                raise ApiError(400, "No sensor configured, give sensor=")
+            sensor_id = configured[0]
+        if not SENSOR_ID_PATTERN.fullmatch(sensor_id):
+            raise ApiError(400, f"Wrong sensor id '{sensor_id}'")
+        return sensor_id
+
+
+# Standalone API, next to a collector running in another process
+if __name__ == '__main__':
+    import sys
+
+    from collector import RAW_COMPRESSION
+
+    server = ApiServer(sys.argv[1] if len(sys.argv) > 1 else 'sensors.db',
+                       address=(sys.argv[3] if len(sys.argv) > 3 else '127.0.0.1',
+                                int(sys.argv[2]) if len(sys.argv) > 2 else API_PORT),
+                       compression=RAW_COMPRESSION)
+    if server.start():
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
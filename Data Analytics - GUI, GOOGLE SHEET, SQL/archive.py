@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the archive of the old raw readings of the dht11 APP. The retention worker moves each
+# day of RawHistory out of sensors.db into one small file per sensor, and the functions below read
+# them back (together with the readings still in the database) for the History page export.
+#
+# A day file is a header, an index of blocks (one block per hour) and the blocks. A block keeps
+# each column on its own (columnar) and compressed with zlib:
+#   ts          - the first time is in the index, then the differences (int32, 2 2 2 2 ...)
+#   temperature - fixed point, 1/100 degree (int16), stored as the difference to the previous one
+#   humidity    - fixed point, 1/100 %, same as temperature
+# Readings change slowly, so most differences are 0 and a day of 43200 readings takes a few KB
+# instead of the ~50 bytes per row of SQLite. The reader maps the file in memory and only
+# decompresses the blocks of the asked time range.
+
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from sensors import DEFAULT_SENSOR
+
+ARCHIVE_DIR = 'archive'
+MAGIC = b'DHTA'
+VERSION = 1
+SCALE = 100       # fixed point: value * 100 as int16 (-327.67 .. 327.67)
+MISSING = -32768  # int16 value used for a missing (NaN) value
+
+HEADER = struct.Struct('<4sHHiI')  # magic, version, columns, scale, block count
+INDEX_DTYPE = np.dtype([('first_ts', '<i8'), ('last_ts', '<i8'), ('count', '<u4'), ('offset', '<u8'),
+                        ('ts_len', '<u4'), ('temp_len', '<u4'), ('hum_len', '<u4')])
+
+
+# Function to get the archive file name of a day (a date or datetime) of a sensor. The default
+# sensor keeps the name of the files made before there were several sensors
+def day_path(directory, day, sensor_id=DEFAULT_SENSOR):
+    if sensor_id == DEFAULT_SENSOR:
+        return os.path.join(directory, f"RawHistory-{day:%Y-%m-%d}.dha")
+    return os.path.join(directory, f"RawHistory-{sensor_id}-{day:%Y-%m-%d}.dha")
+
+
+# Function to get (sensor_id, "YYYY-MM-DD") from an archive file name, None if it is not one
+def parse_archive_name(name):
+    if not (name.startswith("RawHistory-") and name.endswith(".dha")) or len(name) < 25:
+        return None
+    middle, day = name[len("RawHistory-"):-len("YYYY-MM-DD.dha")], name[-len("YYYY-MM-DD.dha"):-len(".dha")]
+    if middle and not middle.endswith("-"):
+        return None
+    return (middle[:-1] or DEFAULT_SENSOR), day
+
+
+# Function to get the ids of the sensors that have archive files
+def archived_sensors(directory=ARCHIVE_DIR):
+    if not os.path.isdir(directory):
+        return set()
+    return {parsed[0] for parsed in map(parse_archive_name, os.listdir(directory)) if parsed is not None}
+
+
+# Function to turn values into fixed point differences (int16, wrapping) and back
+def encode_values(values):
+    fixed = np.round(np.asarray(values, dtype=float) * SCALE)
+    fixed = np.where(np.isnan(fixed), MISSING, fixed).astype(np.int16)
+    return np.diff(fixed, prepend=np.int16(0)).astype('<i2')
+
+
+def decode_values(deltas):
+    fixed = np.cumsum(deltas, dtype=np.int16)
+    values = fixed.astype(float) / SCALE
+    values[fixed == MISSING] = np.nan
+    return values
+
+
+# Function to write readings (ts sorted, epoch seconds) to an archive file, one block per
+# block_seconds. The file is written under a temporary name and renamed when complete.
+def write_archive(path, ts, temperature, humidity, block_seconds=3600):
+    ts = np.asarray(ts, dtype=np.int64)
+    starts = np.flatnonzero(np.diff(ts // block_seconds, prepend=-1)) if len(ts) else np.array([], dtype=int)
+    bounds = list(starts) + [len(ts)]
+    index = np.zeros(len(starts), dtype=INDEX_DTYPE)
+    offset = HEADER.size + index.nbytes
+    blocks = []
+    for i in range(len(starts)):
+        part = slice(bounds[i], bounds[i + 1])
+        columns = [zlib.compress(np.diff(ts[part]).astype('<i4').tobytes(), 6),
+                   zlib.compress(encode_values(temperature[part]).tobytes(), 6),
+                   zlib.compress(encode_values(humidity[part]).tobytes(), 6)]
+        index[i] = (ts[part][0], ts[part][-1], bounds[i + 1] - bounds[i], offset,
+                    len(columns[0]), len(columns[1]), len(columns[2]))
+        offset += sum(len(column) for column in columns)
+        blocks.extend(columns)
+
+    with open(path + '.tmp', 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 3, SCALE, len(index)))
+        file.write(index.tobytes())
+        for column in blocks:
+            file.write(column)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + '.tmp', path)
+
+
+# Function to archive the RawHistory readings of a sensor with start <= ts < end (one day) to
+# `path`. Returns the number of readings archived
+def archive_day(conn, path, start, end, sensor_id=DEFAULT_SENSOR):
+    rows = conn.execute('SELECT ts, temperature, humidity FROM RawHistory '
+                        'WHERE sensor_id = ? AND ts >= ? AND ts < ? ORDER BY ts', (sensor_id, start, end)).fetchall()
+    data = np.array(rows, dtype=float).reshape(-1, 3)
+    write_archive(path, data[:, 0].astype(np.int64), data[:, 1], data[:, 2])
+    return len(rows)
+
+
+# This class reads the archive files of one sensor in a folder. The files are mapped in memory
+# (they never change once written); only the index is parsed, and only the blocks that overlap the
+# asked time range are decompressed.
+class ArchiveReader:
+    def __init__(self, directory=ARCHIVE_DIR, sensor_id=DEFAULT_SENSOR):
+        self.directory = directory
+        self.sensor_id = sensor_id
+        self.files = {}  # path -> (file, mmap, index)
+
+    def close(self):
+        for file, mapped, _ in self.files.values():
+            mapped.close()
+            file.close()
+        self.files = {}
+
+    def open(self, path):
+        if path not in self.files:
+            file = open(path, 'rb')
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, columns, scale, count = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != VERSION or scale != SCALE:
+                mapped.close()
+                file.close()
+                raise ValueError(f"{path} is not a version {VERSION} archive file")
+            # The index is small, it is copied so the map can be closed while the arrays are in use
+            index = np.frombuffer(mapped, dtype=INDEX_DTYPE, count=count, offset=HEADER.size).copy()
+            self.files[path] = (file, mapped, index)
+        return self.files[path]
+
+    def days(self, start, end):
+        # Archive files of the days that overlap start..end (epoch seconds), oldest first
+        day = datetime.fromtimestamp(start).replace(hour=0, minute=0, second=0, microsecond=0)
+        paths = []
+        while day.timestamp() < end:
+            next_day = day + timedelta(days=1)
+            path = day_path(self.directory, day, self.sensor_id)
+            if os.path.exists(path):
+                paths.append((path, int(day.timestamp()), int(next_day.timestamp())))
+            day = next_day
+        return paths
+
+    def first_day(self):
+        # Local midnight of the oldest archived day (epoch seconds), None if there is no file
+        names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        days = sorted(parsed[1] for parsed in map(parse_archive_name, names)
+                      if parsed is not None and parsed[0] == self.sensor_id)
+        if not days:
+            return None
+        return datetime.strptime(days[0], "%Y-%m-%d").timestamp()
+
+    def read(self, start, end):
+        # Readings with start <= ts < end as NumPy arrays (ts, temperature, humidity)
+        parts = []
+        for path, _, _ in self.days(start, end):
+            _, mapped, index = self.open(path)
+            for block in index[(index['last_ts'] >= start) & (index['first_ts'] < end)]:
+                offset = int(block['offset'])
+                lengths = (int(block['ts_len']), int(block['temp_len']), int(block['hum_len']))
+                columns = []
+                for length in lengths:
+                    columns.append(zlib.decompress(mapped[offset:offset + length]))
+                    offset += length
+                ts = np.empty(int(block['count']), dtype=np.int64)
+                ts[0] = block['first_ts']
+                ts[1:] = block['first_ts'] + np.cumsum(np.frombuffer(columns[0], dtype='<i4'), dtype=np.int64)
+                temperature = decode_values(np.frombuffer(columns[1], dtype='<i2'))
+                humidity = decode_values(np.frombuffer(columns[2], dtype='<i2'))
+                keep = (ts >= start) & (ts < end)
+                parts.append((ts[keep], temperature[keep], humidity[keep]))
+        if not parts:
+            return np.array([], dtype=np.int64), np.array([]), np.array([])
+        return tuple(np.concatenate([part[i] for part in parts]) for i in range(3))
+
+
+# Function to read the raw readings of a sensor with start <= ts < end from the archive and
+# sensors.db, as NumPy arrays (ts, temperature, humidity) sorted by time. For a day that has an
+# archive file the file is used (the retention worker may not have deleted all its rows from the
+# database yet). With a reader, the sensor of the reader is read.
+def read_raw(conn, start, end, reader=None, sensor_id=DEFAULT_SENSOR):
+    reader = reader or ArchiveReader(sensor_id=sensor_id)
+    ts, temperature, humidity = reader.read(start, end)
+    rows = conn.execute('SELECT ts, temperature, humidity FROM RawHistory '
+                        'WHERE sensor_id = ? AND ts >= ? AND ts < ? ORDER BY ts',
+                        (reader.sensor_id, int(start), int(end))).fetchall()
+    data = np.array(rows, dtype=float).reshape(-1, 3)
+    db_ts = data[:, 0].astype(np.int64)
+    keep = np.ones(len(db_ts), dtype=bool)
+    for _, day_start, day_end in reader.days(start, end):
+        keep &= (db_ts < day_start) | (db_ts >= day_end)
+    ts = np.concatenate([ts, db_ts[keep]])
+    order = np.argsort(ts, kind='stable')
+    return (ts[order], np.concatenate([temperature, data[keep, 1]])[order],
+            np.concatenate([humidity, data[keep, 2]])[order])
+
+
+# Function to export the raw readings with start <= ts < end to a CSV file, one day at a time
+# (so memory stays small for long ranges), the sensors of each day one after the other.
+# start None is the oldest reading, end None is now, sensor_ids None are all the sensors (of the
+# database and of the archive). Returns the number of readings written
+def export_csv(path, conn, start=None, end=None, directory=ARCHIVE_DIR, sensor_ids=None):
+    if sensor_ids is None:
+        sensor_ids = sorted(archived_sensors(directory) |
+                            {row[0] for row in conn.execute('SELECT DISTINCT sensor_id FROM RawHistory')})
+    readers = [ArchiveReader(directory, sensor_id) for sensor_id in sensor_ids]
+    if start is None:
+        firsts = [reader.first_day() for reader in readers]
+        firsts.append(conn.execute('SELECT min(ts) FROM RawHistory').fetchone()[0])
+        firsts = [t for t in firsts if t is not None]
+        start = min(firsts) if firsts else time.time()
+    end = time.time() + 1 if end is None else end
+    count = 0
+    try:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write("Time,Temperature,Humidity,Sensor\n")
+            day = datetime.fromtimestamp(start).replace(hour=0, minute=0, second=0, microsecond=0)
+            while day.timestamp() < end:
+                next_day = day + timedelta(days=1)
+                for reader in readers:
+                    ts, temperature, humidity = read_raw(conn, max(start, day.timestamp()),
+                                                         min(end, next_day.timestamp()), reader)
+                    for t, temp, hum in zip(ts.tolist(), temperature.tolist(), humidity.tolist()):
+                        file.write(f"{datetime.fromtimestamp(t):%Y-%m-%d %H:%M:%S},{temp:g},{hum:g},"
+                                   f"{reader.sensor_id}\n")
+                    count += len(ts)
+                day = next_day
+    finally:
+        for reader in readers:
+            reader.close()
+    return count
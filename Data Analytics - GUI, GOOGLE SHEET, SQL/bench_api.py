@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# Small benchmark for the HTTP API (api.py): fills a temporary database with a day of fake
+# readings, starts the API on it and asks it for latest / range / rollup answers from several
+# client threads (keep-alive connections), while a writer adds one reading every `interval`
+# seconds like the collector. Prints the requests per second and the p50 / p99 latency.
+#     python bench_api.py [seconds] [clients] [interval]
+
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from api import ApiServer
+from storage import SensorStore
+
+READINGS = 86400  # one day of readings, one a second
+
+
+# Function to fill the database with `READINGS` fake readings ending now
+def fill(store, now):
+    for i in range(READINGS):
+        ts = now - READINGS + i
+        store.insert_reading(datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S"), 20.0 + i % 50 / 10, 55.0,
+                             ts=ts, sensor_id='bench')
+    store.commit()
+
+
+def client(port, now, seconds, latencies, statuses):
+    # The requests of a dashboard: latest reading, the last 10 minutes of readings, and a day of
+    # rollups, again and again (with the ETag of the last answer, like a browser)
+    paths = ['/api/latest?sensor=bench',
+             f'/api/range?sensor=bench&start={now - 600}',
+             f'/api/rollup?sensor=bench&start={now - 86400}']
+    etags = {}
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    end = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < end:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        conn.request('GET', path, headers={'If-None-Match': etags[path]} if path in etags else {})
+        response = conn.getresponse()
+        response.read()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    conn.close()
+
+
+def writer(store, interval, stop):
+    # Adds a reading every `interval` seconds, like the collector
+    while not stop.wait(interval):
+        now = datetime.now()
+        store.insert_reading(now.strftime("%Y-%m-%d %H:%M:%S"), 25.0, 60.0, ts=int(now.timestamp()),
+                             sensor_id='bench')
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    interval = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    with tempfile.TemporaryDirectory(dir='.') as folder:
+        db_path = os.path.join(folder, 'sensors.db')
+        store = SensorStore(db_path, group_commit=1000)
+        now = int(time.time())
+        fill(store, now)
+        store.group_commit = 1
+
+        server = ApiServer(db_path, ('127.0.0.1', 0), sensors=['bench'])
+        server.start()
+        stop = threading.Event()
+        writing = threading.Thread(target=writer, args=(store, interval, stop))
+        writing.start()
+
+        latencies = []  # list.append is thread safe
+        statuses = {}
+        threads = [threading.Thread(target=client, args=(server.port(), now, seconds, latencies, statuses))
+                   for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop.set()
+        writing.join()
+        server.stop()
+        store.close()
+
+    latencies.sort()
+    print(f"{len(latencies) / seconds:.0f} requests/s with {clients} clients, "
+          f"p50 {latencies[len(latencies) // 2]:.2f} ms, p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms")
+    print(f"Answers: {statuses}, cache {server.cache.hits} hits / {server.cache.misses} misses")
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# End-to-end benchmark of the ingest pipeline of the app, on any computer:
+#   simulated sensors (sensors.py) -> Collector (sqlite + outbox) -> uplink to a fake Sheets service
+#   with network latency (fake_sheets.py) -> RawHistory trim -> live graph (matplotlib, no window)
+# It runs the real Collector threads for the given time and reports, for each stage, the p50 / p99
+# latency, the throughput (readings, sheet rows and frames per second) and the memory growth.
+# With --json the results are also written to a file, to compare two versions of the app:
+#     python bench_pipeline.py --rate 200 --seconds 120 --latency 0.3 --json results.json
+# Run it in this folder; it works in a temporary folder, sensors.db is not touched.
+
+import argparse
+import json
+import os
+import platform
+import queue
+import sqlite3
+import subprocess
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import matplotlib
+matplotlib.use('Agg')  # headless, the graph is drawn in memory
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+from collector import Collector
+from compression import CompressionPolicy
+from fake_sheets import FakeSheetsService
+from livechart import LiveChart
+from retention import RetentionPolicy
+from ringbuffer import RingBuffer
+from scheduler import process_rss_mb
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the ingest pipeline")
+    parser.add_argument('--sensors', type=int, default=1, help="number of simulated sensors")
+    parser.add_argument('--rate', type=float, default=50.0, help="readings per second of each sensor")
+    parser.add_argument('--seconds', type=float, default=60.0, help="length of the run")
+    parser.add_argument('--latency', type=float, default=0.2, help="latency of each Sheets request, seconds")
+    parser.add_argument('--invalid-rate', type=float, default=0.02, help="share of failed sensor reads")
+    parser.add_argument('--noise', type=float, default=0.2, help="noise of the simulated values")
+    parser.add_argument('--fps', type=float, default=10.0, help="graph updates per second")
+    parser.add_argument('--summary-interval', type=float, default=30.0, help="seconds between history summaries")
+    parser.add_argument('--compression', choices=['deadband', 'swinging_door'],
+                        help="save only the readings kept by this compression (see compression.py)")
+    parser.add_argument('--keep', type=int, default=10000, help="latest timings kept per stage for p50/p99")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="show the messages of the app")
+    return parser.parse_args()
+
+
+# Function to get the git commit of the app, so results of two versions can be told apart
+def app_version():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+# Function to get the growth of the memory from (seconds, MB) samples: the first 10% of the
+# run (imports, first allocations) are left out, the slope is a least squares line
+def memory_growth(samples):
+    samples = samples[len(samples) // 10:]
+    if len(samples) < 2:
+        return {'start_mb': None, 'end_mb': None, 'peak_mb': None, 'growth_mb': None, 'mb_per_hour': None}
+    seconds, rss = np.array(samples).T
+    slope = np.polyfit(seconds, rss, 1)[0]
+    return {'start_mb': float(rss[0]), 'end_mb': float(rss[-1]), 'peak_mb': float(rss.max()),
+            'growth_mb': float(rss[-1] - rss[0]), 'mb_per_hour': float(slope * 3600)}
+
+
+def run(args, folder):
+    sensors_file = os.path.join(folder, 'sensors.json')
+    with open(sensors_file, 'w', encoding='utf-8') as file:
+        json.dump([{"id": f"sim{i}", "type": "simulator", "interval": 1.0 / args.rate, "seed": i,
+                    "noise": args.noise, "invalid_rate": args.invalid_rate} for i in range(args.sensors)], file)
+
+    service = FakeSheetsService(latency=args.latency)
+    readings = queue.SimpleQueue()  # readings from the sampler threads to the graph (like the GUI)
+    collector = Collector(db_path=os.path.join(folder, 'sensors.db'), spreadsheet_id="bench",
+                          summary_interval=args.summary_interval,
+                          on_reading=lambda now, t, h, sensor_id: readings.put((now.timestamp(), t, h, sensor_id,
+                                                                                time.perf_counter())),
+                          retention=RetentionPolicy(archive_dir=os.path.join(folder, 'archive')),
+                          sensors_file=sensors_file, service_factory=lambda: service,
+                          compression=CompressionPolicy(args.compression) if args.compression else None,
+                          api_address=None)
+    timer = collector.timer
+    timer.keep = args.keep
+
+    # The live graph, drawn by this thread like the GUI does from its main loop
+    figure = Figure(figsize=(8, 6))
+    axes = figure.subplots(2, 1)
+    chart = LiveChart(figure, axes, FigureCanvasAgg(figure), window_seconds=600, blit=True)
+    buffers = {sensor_id: RingBuffer(capacity=1024) for sensor_id in collector.sensor_ids()}
+
+    memory = []
+    started = time.perf_counter()
+    collector.start()
+    next_memory = started
+    while time.perf_counter() - started < args.seconds:
+        frame_start = time.perf_counter()
+        waiting = []
+        while True:
+            try:
+                ts, t, h, sensor_id, queued = readings.get_nowait()
+            except queue.Empty:
+                break
+            buffers[sensor_id].append(ts, t, h)
+            waiting.append(queued)
+        if waiting:
+            latest = max(buffer.last()[RingBuffer.TIME] for buffer in buffers.values() if len(buffer))
+            series = {}
+            for sensor_id, buffer in buffers.items():
+                window = buffer.since(latest - chart.window_seconds - chart.step_seconds)
+                series[sensor_id] = (window[RingBuffer.TIME], window[RingBuffer.TEMPERATURE],
+                                     window[RingBuffer.HUMIDITY])
+            chart.update_series(series, frame_start - started)
+            # Time from the reading to the graph showing it
+            drawn = time.perf_counter()
+            for queued in waiting:
+                timer.record('reading->graph', (drawn - queued) * 1000.0)
+        if frame_start >= next_memory:
+            memory.append((frame_start - started, process_rss_mb()))
+            next_memory += 1.0
+        time.sleep(max(0.0, frame_start + 1.0 / args.fps - time.perf_counter()))
+
+    sampling_seconds = time.perf_counter() - started
+    close_start = time.perf_counter()
+    collector.close()  # stops the samplers, then sends what is left to the fake sheets
+    close_seconds = time.perf_counter() - close_start
+
+    with sqlite3.connect(os.path.join(folder, 'sensors.db')) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM RawHistory").fetchone()[0]
+        pending = conn.execute("SELECT COUNT(*) FROM outbox WHERE state != 'sent'").fetchone()[0]
+
+    stages = timer.stats()
+    frames = chart.frame_stats()
+    if 'p50_ms' in frames:
+        stages['render'] = {'count': frames['blit_frames'] + frames['full_frames'], 'mean_ms': frames['mean_ms'],
+                            'p50_ms': frames['p50_ms'], 'p99_ms': frames['p99_ms'], 'max_ms': frames['max_ms']}
+    return {
+        'throughput': {
+            'seconds': sampling_seconds,
+            'target_readings_per_s': args.rate * args.sensors,
+            'readings_per_s': sum(reader.valid for reader in collector.readers.values()) / sampling_seconds,
+            'readings_stored': stored,
+            'sqlite_commits': collector.store.commit_count,
+            'sheet_rows_per_s': collector.uplink.rows_sent / sampling_seconds,
+            'sheet_rows_sent': collector.uplink.rows_sent,
+            'sheet_requests': dict(service.calls),
+            'outbox_left': pending,
+            'frames_per_s': (frames['blit_frames'] + frames['full_frames']) / sampling_seconds,
+            'blit_frames': frames['blit_frames'],
+            'full_frames': frames['full_frames'],
+            'close_seconds': close_seconds,
+        },
+        'stages': stages,
+        'memory': memory_growth(memory),
+    }
+
+
+def print_results(results):
+    throughput = results['throughput']
+    print(f"Readings: {throughput['readings_per_s']:.1f}/s (target {throughput['target_readings_per_s']:.1f}/s, "
+          f"{throughput['readings_stored']} stored in {throughput['sqlite_commits']} commits)")
+    print(f"Sheets:   {throughput['sheet_rows_per_s']:.1f} rows/s in {sum(throughput['sheet_requests'].values())} "
+          f"requests, {throughput['outbox_left']} rows left in the outbox")
+    print(f"Graph:    {throughput['frames_per_s']:.1f} frames/s ({throughput['blit_frames']} blit / "
+          f"{throughput['full_frames']} full)")
+    print(f"{'stage':>15} {'count':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage, stats in results['stages'].items():
+        print(f"{stage:>15} {stats['count']:>8} {stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+    memory = results['memory']
+    if memory['growth_mb'] is not None:
+        print(f"Memory:   {memory['start_mb']:.1f} -> {memory['end_mb']:.1f} MB (peak {memory['peak_mb']:.1f} MB, "
+              f"{memory['mb_per_hour']:+.1f} MB/hour)")
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        if args.verbose:
+            results = run(args, folder)
+        else:
+            # The app prints a line for each flush and failed read, keep them out of the report
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                results = run(args, folder)
+    results = {'version': app_version(), 'python': platform.python_version(), 'platform': platform.platform(),
+               'params': vars(args), **results}
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.json}")
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# Small benchmark for reading a big RawHistory sheet back, on the fake Sheets service: the whole
+# sheet in one values().get (get_data_from_sheet) against the blocks of iter_sheet_columns. It
+# prints the time, the requests and the peak memory of each, and checks both read the same values.
+# Run it in this folder:  python bench_sheet_read.py [rows] [latency_seconds]
+
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from fake_sheets import FakeSheetsService
+from gsheet import SHEET_HEADERS, get_data_from_sheet, iter_sheet_columns
+from sheetdata import parse_sheet_values
+
+SPREADSHEET_ID = "bench"
+
+
+def make_service(rows, latency):
+    start = datetime(2024, 1, 1)
+    readings = [[f"{start + timedelta(seconds=2 * i):%Y-%m-%d %H:%M:%S}", 20 + i % 100 / 10, 50 + i % 200 / 10]
+                for i in range(rows)]
+    return FakeSheetsService(latency=latency, sheets={"RawHistory": [SHEET_HEADERS["RawHistory"]] + readings})
+
+
+def read_whole(service):
+    # Temperature sum and count, from the whole sheet at once
+    columns = parse_sheet_values(get_data_from_sheet(service, SPREADSHEET_ID, "RawHistory"), "RawHistory")
+    return float(columns["Temperature"].sum()), int(columns["Temperature"].count())
+
+
+def read_blocks(service):
+    total, count = 0.0, 0
+    for columns in iter_sheet_columns(service, SPREADSHEET_ID, "RawHistory"):
+        total += float(columns["Temperature"].sum())
+        count += int(columns["Temperature"].count())
+    return total, count
+
+
+def measure(function, service):
+    service.calls.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(service)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak, sum(service.calls.values())
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    service = make_service(rows, latency)
+    results = []
+    for name, function in (("whole sheet", read_whole), ("blocks", read_blocks)):
+        result, elapsed, peak, requests = measure(function, service)
+        results.append(result)
+        print(f"{name:>12}: {elapsed:6.2f} s, {requests} requests, peak memory {peak / 1e6:6.1f} MB")
+    # The fake service keeps the sheet in memory too, only the memory of the reader is traced
+    assert results[0][1] == results[1][1] == rows and np.isclose(results[0][0], results[1][0])
+    print(f"Both read {rows} readings.")
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# Small benchmark for the app startup. It measures:
+#  - the import time of the app modules, each in a fresh python process
+#  - the google sheets setup, the old way (create_sheet_if_not_exists + ensure_sheet_header for
+#    each sheet) against setup_sheets, on the fake Sheets service with a simulated network latency
+# Run it in this folder:  python bench_startup.py [latency_seconds]
+
+import subprocess
+import sys
+import time
+
+from fake_sheets import FakeSheetsService
+from gsheet import SHEET_HEADERS, create_sheet_if_not_exists, ensure_sheet_header, setup_sheets
+
+SPREADSHEET_ID = "bench"
+MODULES = ['collector', 'gsheet', 'livechart', 'APPdhtLocal']
+
+
+def import_time(module):
+    # Import the module in a new python process, so nothing is cached from this one
+    code = ("import time; start = time.perf_counter(); import " + module +
+            "; print(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    return float(result.stdout.strip().splitlines()[-1]), None
+
+
+def old_setup(service):
+    # What the app did before, at start (6 to 9 requests, one after the other)
+    for sheet_name, header in SHEET_HEADERS.items():
+        create_sheet_if_not_exists(service, SPREADSHEET_ID, sheet_name)
+        ensure_sheet_header(service, SPREADSHEET_ID, sheet_name, header)
+
+
+def new_setup(service):
+    setup_sheets(service, SPREADSHEET_ID)
+
+
+def run_setup(name, setup, latency, existing):
+    # existing=False: empty spreadsheet (first start), True: sheets and headers already there
+    sheets = {sheet_name: [header] for sheet_name, header in SHEET_HEADERS.items()} if existing else {}
+    service = FakeSheetsService(latency=latency, sheets=sheets)
+    start = time.perf_counter()
+    setup(service)
+    elapsed = time.perf_counter() - start
+    return f"{name}: {sum(service.calls.values())} requests, {elapsed:.2f} s"
+
+
+if __name__ == '__main__':
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+
+    print("Import time (fresh process):")
+    for module in MODULES:
+        seconds, error = import_time(module)
+        if error:
+            print(f"  {module}: failed ({error})")
+        else:
+            print(f"  {module}: {seconds * 1000:.0f} ms")
+
+    print(f"\nGoogle Sheets setup with {latency:.2f} s per request:")
+    for existing in (False, True):
+        results = [run_setup(name, setup, latency, existing)
+                   for name, setup in (("old", old_setup), ("setup_sheets", new_setup))]
+        print(f"  {'existing sheets' if existing else 'new spreadsheet'}: " + "; ".join(results))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# Small benchmark for the SQLite write path: inserts fake readings with different journal and
+# sync modes and prints the commit latency of each. Run it on the Pi, in the folder where
+# sensors.db is kept, so it measures the real SD card:  python bench_storage.py [samples]
+
+import os
+import sys
+import tempfile
+
+from storage import SensorStore
+from uplink import Outbox
+
+# (journal_mode, synchronous, group_commit) combinations to compare
+MODES = [
+    ('DELETE', 'FULL', 1),   # sqlite default (what the app used before)
+    ('WAL', 'FULL', 1),
+    ('WAL', 'NORMAL', 1),    # what the app uses
+    ('WAL', 'NORMAL', 10),
+]
+
+
+def run_mode(journal_mode, synchronous, group_commit, samples):
+    # Use a fresh database file in the current folder for each mode
+    fd, db_path = tempfile.mkstemp(suffix='.db', dir='.')
+    os.close(fd)
+    try:
+        store = SensorStore(db_path, journal_mode=journal_mode, synchronous=synchronous,
+                            group_commit=group_commit, outbox=Outbox(db_path))
+        for i in range(samples):
+            timestamp = f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}"
+            store.insert_reading(timestamp, 25.0, 60.0,
+                                 [("RawHistory", [timestamp, 25.0, 60.0]), ("Monitoring", [timestamp, 25.0, 60.0])])
+        store.close()
+        print(store.format_commit_stats())
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    for mode in MODES:
+        run_mode(*mode, samples)
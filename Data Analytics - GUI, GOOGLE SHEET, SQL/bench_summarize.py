@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# Small benchmark for the summary of the rows read back from google sheets. It compares the old
+# summarize_data (a python loop with float() on each cell) with sheetdata.py (NumPy columns), on a
+# RawHistory-like `values` payload of 10k to 1M rows with a few bad and empty cells. The "all
+# columns" time also parses the Time column (as parse_sheet_values does for the charts), the
+# summary itself only parses the number columns.
+# Run it in this folder:  python bench_summarize.py [rows ...]
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from sheetdata import parse_sheet_values, summarize_columns, summarize_sheet_values
+
+
+def make_values(rows, bad_every=997):
+    # Header + rows of (time, temperature, humidity) as text, like values().get returns them
+    random.seed(1)
+    start = datetime(2024, 1, 1)
+    values = [["Time", "Temperature", "Humidity"]]
+    for i in range(rows):
+        row = [f"{start + timedelta(seconds=2 * i):%Y-%m-%d %H:%M:%S}",
+               f"{25 + random.randint(-30, 30) / 10:g}", f"{60 + random.randint(-50, 50) / 10:g}"]
+        if i % bad_every == 0:
+            row[1] = "#N/A"     # a bad cell
+        elif i % bad_every == 1:
+            row = row[:2]       # a short row (empty last cell)
+        values.append(row)
+    return values
+
+
+def old_summarize(data):
+    # The old summarize_data loop (bad cells are skipped, the other cells of the row move left)
+    numeric_data = []
+    for row in data:
+        numeric_row = []
+        for cell in row[1:]:
+            try:
+                numeric_row.append(float(cell))
+            except ValueError:
+                continue
+        if numeric_row:
+            numeric_data.append(numeric_row)
+    # Rows of different lengths can't make an array, only the full ones are kept here
+    width = max(len(row) for row in numeric_data)
+    numeric_array = np.array([row for row in numeric_data if len(row) == width], dtype=float)
+    return (np.mean(numeric_array, axis=0).tolist(), np.min(numeric_array, axis=0).tolist(),
+            np.max(numeric_array, axis=0).tolist())
+
+
+def all_columns_summarize(data):
+    return summarize_columns(parse_sheet_values(data, "RawHistory"))
+
+
+def new_summarize(data):
+    return summarize_sheet_values(data, "RawHistory")
+
+
+def best_time(function, data, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'rows':>9} {'old loop':>10} {'all columns':>12} {'numbers':>10} {'speedup':>8}")
+    for rows in sizes:
+        data = make_values(rows)
+        old_time, _ = best_time(old_summarize, data)
+        all_time, _ = best_time(all_columns_summarize, data)
+        new_time, summary = best_time(new_summarize, data)
+        print(f"{rows:>9} {old_time * 1000:>8.1f}ms {all_time * 1000:>10.1f}ms {new_time * 1000:>8.1f}ms "
+              f"{old_time / new_time:>7.1f}x")
+    for name, stats in summary.items():
+        print(f"  {name}: " + ", ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                                        for key, value in stats.items()))
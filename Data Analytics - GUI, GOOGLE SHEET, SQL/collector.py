@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the data collection part of the dht11 APP: sensor reading -> local database -> google
+# sheets, with the history summaries. The sensors are listed in sensors.json (see sensors.py).
+# It uses no GUI library, so it can run on its own on a headless Pi:
+#     python collector.py [sensors.json]
+# With a sensors file of "simulator" sensors it runs on any computer, without the DHT11.
+# The GUI (APPdhtLocal.py) runs the same Collector, or with --viewer only shows the data that a
+# collector running in another process writes to sensors.db.
+
+import time
+STARTED = time.monotonic()  # to report the startup time
+
+import threading
+from datetime import datetime, timedelta
+from functools import partial
+
+from storage import SensorStore
+from aggregates import WindowAggregator
+from scheduler import SamplingScheduler, StageTimer, report_startup
+from gsheet import get_service, setup_sheets, clear_sheet
+from uplink import Outbox, SheetTrimmer, UplinkWorker
+from retention import RetentionPolicy, RetentionWorker
+from sensors import SENSORS_FILE, create_sensor, load_sensors
+from reader import SensorReader
+from alerts import ALERTS_FILE, AlertEngine, load_rules
+from api import API_PORT, ApiServer
+
+# Your Google Sheets ID
+SPREADSHEET_ID = "12HvdgVRrjt13X6ltcFCL0Hj6tkq0AAwZBulBHkAPHVI"
+
+SAMPLE_INTERVAL = 2.0     # seconds between two sensor readings (for the sensors without "interval")
+SUMMARY_INTERVAL = 120.0  # seconds between two history summaries (minute summary, every 2 minutes)
+DAILY_SUMMARY_AT = None   # set to e.g. "23:30" for one daily summary at that time instead
+
+# RawHistory readings older than 30 days are saved in the archive folder (one compressed file per day)
+# and removed from sensors.db, once an hour. Use max_rows to limit the row count instead or as well,
+# and archive_dir=None to remove them without saving
+RAW_RETENTION = RetentionPolicy(max_age_days=30, max_rows=None, archive_dir='archive')
+
+# Set to e.g. CompressionPolicy('deadband', temperature=0.5, humidity=1.0) to only save (and
+# send to google sheets) the readings needed to draw the series again within 0.5 C and 1 %; the
+# rollups and history summaries still use every reading (see compression.py)
+RAW_COMPRESSION = None
+
+# The HTTP API (see api.py) answers on this address, from this Pi only (it has no login). Set to
+# ('0.0.0.0', API_PORT) to let every computer of the network read the data, or to None to turn it off
+API_ADDRESS = ('127.0.0.1', API_PORT)
+
+
+# This class reads the sensors, saves the readings in sensors.db and the outbox for google sheets,
+# and writes a history summary of each sensor every SUMMARY_INTERVAL seconds (or every day at
+# DAILY_SUMMARY_AT). Each job runs in its own thread:
+#   sampler-<id> - one per sensor, reads it on its own interval and writes the reading
+#   reader-<id>  - one per sensor, does the read itself for its sampler (with a timeout)
+#   summary - writes the history summaries
+#   uplink  - sends the outbox to google sheets
+#   retention - removes (and archives) the old RawHistory readings
+#   api     - answers the HTTP API, with read-only connections of its own
+# The samplers only hold the database lock to write (not while reading the sensor), so a slow or
+# failing sensor doesn't hold up the others.
+# on_reading(now, temperature, humidity, sensor_id) is called from the sampler threads for each
+# good reading (the GUI uses it to get the readings without reading the database), and
+# on_alert(alerts) with the alerts that fired or cleared (the rules are in alerts.json, see alerts.py).
+class Collector:
+    def __init__(self, db_path='sensors.db', spreadsheet_id=SPREADSHEET_ID, sample_interval=SAMPLE_INTERVAL,
+                 summary_interval=SUMMARY_INTERVAL, daily_summary_at=DAILY_SUMMARY_AT, on_reading=None,
+                 retention=RAW_RETENTION, sensors_file=SENSORS_FILE, service_factory=get_service,
+                 compression=RAW_COMPRESSION, alerts_file=ALERTS_FILE, on_alert=None, api_address=API_ADDRESS):
+        self.spreadsheet_id = spreadsheet_id
+        self.service_factory = service_factory  # builds the Sheets service (a fake one in the benchmarks)
+        self.on_reading = on_reading
+        self.on_alert = on_alert
+        self.timer = StageTimer()
+
+        # Start the background uplink, rows are saved in the outbox table of sensors.db and sent in
+        # batches every 15 seconds or every 50 rows. Rows not sent before the app closes are sent
+        # on the next start. RawHistory is trimmed after each flush instead of after each reading,
+        # using the row count from the append responses instead of downloading the sheet.
+        # The Sheets service is built and the sheets are set up by the uplink thread (connect_sheets),
+        # so the app doesn't wait for google at start
+        self.service = None
+        self.rawhistory_trimmer = SheetTrimmer(None, spreadsheet_id, "RawHistory", max_rows=1000)
+        self.uplink = UplinkWorker(None, spreadsheet_id, Outbox(db_path), batch_size=50,
+                                   flush_interval=15.0, after_flush=self.trim_after_flush,
+                                   connect=self.connect_sheets, timer=self.timer)
+
+        # Connect to SQLite database (WAL mode, one transaction per sample), tables are created if
+        # they don't exist. Rows for google sheets go to the uplink outbox in the same transaction
+        self.store = SensorStore(db_path, synchronous='NORMAL', group_commit=1, outbox=self.uplink.outbox)
+
+        # The sensors of sensors.json, each one with its backend (see sensors.py), its reader thread
+        # (see reader.py) and its sampler thread. A failed read is tried again after the minimum
+        # interval of the sensor, at most "retries" times before the next sample time
+        self.sensors = load_sensors(sensors_file, default_interval=sample_interval)
+        self.devices = {config.sensor_id: create_sensor(config) for config in self.sensors}
+        self.readers = {
+            config.sensor_id: SensorReader(self.devices[config.sensor_id],
+                                           read_timeout=float(config.options.get('read_timeout', 0.5)),
+                                           name=f"reader-{config.sensor_id}")
+            for config in self.sensors
+        }
+        self.samplers = {}
+        for config in self.sensors:
+            retry_interval = max(self.devices[config.sensor_id].min_interval, min(1.0, config.interval / 2))
+            self.samplers[config.sensor_id] = SamplingScheduler(
+                partial(self.load_sensor_data, config.sensor_id), interval=config.interval,
+                retry_interval=retry_interval, max_retries=int(config.options.get('retries', 2)),
+                timer=self.timer, name=f"sampler-{config.sensor_id}")
+
+        # Running statistics of the current summary window of each sensor, rebuilt from the
+        # monitoring table so a restart in the middle of a window keeps its readings. With
+        # compression monitoring only has the saved readings, so the minute rollups are used
+        self.window_stats = {}
+        window_start = self.store.window_start() if compression is not None else None
+        for config in self.sensors:
+            self.window_stats[config.sensor_id] = WindowAggregator()
+            if compression is None:
+                self.window_stats[config.sensor_id].load(self.store.conn, sensor_id=config.sensor_id)
+            elif window_start is not None:
+                self.window_stats[config.sensor_id].load_rollups(self.store.conn, window_start, config.sensor_id)
+        self.lock = threading.Lock()  # window_stats and store are used by the sampler and summary threads
+
+        # Optional compression of the saved readings, one compressor per sensor. The readers of
+        # the saved readings (GUI, API) use the policy to rebuild the series
+        self.compression = compression
+        self.compressors = {config.sensor_id: compression.compressor() for config in self.sensors} \
+            if compression is not None else {}
+
+        # The alert rules are checked with every reading, the alerts still active when the app
+        # stopped are read back so they don't fire again
+        self.alerts = AlertEngine(load_rules(alerts_file))
+        self.alerts.load(self.store.conn)
+
+        # Schedule the summary task: every summary_interval seconds, or once a day at daily_summary_at
+        first_summary = summary_interval
+        if daily_summary_at is not None:
+            now = datetime.now()
+            hour, minute = (int(part) for part in daily_summary_at.split(':'))
+            next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+            # If the current time is past the next run time, schedule for the next day
+            if now > next_run:
+                next_run += timedelta(days=1)
+            first_summary = (next_run - now).total_seconds()
+            summary_interval = 24 * 3600
+        self.summary = SamplingScheduler(self.minute_summary, interval=summary_interval, timer=StageTimer(),
+                                         name="summary", start_delay=first_summary)
+
+        # Remove the old RawHistory readings in the background (its own thread and connection)
+        self.retention = RetentionWorker(db_path, retention, interval=3600.0)
+
+        # The HTTP API, its latest readings come from the readers (they can be newer than the database)
+        self.api = ApiServer(db_path, api_address, sensors=self.sensor_ids(), latest=self.latest_reading,
+                             timer=self.timer, compression=compression) if api_address is not None else None
+
+    def connect_sheets(self):
+        # This runs in the uplink thread: build the Sheets service, create the sheets and headers
+        # if needed (one metadata request + one batchUpdate) and keep the RawHistory sheetId
+        service = self.service_factory()
+        sheet_ids = setup_sheets(service, self.spreadsheet_id)
+        self.rawhistory_trimmer.service = service
+        self.rawhistory_trimmer.sheet_id = sheet_ids.get("RawHistory")
+        self.service = service
+        return service
+
+    def clear_monitoring_sheet(self):
+        # This runs in the uplink thread, after the Monitoring rows queued before it have been sent
+        clear_sheet(self.service, self.spreadsheet_id, "Monitoring")
+
+    def trim_after_flush(self, sent):
+        if "RawHistory" in sent:
+            with self.timer.stage('trim'):
+                self.rawhistory_trimmer.rows_appended(sent["RawHistory"], self.uplink.last_row.get("RawHistory"))
+
+    def start(self):
+        # Start everything (the headless collector)
+        self.start_uplink_and_summary()
+        self.start_sampling()
+
+    def start_uplink_and_summary(self):
+        # Start everything except sensor reading (the GUI starts it with its Start button)
+        self.uplink.start()
+        self.summary.start()
+        self.retention.start()
+        if self.api is not None:
+            self.api.start()
+
+    def sensor_ids(self):
+        return [config.sensor_id for config in self.sensors]
+
+    def latest_reading(self, sensor_id):
+        # (epoch seconds, temperature, humidity) of the last good reading of a sensor, or None
+        reader = self.readers.get(sensor_id)
+        latest = reader.latest if reader is not None else None
+        if latest is None:
+            return None
+        return latest[0], latest[1].temperature, latest[1].humidity
+
+    def sensor_stats(self):
+        # Counters of each sensor: reads, invalid rate, timeouts, errors, read latency (see
+        # reader.py) and the samples given up after all their retries
+        return {sensor_id: dict(reader.stats(), skipped=self.samplers[sensor_id].skipped)
+                for sensor_id, reader in self.readers.items()}
+
+    def format_sensor_stats(self):
+        return "\n".join(f"Sensor {sensor_id}: {self.readers[sensor_id].format_stats()}, "
+                         f"{self.samplers[sensor_id].skipped} samples skipped" +
+                         (f", 1 reading saved in {self.compressors[sensor_id].ratio():.1f}"
+                          if sensor_id in self.compressors else "")
+                         for sensor_id in self.readers)
+
+    def start_sampling(self):
+        for sampler in self.samplers.values():
+            sampler.start()
+
+    def stop_sampling(self):
+        for sampler in self.samplers.values():
+            sampler.stop()
+
+    def close(self):
+        # Stop the threads, write what is pending, then release the sensors (GPIO pins)
+        self.stop_sampling()
+        if self.api is not None:
+            self.api.stop()
+        with self.lock:
+            # The last reading of each sensor, if the compression has not saved it yet
+            for sensor_id, compressor in self.compressors.items():
+                for reading in compressor.flush():
+                    self.save_reading(sensor_id, reading, rollup=False)
+        self.summary.stop()
+        self.retention.stop()
+        self.store.close()
+        self.uplink.stop()
+        for sensor_id, device in self.devices.items():
+            self.readers[sensor_id].close()
+            device.close()
+
+    def load_sensor_data(self, sensor_id):
+        # This runs in the sampler thread of the sensor.
+        # Returns False when the reading is not valid, the sampler then tries again after 1 second
+        with self.timer.stage('read'):
+            result = self.readers[sensor_id].read()
+        if not result.is_valid():
+            print("Error (%s): %d" % (sensor_id, result.error_code))
+            return False
+
+        temperature = result.temperature
+        humidity = result.humidity
+        now = datetime.now()
+
+        # Insert data into the SQLite Local database, together with the rows for
+        # Google Sheets in the outbox (one transaction). The uplink thread sends them
+        # in batches and trims RawHistory after each flush.
+        # With compression, only the readings it keeps are saved (it can keep the reading before
+        # this one), every reading goes to the rollups
+        reading = (now.strftime("%Y-%m-%d %H:%M:%S"), int(now.timestamp()), temperature, humidity)
+        compressor = self.compressors.get(sensor_id)
+        with self.timer.stage('sqlite'):
+            with self.lock:
+                self.window_stats[sensor_id].add(temperature, humidity)
+                if compressor is None:
+                    saved = [reading]
+                else:
+                    saved = compressor.add(now.timestamp(), temperature, humidity, reading)
+                    self.store.add_to_rollups(temperature, humidity, reading[1], sensor_id)
+                # The alerts are saved with the reading (or alone when the compression keeps nothing)
+                fired = self.alerts.add(sensor_id, now.timestamp(), temperature, humidity)
+                self.store.add_alerts(fired)
+                for saved_reading in saved:
+                    self.save_reading(sensor_id, saved_reading, rollup=compressor is None)
+                if fired and not saved:
+                    self.store.commit()
+        if saved:
+            self.uplink.notify(2 * len(saved))
+
+        for alert in fired:
+            print(f"Alert ({sensor_id}): {alert.text()}")
+        if self.on_reading is not None:
+            self.on_reading(now, temperature, humidity, sensor_id)
+        if fired and self.on_alert is not None:
+            self.on_alert(fired)
+        return True
+
+    def save_reading(self, sensor_id, reading, rollup=True):
+        # Write a reading (time text, ts, temperature, humidity) to the database and the outbox
+        timestamp, ts, temperature, humidity = reading
+        self.store.insert_reading(timestamp, temperature, humidity,
+                                  [("RawHistory", [timestamp, temperature, humidity, sensor_id]),
+                                   ("Monitoring", [timestamp, temperature, humidity, sensor_id])],
+                                  ts=ts, sensor_id=sensor_id, rollup=rollup)
+
+    def minute_summary(self):
+        # This runs in the summary thread (every 2 minutes, or daily)
+        # Get the current date for history record
+        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.lock:
+            # Get the statistics of the window of each sensor, they are updated with every reading
+            summaries = []
+            for sensor_id, window_stats in self.window_stats.items():
+                history_data = window_stats.summary_row(current_date)
+                window_stats.reset()
+                # Check if stats are valid (not empty)
+                if history_data:
+                    summaries.append((history_data, sensor_id))
+
+            if summaries:
+                # Insert into local database and empty the monitoring table in one transaction,
+                # the summaries are saved in the outbox for google sheets (sent by the uplink thread)
+                self.store.add_summaries(summaries, [("History", list(history_data) + [sensor_id])
+                                                     for history_data, sensor_id in summaries])
+                self.uplink.notify(len(summaries))
+            else:
+                self.store.clear_monitoring()
+
+            # Delete the rollup rows that are past the retention of their tier
+            self.store.prune_rollups()
+
+        # Report the SQLite commit latency and the time of each stage, to compare the modes on the Pi
+        print(f"SQLite commit latency: {self.store.format_commit_stats()}")
+        print(f"Stage timing: {self.timer.format()}")
+        print(self.format_sensor_stats())
+
+        # Clear Monitoring sheet, after the Monitoring rows already queued have been sent
+        self.uplink.submit_task(self.clear_monitoring_sheet)
+        return True
+
+
+# Headless collector entry point
+if __name__ == '__main__':
+    import signal
+    import sys
+
+    # Stop cleanly when the service manager stops the collector (SIGTERM)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    collector = Collector(sensors_file=sys.argv[1] if len(sys.argv) > 1 else SENSORS_FILE)
+    collector.start()
+    report_startup("headless collector", STARTED)
+    try:
+        # Everything runs in the collector threads, just wait here until Ctrl+C or SIGTERM
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.close()
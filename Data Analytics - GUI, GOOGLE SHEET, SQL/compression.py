@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the compression part of the dht11 APP: temperature and humidity hardly change from one
+# reading to the next, so only the readings needed to draw the series again within a set error
+# are written to RawHistory, monitoring and google sheets. The others only go to the rollups
+# (see storage.py) and to the history summaries, which stay exact.
+#
+# Two methods:
+#   'deadband'      - a reading is kept when it is more than the deviation away from the last kept
+#                     reading. The series is rebuilt by holding the last kept value ('previous').
+#   'swinging_door' - a reading is kept when the straight line from the last kept reading to the
+#                     next one would pass further than the deviation from a reading in between.
+#                     The series is rebuilt by drawing straight lines between the kept readings
+#                     ('linear'), as a graph does anyway.
+# The deadband keeps fewer readings when they are noisy (or in steps, like the whole degrees of
+# the DHT11), the swinging door when they change slowly and smoothly.
+# With both, a reading is kept at least every max_gap seconds, so a longer hole in the kept
+# readings means the sensor was not read (and is not filled in by interpolate()).
+# The readers of the saved readings rebuild the series: the trend graph and /api/range?step= with
+# read_interpolated(), the live graph of the viewer by drawing the lines with drawstyle().
+
+import math
+
+# numpy is only needed to rebuild the series, so it is imported in interpolate() and
+# read_interpolated(): the collector compresses without loading it
+
+METHODS = ('deadband', 'swinging_door')
+REBUILD = {'deadband': 'previous', 'swinging_door': 'linear'}
+
+
+# Settings of the compression (deviations in C and %)
+class CompressionPolicy:
+    def __init__(self, method='deadband', temperature=0.5, humidity=1.0, max_gap=300.0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown compression method '{method}' (known: {', '.join(METHODS)})")
+        self.method = method
+        self.deviations = (float(temperature), float(humidity))
+        self.max_gap = float(max_gap)
+
+    def compressor(self):
+        return ReadingCompressor(self)
+
+    def rebuild(self):
+        # How the series is rebuilt from the kept readings: 'previous' or 'linear'
+        return REBUILD[self.method]
+
+    def drawstyle(self):
+        # matplotlib drawstyle of a line through the kept readings that shows the rebuilt series
+        # (steps that hold the last value for the deadband, straight lines for the swinging door)
+        return 'steps-post' if self.rebuild() == 'previous' else 'default'
+
+
+# This class compresses the readings of one sensor. add() gets every reading and returns the
+# items to keep, oldest first: the swinging door only knows a reading must be kept when the next
+# one arrives, so a kept item can be the one of the reading before. flush() returns the last
+# reading if it was not kept yet (when the app stops, so the series ends at the right value).
+class ReadingCompressor:
+    def __init__(self, policy):
+        self.policy = policy
+        self.kept = None      # (time, values) of the last kept reading
+        self.previous = None  # (time, values, item) of the last reading, if it was not kept
+        self.low = None       # swinging door: highest lower slope and lowest upper slope of each value
+        self.high = None
+        self.readings = 0
+        self.written = 0
+
+    def ratio(self):
+        # Readings per kept reading
+        return self.readings / self.written if self.written else 0.0
+
+    def add(self, time, temperature, humidity, item):
+        self.readings += 1
+        values = (temperature, humidity)
+        if self.kept is None or time - self.kept[0] >= self.policy.max_gap:
+            return self.keep_current(time, values, item)
+
+        if self.policy.method == 'deadband':
+            if any(abs(value - kept) > deviation
+                   for value, kept, deviation in zip(values, self.kept[1], self.policy.deviations)):
+                return self.keep_current(time, values, item)
+            self.previous = (time, values, item)
+            return []
+
+        # Swinging door: is the line from the kept reading to this one still good enough?
+        if self.fits(time, values):
+            self.previous = (time, values, item)
+            return []
+        # The door is open: keep the reading before, and start again from it. The new door is
+        # wide open, this reading always fits and only narrows it
+        kept = self.keep(self.previous)
+        self.fits(time, values)
+        self.previous = (time, values, item)
+        return kept
+
+    def fits(self, time, values):
+        # The straight line from the kept reading to this one must pass within the deviation of
+        # every reading in between: its slope must be inside the slopes allowed by them
+        start, start_values = self.kept
+        elapsed = max(time - start, 1e-6)
+        for low, high, value, kept in zip(self.low, self.high, values, start_values):
+            if not low <= (value - kept) / elapsed <= high:
+                return False
+        self.low = [max(low, (value - deviation - kept) / elapsed)
+                    for low, value, kept, deviation in zip(self.low, values, start_values, self.policy.deviations)]
+        self.high = [min(high, (value + deviation - kept) / elapsed)
+                     for high, value, kept, deviation in zip(self.high, values, start_values, self.policy.deviations)]
+        return True
+
+    def keep(self, reading):
+        time, values, item = reading
+        self.kept = (time, values)
+        self.previous = None
+        self.low = [-math.inf, -math.inf]
+        self.high = [math.inf, math.inf]
+        self.written += 1
+        return [item]
+
+    def keep_current(self, time, values, item):
+        return self.keep((time, values, item))
+
+    def flush(self):
+        if self.previous is None:
+            return []
+        return self.keep(self.previous)
+
+
+# Function to rebuild values at the query times from the kept readings (times in increasing
+# order), with 'linear' (swinging door) or 'previous' (deadband). Query times before the first,
+# after the last kept reading, or in a hole longer than max_gap (the sensor was not read) are NaN.
+def interpolate(times, values, query_times, method='linear', max_gap=300.0):
+    import numpy as np
+
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    query_times = np.asarray(query_times, dtype=float)
+    result = np.full(len(query_times), np.nan)
+    if len(times) == 0:
+        return result
+
+    after = np.searchsorted(times, query_times, side='right')  # index of the next kept reading
+    before = after - 1
+    inside = (before >= 0) & ((after < len(times)) | (query_times == times[-1]))
+    following = np.minimum(after, len(times) - 1)
+    # A hole: the kept readings around the query time are more than max_gap (and a bit) apart.
+    # A query time on a kept reading is not in the hole, even if the reading is the last before it
+    exact = (before >= 0) & (times[np.maximum(before, 0)] == query_times)
+    inside &= ((times[following] - times[np.maximum(before, 0)]) <= max_gap * 1.5) | exact
+    if method == 'previous':
+        result[inside] = values[before[inside]]
+    else:
+        result[inside] = np.interp(query_times[inside], times, values)
+    return result
+
+
+# Function to read the readings of one sensor with start <= ts < end (database and archive, see
+# archive.read_raw) and rebuild them every `step` seconds. Returns (times, temperature, humidity).
+def read_interpolated(conn, start, end, step, policy=None, reader=None, sensor_id=None):
+    import numpy as np
+
+    from archive import read_raw
+    from sensors import DEFAULT_SENSOR
+
+    policy = policy or CompressionPolicy()
+    times, temperature, humidity = read_raw(conn, start, end, reader, sensor_id or DEFAULT_SENSOR)
+    query_times = np.arange(math.ceil(start / step) * step, end, step, dtype=float)
+    method = policy.rebuild()
+    return (query_times, interpolate(times, temperature, query_times, method, policy.max_gap),
+            interpolate(times, humidity, query_times, method, policy.max_gap))
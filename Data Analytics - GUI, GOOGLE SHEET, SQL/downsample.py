@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the downsampling part of the dht11 APP: a graph of days or months has far more readings
+# than pixels, so only the points that change the picture are given to matplotlib.
+#
+# Both functions return the indexes of the points to keep (sorted), so the same points can be
+# taken from the other columns (the humidity of the chosen temperature points, for example).
+
+import numpy as np
+
+
+# Function to choose `threshold` points of (x, y) with Largest-Triangle-Three-Buckets: the first and
+# last points are kept, the others are split in threshold - 2 buckets and from each bucket the
+# point making the largest triangle with the point kept before it and the mean of the next bucket
+# is kept. The line keeps its shape (peaks included) with few points.
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Bucket i is edges[i]..edges[i + 1] - 1 (the first and last points are not in a bucket)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Mean of the next bucket (the last point for the last bucket)
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+        # Twice the area of the triangles (a, each point of the bucket, mean of the next bucket)
+        areas = np.abs((x[a] - mean_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y - y[a]))
+        a = start + int(np.argmax(areas))
+        kept[i + 1] = a
+    return kept
+
+
+# Function to choose the lowest and the highest point of y in each of `buckets` equal parts of the
+# x range (one bucket per pixel), so no peak is lost. At most 2 * buckets points are kept.
+def minmax(x, y, buckets):
+    n = len(x)
+    if n <= 2 * buckets or buckets < 1:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.searchsorted(x, np.linspace(x[0], x[-1], buckets + 1)[1:-1], side='left')
+    kept = []
+    for start, end in zip(np.concatenate([[0], edges]), np.concatenate([edges, [n]])):
+        if end > start:
+            part = y[start:end]
+            kept.extend((start + int(np.argmin(part)), start + int(np.argmax(part))))
+    return np.unique(kept)
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# A small in-memory stand-in for the Google Sheets API service (the object returned by
+# gsheet.get_service()). It supports the calls used by this app, so the benchmarks can run
+# without a google account or network. Every call can be given a fixed latency to act like a
+# slow link, and the number of calls of each kind is counted in `calls`.
+#
+#   service = FakeSheetsService(latency=0.2)
+#   service.spreadsheets().values().append(spreadsheetId=..., range="RawHistory!A:A", ...).execute()
+
+import re
+import threading
+import time
+from collections import Counter
+
+
+# Function to turn column letters into a 0-based index (A -> 0, Z -> 25, AA -> 26)
+def column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index - 1
+
+
+# Function to turn a 0-based column index into letters
+def column_letters(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+
+# Function to split an A1 range ("Sheet!A2:C10", "Sheet!A:A", "Sheet") into
+# (sheet_name, first_row, last_row, first_col, last_col), 0-based, None when open-ended
+def parse_range(a1_range):
+    sheet_name, _, cells = a1_range.partition('!')
+    sheet_name = sheet_name.strip("'")
+    if not cells:
+        return sheet_name, None, None, None, None
+    start, _, end = cells.partition(':')
+    end = end or start
+    bounds = []
+    for part in (start, end):
+        match = re.fullmatch(r'([A-Za-z]*)(\d*)', part)
+        letters, digits = match.groups()
+        bounds.append((column_index(letters) if letters else None, int(digits) - 1 if digits else None))
+    (first_col, first_row), (last_col, last_row) = bounds
+    return sheet_name, first_row, last_row, first_col, last_col
+
+
+# Function to show a value the way the Sheets API returns it (as text, 25.0 -> "25")
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class FakeRequest:
+    def __init__(self, service, name, func):
+        self.service = service
+        self.name = name
+        self.func = func
+
+    def execute(self):
+        self.service.calls[self.name] += 1
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        with self.service.lock:
+            return self.func()
+
+
+class FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return FakeRequest(self.service, 'values.get', lambda: self.service.read_range(range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        return FakeRequest(self.service, 'values.batchGet',
+                           lambda: {'valueRanges': [self.service.read_range(r) for r in ranges]})
+
+    def update(self, spreadsheetId, range, body, **kwargs):
+        return FakeRequest(self.service, 'values.update', lambda: self.service.write_range(range, body['values']))
+
+    def append(self, spreadsheetId, range, body, **kwargs):
+        return FakeRequest(self.service, 'values.append', lambda: self.service.append_rows(range, body['values']))
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        return FakeRequest(self.service, 'values.clear', lambda: self.service.clear_range(range))
+
+
+class FakeSpreadsheets:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, spreadsheetId, **kwargs):
+        return FakeRequest(self.service, 'get', self.service.metadata)
+
+    def batchUpdate(self, spreadsheetId, body):
+        return FakeRequest(self.service, 'batchUpdate', lambda: self.service.batch_update(body['requests']))
+
+    def values(self):
+        return FakeValues(self.service)
+
+
+# The fake service. `sheets` is {sheet_name: list of rows}, each row a list of cell values.
+class FakeSheetsService:
+    def __init__(self, latency=0.0, sheets=None):
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.sheets = {}
+        self.sheet_ids = {}
+        for sheet_name, rows in (sheets or {}).items():
+            self.add_sheet(sheet_name)
+            self.sheets[sheet_name] = [list(row) for row in rows]
+
+    def spreadsheets(self):
+        return FakeSpreadsheets(self)
+
+    def add_sheet(self, sheet_name, sheet_id=None):
+        if sheet_id is None:
+            sheet_id = max(self.sheet_ids.values(), default=0) + 1
+        self.sheets[sheet_name] = []
+        self.sheet_ids[sheet_name] = sheet_id
+
+    def metadata(self):
+        return {'sheets': [{'properties': {'title': name, 'sheetId': sheet_id,
+                                           'gridProperties': {'rowCount': self.grid_rows(name), 'columnCount': 26}}}
+                           for name, sheet_id in self.sheet_ids.items()]}
+
+    def grid_rows(self, sheet_name):
+        # A new sheet has 1000 rows, appends add rows to the grid
+        return max(1000, len(self.rows_of(sheet_name)))
+
+    def rows_of(self, sheet_name):
+        if sheet_name not in self.sheets:
+            raise ValueError(f"Unable to parse range: {sheet_name}")
+        return self.sheets[sheet_name]
+
+    def read_range(self, a1_range):
+        sheet_name, first_row, last_row, first_col, last_col = parse_range(a1_range)
+        rows = self.rows_of(sheet_name)
+        first_row = first_row or 0
+        if first_row >= self.grid_rows(sheet_name):
+            # Like the real API, a range can't start after the last row of the grid
+            raise ValueError(f"Range ({a1_range}) exceeds grid limits. Max rows: {self.grid_rows(sheet_name)}")
+        last_row = len(rows) - 1 if last_row is None else min(last_row, len(rows) - 1)
+        first_col = first_col or 0
+        values = []
+        for row in rows[first_row:last_row + 1]:
+            cells = row[first_col:] if last_col is None else row[first_col:last_col + 1]
+            # Like the real API, empty cells at the end of a row are left out
+            while cells and cells[-1] in ("", None):
+                cells = cells[:-1]
+            values.append([format_value(cell) for cell in cells])
+        # and empty rows at the end of the range too
+        while values and not values[-1]:
+            values.pop()
+        result = {'range': a1_range, 'majorDimension': 'ROWS'}
+        if values:
+            result['values'] = values
+        return result
+
+    def write_range(self, a1_range, values):
+        sheet_name, first_row, _, first_col, _ = parse_range(a1_range)
+        rows = self.rows_of(sheet_name)
+        first_row = first_row or 0
+        first_col = first_col or 0
+        for i, new_row in enumerate(values):
+            while len(rows) <= first_row + i:
+                rows.append([])
+            row = rows[first_row + i]
+            while len(row) < first_col + len(new_row):
+                row.append("")
+            row[first_col:first_col + len(new_row)] = list(new_row)
+        return {'updatedRows': len(values)}
+
+    def append_rows(self, a1_range, values):
+        sheet_name = parse_range(a1_range)[0]
+        rows = self.rows_of(sheet_name)
+        # The real API appends after the last row that has data
+        while rows and not any(cell not in ("", None) for cell in rows[-1]):
+            rows.pop()
+        first = len(rows) + 1
+        rows.extend(list(row) for row in values)
+        width = max((len(row) for row in values), default=1)
+        return {'updates': {
+            'updatedRange': f"{sheet_name}!A{first}:{column_letters(width - 1)}{len(rows)}",
+            'updatedRows': len(values),
+        }}
+
+    def clear_range(self, a1_range):
+        sheet_name, first_row, last_row, first_col, last_col = parse_range(a1_range)
+        rows = self.rows_of(sheet_name)
+        first_row = first_row or 0
+        last_row = len(rows) - 1 if last_row is None else min(last_row, len(rows) - 1)
+        for row in rows[first_row:last_row + 1]:
+            end = len(row) if last_col is None else min(len(row), last_col + 1)
+            for col in range(first_col or 0, end):
+                row[col] = ""
+        return {'clearedRange': a1_range}
+
+    def batch_update(self, requests):
+        replies = []
+        for request in requests:
+            if 'addSheet' in request:
+                properties = request['addSheet']['properties']
+                if properties['title'] in self.sheets:
+                    raise ValueError(f"A sheet with the name \"{properties['title']}\" already exists.")
+                self.add_sheet(properties['title'], properties.get('sheetId'))
+                replies.append({'addSheet': {'properties': {'title': properties['title'],
+                                                            'sheetId': self.sheet_ids[properties['title']]}}})
+            elif 'deleteDimension' in request:
+                dimension = request['deleteDimension']['range']
+                rows = self.rows_of(self.sheet_name_of(dimension['sheetId']))
+                del rows[dimension['startIndex']:dimension['endIndex']]
+                replies.append({})
+            elif 'updateCells' in request:
+                update = request['updateCells']
+                start = update['start']
+                values = [[next(iter(cell.get('userEnteredValue', {'stringValue': ''}).values()))
+                           for cell in row.get('values', [])] for row in update['rows']]
+                sheet_name = self.sheet_name_of(start['sheetId'])
+                self.write_range(f"{sheet_name}!{column_letters(start.get('columnIndex', 0))}{start.get('rowIndex', 0) + 1}",
+                                 values)
+                replies.append({})
+            else:
+                raise ValueError(f"Request not supported by the fake service: {list(request)}")
+        return {'replies': replies}
+
+    def sheet_name_of(self, sheet_id):
+        for name, known_id in self.sheet_ids.items():
+            if known_id == sheet_id:
+                return name
+        raise ValueError(f"No grid with id: {sheet_id}")
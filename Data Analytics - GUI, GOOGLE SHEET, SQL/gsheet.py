@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the google sheets part of the dht11 APP, used by both the GUI and the headless collector.
+
+import time
+
+# The google and numpy libraries are slow to import, so they are imported inside the functions
+# that need them (the first call pays for it, not the start of the app)
+
+#----------------------------------------------------------------------------
+# Google Sheets setup: functions to manage data in google sheets
+#----------------------------------------------------------------------------
+
+# Create a service object for interacting with Google Sheets API
+def get_service():
+    #import to connect to google sheets
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
+    # Load credentials from the service account file
+    creds = service_account.Credentials.from_service_account_file(
+        "mydata.json", # Path to your service account credentials file
+        scopes=["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+    )
+
+    # Build the Sheets API service object using the credentials
+    service = build('sheets', 'v4', credentials=creds)
+    return service
+
+
+# Function to create a new sheet in the spreadsheet if it doesn't already exist
+def create_sheet_if_not_exists(service, spreadsheet_id, sheet_name):
+    try:
+        # Get metadata of the spreadsheet to check for existing sheets
+        sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+        sheets = sheet_metadata.get('sheets', [])
+        sheet_names = [sheet['properties']['title'] for sheet in sheets]
+
+        # If the specified sheet name does not exist, create it
+        if sheet_name not in sheet_names:
+            requests = [{
+                "addSheet": {
+                    "properties": {
+                        "title": sheet_name
+                    }
+                }
+            }]
+            body = {
+                'requests': requests
+            }
+
+            # Send the batchUpdate request to create the sheet
+            service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body=body
+            ).execute()
+            print(f"Sheet '{sheet_name}' created.")
+        else:
+            print(f"Sheet '{sheet_name}' already exists.")
+    except Exception as e:
+        print(f"Failed to create sheet: {str(e)}")
+
+
+# Function to ensure that the specified sheet has the correct header row
+def ensure_sheet_header(service, spreadsheet_id, sheet_name, header):
+    try:
+        # Retrieve the first row (header) from the specified sheet
+        result = service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{sheet_name}!A1:Z1"
+        ).execute()
+        values = result.get('values', [])
+
+        # If the header row is empty, update it with the provided header
+        if not values:  
+            body = {"values": [header]} # The header to insert
+            service.spreadsheets().values().update(
+                spreadsheetId=spreadsheet_id,
+                range=f"{sheet_name}!A1:Z1",
+                valueInputOption="USER_ENTERED",  # Insert the values as entered by the user
+                body=body
+            ).execute()
+            print(f"Header created in '{sheet_name}' sheet.")
+        else:
+            print(f"Header already exists in '{sheet_name}' sheet.")
+    except Exception as e:
+        print(f"Failed to ensure header in '{sheet_name}' sheet: {str(e)}")
+
+
+# Function to retrieve data from a Google Sheets sheet
+def get_data_from_sheet(service, spreadsheet_id, sheet_name):
+    try:
+        # Retrieve all data from the specified sheet
+        result = service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{sheet_name}"
+        ).execute()
+        return result.get('values', [])
+    except Exception as e:
+        print(f"Failed to get data from sheet: {str(e)}")
+        return []
+
+
+# Function to read a sheet block by block, without holding the whole sheet in memory.
+# It yields the `values` of each block of block_rows rows (only the columns first_col..last_col,
+# letters), from start_row (2: after the header row) to the last row with data. Each request is
+# one batchGet of blocks_per_request blocks; empty blocks are not yielded, and the reading stops
+# at a request whose last block is empty (the rest of the grid is empty). Errors are raised.
+def iter_sheet_values(service, spreadsheet_id, sheet_name, first_col="A", last_col="C", start_row=2,
+                      block_rows=5000, blocks_per_request=4):
+    # The number of rows of the sheet (reading after the last row of the grid is an error)
+    sheet_metadata = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields="sheets.properties(title,gridProperties.rowCount)"
+    ).execute()
+    row_count = next(sheet['properties']['gridProperties']['rowCount'] for sheet in sheet_metadata['sheets']
+                     if sheet['properties']['title'] == sheet_name)
+
+    row = start_row
+    while row <= row_count:
+        blocks = []
+        while row <= row_count and len(blocks) < blocks_per_request:
+            blocks.append(f"{sheet_name}!{first_col}{row}:{last_col}{min(row + block_rows - 1, row_count)}")
+            row += block_rows
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=blocks
+        ).execute()
+        value_ranges = result.get('valueRanges', [])
+        for value_range in value_ranges:
+            if value_range.get('values'):
+                yield value_range['values']
+        if not value_ranges or not value_ranges[-1].get('values'):
+            break
+
+
+# Function to read a sheet block by block (see iter_sheet_values) and yield each block parsed to
+# {column name: masked array} (see sheetdata.parse_sheet_values). The schema is the one of the
+# sheet in sheetdata.SHEET_SCHEMAS if not given; its columns are read, starting from column A.
+def iter_sheet_columns(service, spreadsheet_id, sheet_name, schema=None, start_row=2, block_rows=5000,
+                       blocks_per_request=4):
+    from sheetdata import SHEET_SCHEMAS, parse_sheet_values
+
+    schema = schema or SHEET_SCHEMAS[sheet_name]
+    last_col = chr(ord("A") + len(schema) - 1)
+    for values in iter_sheet_values(service, spreadsheet_id, sheet_name, "A", last_col, start_row,
+                                    block_rows, blocks_per_request):
+        yield parse_sheet_values(values, schema)
+
+
+# Function to clear all data from a Google Sheets sheet.
+# Errors (e.g. RATE_LIMIT_EXCEEDED) are raised, the uplink runs it again after its backoff delay.
+def clear_sheet(service, spreadsheet_id, sheet_name):
+    service.spreadsheets().values().clear(
+        spreadsheetId=spreadsheet_id,
+        range=f"{sheet_name}!A1:Z1000",
+        body={}
+    ).execute()
+    print(f"Data cleared from sheet: {sheet_name}")
+
+
+# Function to summarize data from a Google Sheets sheet (the `values` of sheet_name, with or
+# without its header row)
+def summarize_data(data, sheet_name="Monitoring"):
+    from sheetdata import summarize_sheet_values
+
+    # Each column is parsed on its own with the types of the sheet (see sheetdata.py), so a bad
+    # cell is only left out of its own column and never moves the next values of its row into
+    # another column. The header row is skipped, and only the number columns are parsed and
+    # summarized (not Time, Sensor nor Row Id)
+    summary = summarize_sheet_values(data, sheet_name)
+
+    # If there is no valid value, return an empty list
+    if not any(stats['count'] for stats in summary.values()):
+        return []
+
+    # Mean, minimum, and maximum values for each column (None for a column without valid values)
+    mean_values = [stats['mean'] for stats in summary.values()]
+    min_values = [stats['min'] for stats in summary.values()]
+    max_values = [stats['max'] for stats in summary.values()]
+
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    return [timestamp] + mean_values + min_values + max_values # Return the summary data
+
+
+# Sheets used by the app and their header rows. The last column is the row key written by the
+# uplink (the outbox id of the row, see uplink.Outbox)
+SHEET_HEADERS = {
+    "RawHistory": ["Time", "Temperature", "Humidity", "Sensor", "Row Id"],
+    "Monitoring": ["Time", "Temperature", "Humidity", "Sensor", "Row Id"],
+    # Same order as the summary rows (WindowAggregator.summary_row)
+    "History": ["Time", "Mean Temperature", "Max Temperature", "Min Temperature", "Mean Humidity", "Max Humidity", "Min Humidity", "Sensor", "Row Id"],
+}
+
+
+# Function to create the sheets used by the app and their header rows, if they don't exist.
+# It makes one metadata request, one request to read the header rows of the existing sheets, and
+# (only if something is missing) one batchUpdate that adds the missing sheets and headers. A header
+# that is not the one of sheet_headers (e.g. written by an older version of the app, without the
+# Sensor and Row Id columns) is written again.
+# Returns {sheet_name: sheetId}. Errors are raised, so the caller can try again later.
+def setup_sheets(service, spreadsheet_id, sheet_headers=SHEET_HEADERS):
+    # Get the sheet names and ids (only the sheet properties are requested)
+    sheet_metadata = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields="sheets.properties(sheetId,title)"
+    ).execute()
+    sheet_ids = {sheet['properties']['title']: sheet['properties']['sheetId']
+                 for sheet in sheet_metadata.get('sheets', [])}
+
+    # Read the header rows of the sheets that already exist, in one request
+    existing = [sheet_name for sheet_name in sheet_headers if sheet_name in sheet_ids]
+    headers = {}
+    if existing:
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"{sheet_name}!A1:Z1" for sheet_name in existing]
+        ).execute()
+        for sheet_name, value_range in zip(existing, result.get('valueRanges', [])):
+            headers[sheet_name] = (value_range.get('values') or [[]])[0]
+
+    requests = []
+    next_id = max(sheet_ids.values(), default=0) + 1
+    for sheet_name, header in sheet_headers.items():
+        if sheet_name not in sheet_ids:
+            # New sheet, we choose its sheetId so the header can be written in the same request
+            sheet_ids[sheet_name] = next_id
+            next_id += 1
+            requests.append({"addSheet": {"properties": {"title": sheet_name, "sheetId": sheet_ids[sheet_name]}}})
+            print(f"Sheet '{sheet_name}' created.")
+        if headers.get(sheet_name) != header:
+            requests.append({
+                "updateCells": {
+                    "start": {"sheetId": sheet_ids[sheet_name], "rowIndex": 0, "columnIndex": 0},
+                    "rows": [{"values": [{"userEnteredValue": {"stringValue": title}} for title in header]}],
+                    "fields": "userEnteredValue"
+                }
+            })
+            print(f"Header {'updated' if headers.get(sheet_name) else 'created'} in '{sheet_name}' sheet.")
+
+    if requests:
+        service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': requests}
+        ).execute()
+    else:
+        print("Sheets and headers already exist.")
+    return sheet_ids
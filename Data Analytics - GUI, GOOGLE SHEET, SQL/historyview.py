@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the table of the History page of the dht11 APP. The history table grows by one row
+# every summary (720 rows a day), so the page only reads and shows the rows around what is visible.
+
+from datetime import datetime, timedelta
+
+HISTORY_COLUMNS = ('date', 'sensor_id', 'mean_temperature', 'max_temperature', 'min_temperature',
+                   'mean_humidity', 'max_humidity', 'min_humidity')
+
+
+# This class reads the history table one page at a time with keyset pagination on id:
+# "the next 100 rows after id X" uses the primary key, so it is as fast for the last page as
+# for the first one (OFFSET would have to skip all the rows before it).
+# date_from and date_to ("YYYY-MM-DD", both optional, both included) filter the rows by date, and
+# sensor_id (optional) shows the rows of one sensor only.
+class HistoryPager:
+    def __init__(self, conn, page_size=100, date_from=None, date_to=None, sensor_id=None):
+        self.conn = conn
+        self.page_size = page_size
+        self.sensor_id = sensor_id
+        self.set_dates(date_from, date_to)
+
+    def set_dates(self, date_from=None, date_to=None):
+        # The dates are checked here, so a wrong date raises ValueError before any query.
+        # They are kept as epoch seconds of local midnight, to use the index on ts
+        start = datetime.strptime(date_from, "%Y-%m-%d").timestamp() if date_from else None
+        end = None
+        if date_to:
+            # "up to and including date_to" is "before midnight of the next day"
+            end = (datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+        self.start = start
+        self.end = end
+
+    def _query(self, condition, params, order):
+        where = [condition]
+        if self.start is not None:
+            where.append('ts >= ?')
+            params.append(int(self.start))
+        if self.end is not None:
+            where.append('ts < ?')
+            params.append(int(self.end))
+        if self.sensor_id is not None:
+            where.append('sensor_id = ?')
+            params.append(self.sensor_id)
+        # One row more than a page, to know if there are more rows after this page
+        params.append(self.page_size + 1)
+        rows = self.conn.execute(
+            f'SELECT id, {", ".join(HISTORY_COLUMNS)} FROM history WHERE {" AND ".join(where)} '
+            f'ORDER BY id {order} LIMIT ?', params).fetchall()
+        return rows[:self.page_size], len(rows) > self.page_size
+
+    def page_after(self, after_id=None):
+        # Rows with id > after_id (from the start when None), oldest first.
+        # Returns (rows, more): more is True if there are rows after this page
+        return self._query('id > ?', [after_id if after_id is not None else -1], 'ASC')
+
+    def page_before(self, before_id):
+        # Rows with id < before_id, oldest first, and True if there are rows before this page
+        rows, more = self._query('id < ?', [before_id], 'DESC')
+        rows.reverse()
+        return rows, more
+
+    def last_page(self):
+        # The newest rows, oldest first
+        rows, more = self._query('1', [], 'DESC')
+        rows.reverse()
+        return rows, more
+
+
+# Function to format one history row for the table (date and sensor, then the values with
+# 2 decimals, empty if missing)
+def format_history_row(row):
+    return tuple(row[:2]) + tuple("" if value is None else f"{value:.2f}" for value in row[2:])
+
+
+# This class fills a ttk.Treeview from a HistoryPager as the user scrolls. The tree never holds
+# more than max_rows rows: when a page is added at the bottom, rows are removed at the top (and
+# the other way round), so the memory and the Treeview stay small whatever the table size.
+# The tree item id is the history row id.
+class HistoryTable:
+    def __init__(self, tree, scrollbar, pager, max_rows=500):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.pager = pager
+        self.max_rows = max_rows
+        self.more_before = False
+        self.more_after = False
+        self.loading = False
+
+        # Load more rows when the view gets near the top or the bottom of the loaded rows
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+    def reload(self, newest=False):
+        # Empty the table and load the first page (or the last page if newest is True)
+        self.tree.delete(*self.tree.get_children())
+        if newest:
+            rows, self.more_before = self.pager.last_page()
+            self.more_after = False
+        else:
+            rows, self.more_after = self.pager.page_after(None)
+            self.more_before = False
+        self.insert_rows(rows, "end")
+        if newest and rows:
+            self.tree.see(str(rows[-1][0]))
+
+    def insert_rows(self, rows, index):
+        # index is "end" or 0 (rows are inserted in order before the first row)
+        for position, row in enumerate(rows):
+            self.tree.insert("", index if index == "end" else position, iid=str(row[0]),
+                             values=format_history_row(row[1:]))
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading:
+            return
+        first, last = float(first), float(last)
+        if last >= 0.98 and self.more_after:
+            self.tree.after_idle(self.load_after)
+        elif first <= 0.02 and self.more_before:
+            self.tree.after_idle(self.load_before)
+
+    def load_after(self):
+        children = self.tree.get_children()
+        if self.loading or not self.more_after or not children:
+            return
+        self.loading = True
+        try:
+            rows, self.more_after = self.pager.page_after(int(children[-1]))
+            top = self.tree.yview()[0] * len(children)  # first visible row
+            self.insert_rows(rows, "end")
+
+            # Remove the rows above the view that are over max_rows
+            children = self.tree.get_children()
+            extra = len(children) - self.max_rows
+            if extra > 0:
+                self.tree.delete(*children[:extra])
+                self.more_before = True
+                self.tree.yview_moveto(max(0.0, top - extra) / (len(children) - extra))
+        finally:
+            self.loading = False
+
+    def load_before(self):
+        children = self.tree.get_children()
+        if self.loading or not self.more_before or not children:
+            return
+        self.loading = True
+        try:
+            rows, self.more_before = self.pager.page_before(int(children[0]))
+            top = self.tree.yview()[0] * len(children)
+            self.insert_rows(rows, 0)
+
+            # Remove the rows below the view that are over max_rows
+            children = self.tree.get_children()
+            extra = len(children) - self.max_rows
+            if extra > 0:
+                self.tree.delete(*children[-extra:])
+                self.more_after = True
+            # Keep the same rows in view (the new rows are above them)
+            self.tree.yview_moveto((top + len(rows)) / len(self.tree.get_children()))
+        finally:
+            self.loading = False
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the live graph of the dht11 APP (temperature on top, humidity below), for one sensor or
+# several sensors on top of each other (overlay).
+
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+from matplotlib.dates import DateFormatter, date2num
+
+
+# Function to convert epoch seconds (NumPy array) to matplotlib dates in local time.
+# The offset is taken at the latest time, so the graph shows the same clock time as datetime.now()
+def epoch_to_mdates(times):
+    offset = date2num(datetime.fromtimestamp(float(times[-1]))) - times[-1] / 86400.0
+    return times / 86400.0 + offset
+
+
+# This class draws the live graph with blitting: the two lines are created once and only their
+# data is changed. For a new reading, only the plot area (inside the axes) is redrawn on top of
+# a saved background. The full figure (axes, ticks, labels, legend) is only redrawn when the
+# time window moves (every step_seconds), when a value goes out of the y range, or when the
+# window is resized. With blit=False every reading redraws the full figure (like before).
+# update() draws one series; update_series() draws one line per sensor on each axis.
+# drawstyle is the matplotlib drawstyle of the lines ('steps-post' to hold each value until the
+# next one, for readings saved with the deadband compression, see compression.py).
+class LiveChart:
+    def __init__(self, figure, axes, canvas, window_seconds=600, step_seconds=60, blit=True, drawstyle='default'):
+        self.figure = figure
+        self.axes = axes
+        self.canvas = canvas
+        self.window_seconds = window_seconds
+        self.step_seconds = step_seconds
+        self.blit = blit and getattr(canvas, 'supports_blit', False)
+        self.drawstyle = drawstyle
+
+        # The lines of the shown series, {name: (temperature line, humidity line)}. They are
+        # created when the shown series change and then updated with set_data
+        self.lines = {}
+        self.show_series([None])
+
+        # Set axis labels, date format and grid (they stay the same)
+        axes[0].set_ylabel("Temperature (C)")
+        axes[1].set_ylabel("Humidity (%)")
+        for axis in axes:
+            axis.xaxis.set_major_formatter(DateFormatter('%H:%M'))
+            axis.set_xticks([])
+            axis.grid(True)
+
+        # Saved plot backgrounds (without the lines), taken after each full draw
+        self.backgrounds = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        # Right end of the current time window (matplotlib date), None before the first reading
+        self.x_right = None
+
+        # Frame time counters, in milliseconds (the last 500 frames)
+        self.frame_times = deque(maxlen=500)
+        self.blit_frames = 0
+        self.full_frames = 0
+
+    def show_series(self, names):
+        # Create the lines of the series to show (and remove the others). A single series is drawn
+        # red/blue as before; with several series each one has its own color and its name in the legend
+        for lines in self.lines.values():
+            for line in lines:
+                line.remove()
+        self.lines = {}
+        for index, name in enumerate(names):
+            single = len(names) == 1
+            self.lines[name] = (
+                self.axes[0].plot([], [], '-', color='tab:red' if single else f'C{index}',
+                                  label='Temperature' if single else name, animated=self.blit,
+                                  drawstyle=self.drawstyle)[0],
+                self.axes[1].plot([], [], '-', color='tab:blue' if single else f'C{index}',
+                                  label='Humidity' if single else name, animated=self.blit,
+                                  drawstyle=self.drawstyle)[0],
+            )
+        for axis in self.axes:
+            axis.legend(loc='upper left')
+        self.backgrounds = None
+
+    def on_draw(self, event):
+        # After a full draw: save the backgrounds and draw the lines on top
+        if not self.blit:
+            return
+        self.backgrounds = [self.canvas.copy_from_bbox(axis.bbox) for axis in self.axes]
+        for lines in self.lines.values():
+            for axis, line in zip(self.axes, lines):
+                axis.draw_artist(line)
+
+    def update(self, times, temps, hums, elapsed_seconds):
+        # times are epoch seconds; temps and hums are the values (e.g. ring buffer views).
+        # elapsed_seconds is the time since the program was started (used for the ticks)
+        self.update_series({None: (times, temps, hums)}, elapsed_seconds)
+
+    def update_series(self, series, elapsed_seconds):
+        # series is {name: (times, temps, hums)}, one line per name on each axis
+        series = {name: data for name, data in series.items() if len(data[0])}
+        if not series:
+            return
+        start = time.perf_counter()
+        full = False
+        if list(series) != list(self.lines):
+            self.show_series(list(series))
+            full = True
+
+        latest = None  # dates of the series with the latest reading, used for the ticks
+        values = [[], []]
+        for name, (times, temps, hums) in series.items():
+            dates = epoch_to_mdates(times)
+            for line, data in zip(self.lines[name], (temps, hums)):
+                line.set_data(dates, data)
+            values[0].append(temps)
+            values[1].append(hums)
+            if latest is None or dates[-1] > latest[-1]:
+                latest = dates
+        values = [np.concatenate(data) for data in values]
+
+        # Full redraw when the window has to move or a value is out of the y range
+        full = full or not self.blit or self.backgrounds is None or self.x_right is None or latest[-1] > self.x_right
+        if not full:
+            for axis, data in zip(self.axes, values):
+                low, high = axis.get_ylim()
+                if data.min() < low or data.max() > high:
+                    full = True
+                    break
+
+        if full:
+            self.redraw_axes(latest, values, elapsed_seconds)
+            self.canvas.draw()
+            self.full_frames += 1
+        else:
+            for i, (axis, background) in enumerate(zip(self.axes, self.backgrounds)):
+                self.canvas.restore_region(background)
+                for lines in self.lines.values():
+                    axis.draw_artist(lines[i])
+                self.canvas.blit(axis.bbox)
+            self.blit_frames += 1
+
+        self.frame_times.append((time.perf_counter() - start) * 1000.0)
+
+    def redraw_axes(self, dates, values, elapsed_seconds):
+        # Move the time window so the latest reading is step_seconds before its right end,
+        # it then stays in place until the readings reach the right end again
+        self.x_right = dates[-1] + self.step_seconds / 86400.0
+        x_left = self.x_right - (self.window_seconds + self.step_seconds) / 86400.0
+
+        # Leave some room above and below the values, so small changes don't need a full redraw
+        for axis, data in zip(self.axes, values):
+            low, high = float(np.min(data)), float(np.max(data))
+            margin = max(1.0, (high - low) * 0.25)
+            axis.set_ylim(low - margin, high + margin)
+            axis.set_xlim(x_left, self.x_right)
+
+            # Set locator to show only the start and end ticks
+            if elapsed_seconds >= 120:
+                if elapsed_seconds >= 600:
+                    # Show ticks for 10 minutes ago and the current time
+                    ten_minutes_ago = dates[-1] - 9 / 1440.0
+                    first_tick = dates[np.abs(dates - ten_minutes_ago).argmin()]
+                    axis.set_xticks([first_tick, dates[-1]])
+                else:
+                    # Show ticks for the first and last time points
+                    axis.set_xticks([dates[0], dates[-1]])
+            else:
+                axis.set_xticks([dates[0]])
+
+    def frame_stats(self):
+        # Frame times of the recent updates, in milliseconds
+        times = sorted(self.frame_times)
+        stats = {'blit_frames': self.blit_frames, 'full_frames': self.full_frames}
+        if times:
+            stats.update({
+                'mean_ms': sum(times) / len(times),
+                'p50_ms': times[len(times) // 2],
+                'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))],
+                'max_ms': times[-1],
+            })
+        return stats
+
+    def format_frame_stats(self):
+        stats = self.frame_stats()
+        if 'mean_ms' not in stats:
+            return "no frames yet"
+        return (f"{stats['blit_frames']} blit / {stats['full_frames']} full frames, mean {stats['mean_ms']:.1f} ms, "
+                f"p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms, max {stats['max_ms']:.1f} ms")
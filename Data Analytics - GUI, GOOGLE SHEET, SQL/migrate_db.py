@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# Tool to convert an existing sensors.db to the current layout (see storage.migrate), in place:
+#     python migrate_db.py [sensors.db] [chunk_size] [--vacuum]
+# The app also does this at start, this tool lets a big database be converted beforehand and
+# shows the progress. Stop the collector (or the GUI) first; the tool can be stopped and run again.
+# --vacuum also switches a database made by an older version to auto_vacuum=INCREMENTAL, so the
+# retention worker can give the space of old readings back (this rewrites the whole file once and
+# needs as much free space as the database size).
+
+import sqlite3
+import sys
+import time
+
+from storage import SCHEMA_VERSION, migrate
+
+
+def print_progress(step, done, total):
+    # done/total are rows for the tables, seconds of readings for the rollups
+    print(f"\r{step}: {done}/{total}", end="" if done < total else "\n", flush=True)
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--vacuum']
+    db_path = args[0] if len(args) > 0 else 'sensors.db'
+    chunk_size = int(args[1]) if len(args) > 1 else 10000
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        print(f"{db_path} is already at version {version}.")
+    else:
+        start = time.perf_counter()
+        migrate(conn, chunk_size=chunk_size, progress=print_progress)
+        print(f"{db_path}: version {version} -> {SCHEMA_VERSION} in {time.perf_counter() - start:.1f} s")
+
+    if '--vacuum' in sys.argv and conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        start = time.perf_counter()
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        print(f"{db_path}: auto_vacuum set to INCREMENTAL in {time.perf_counter() - start:.1f} s")
+    conn.close()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the sensor reading part of the dht11 APP: each sensor is read by its own reader thread,
+# so a read that hangs (the DHT11 read bit-bangs the GPIO pin and can get stuck) never blocks the
+# sampler, the database or the GUI. The sampler asks for a reading and waits at most read_timeout
+# seconds for it; the counters show how often the sensor fails and how long a read takes.
+
+import queue
+import threading
+import time
+
+from scheduler import StageTimer
+from sensors import SensorResult
+
+# Error codes of the reader (the sensor backends use 0, 1, 2 ...)
+ERR_TIMEOUT = -1  # the read didn't finish in read_timeout seconds
+ERR_BUSY = -2     # the last read is still running after its timeout, no new read was started
+ERR_FAILED = -3   # the backend raised an exception
+
+
+# This class reads one sensor backend (see sensors.py) in its own thread.
+# read() starts one read and returns its result, or a SensorResult with ERR_TIMEOUT / ERR_BUSY /
+# ERR_FAILED. After a timeout, the next read() first waits (read_timeout again) for the late read
+# to finish. The reader thread and the caller only exchange the request and the result through
+# two queues, no lock is shared. The latest valid reading is kept in `latest`
+# (time.time(), result), replaced at once, so other threads can read it without a lock.
+class SensorReader:
+    def __init__(self, device, read_timeout=0.5, name="reader"):
+        self.device = device
+        self.read_timeout = read_timeout
+        self.name = name
+        self.latest = None
+
+        # Counters, only changed by the thread that calls read()
+        self.reads = 0
+        self.valid = 0
+        self.timeouts = 0
+        self.busy = 0
+        self.errors = {}  # error code -> count (backend codes and the codes above)
+        self.timer = StageTimer()  # 'read' - duration of the reads that finished, in ms
+
+        self._requests = queue.SimpleQueue()
+        self._results = queue.SimpleQueue()
+        self._running = False  # a read was started and its result was not taken yet
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        # Stop the reader thread (a read that hangs is left behind, the thread is a daemon)
+        self._requests.put(None)
+
+    def _run(self):
+        while self._requests.get() is not None:
+            start = time.perf_counter()
+            try:
+                result = self.device.read()
+            except Exception as e:
+                print(f"Error ({self.name}): {str(e)}")
+                result = SensorResult(ERR_FAILED)
+            self._results.put((result, (time.perf_counter() - start) * 1000.0))
+
+    def read(self):
+        self.reads += 1
+        if self._running:
+            # Wait for the read that timed out: its result is too old to use, but its time counts
+            try:
+                _, milliseconds = self._results.get(timeout=self.read_timeout)
+            except queue.Empty:
+                return self._count(SensorResult(ERR_BUSY))
+            self._running = False
+            self.timer.record('read', milliseconds)
+
+        self._running = True
+        self._requests.put(True)
+        try:
+            result, milliseconds = self._results.get(timeout=self.read_timeout)
+        except queue.Empty:
+            return self._count(SensorResult(ERR_TIMEOUT))
+        self._running = False
+        self.timer.record('read', milliseconds)
+        if result.is_valid():
+            self.latest = (time.time(), result)
+        return self._count(result)
+
+    def _count(self, result):
+        if result.is_valid():
+            self.valid += 1
+        else:
+            self.errors[result.error_code] = self.errors.get(result.error_code, 0) + 1
+            if result.error_code == ERR_TIMEOUT:
+                self.timeouts += 1
+            elif result.error_code == ERR_BUSY:
+                self.busy += 1
+        return result
+
+    def stats(self):
+        # {'reads', 'valid', 'invalid', 'invalid_rate', 'timeouts', 'busy', 'errors', 'p50_ms', 'p99_ms', 'max_ms'}
+        stats = {'reads': self.reads, 'valid': self.valid, 'invalid': self.reads - self.valid,
+                 'invalid_rate': (self.reads - self.valid) / self.reads if self.reads else 0.0,
+                 'timeouts': self.timeouts, 'busy': self.busy, 'errors': dict(self.errors)}
+        latency = self.timer.stats().get('read')
+        if latency is not None:
+            stats.update({key: latency[key] for key in ('p50_ms', 'p99_ms', 'max_ms')})
+        return stats
+
+    def format_stats(self):
+        stats = self.stats()
+        text = (f"{stats['reads']} reads, {stats['invalid_rate']:.1%} invalid, {stats['timeouts']} timeouts, "
+                f"errors {stats['errors'] or 'none'}")
+        if 'p50_ms' in stats:
+            text += f", read p50 {stats['p50_ms']:.1f} ms p99 {stats['p99_ms']:.1f} ms"
+        return text
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the retention part of the local database of the dht11 APP. RawHistory gets a row every
+# 2 seconds (about 15 million rows a year), so old raw readings are removed from sensors.db.
+# The minute/hour/day rollups (rollups.py) and the history table keep the long term data.
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from scheduler import SamplingScheduler, StageTimer
+
+
+# archive.py needs numpy, so it is only imported when a day is archived (not at the start of the
+# collector). Same folder as archive.ARCHIVE_DIR
+ARCHIVE_DIR = 'archive'
+
+
+# The retention settings for RawHistory:
+#   max_age_days - readings older than this are removed (None: no age limit)
+#   max_rows     - only the newest max_rows readings are kept (None: no row limit)
+#   archive_dir  - folder where the readings are saved before they are removed, one compressed
+#                  file per day and sensor (see archive.py; None: they are not saved). With an archive only
+#                  whole days are removed, so each day is in one file.
+#   chunk_rows   - rows deleted per transaction, and pause - seconds between two transactions,
+#                  so the sampler never waits long for the database
+#   vacuum_pages - free pages given back to the file system per step of incremental vacuum
+class RetentionPolicy:
+    def __init__(self, max_age_days=30, max_rows=None, archive_dir=ARCHIVE_DIR, chunk_rows=2000, pause=0.05,
+                 vacuum_pages=256):
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.archive_dir = archive_dir
+        self.chunk_rows = chunk_rows
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+
+
+# Function to find the time before which readings are removed (epoch seconds), None if nothing is
+def retention_cutoff(conn, policy, now=None):
+    now = time.time() if now is None else now
+    cutoff = None
+    if policy.max_age_days is not None:
+        cutoff = int(now - policy.max_age_days * 86400)
+    if policy.max_rows is not None:
+        # Time of the oldest reading that is kept (uses the index on ts)
+        row = conn.execute('SELECT ts FROM RawHistory ORDER BY ts DESC LIMIT 1 OFFSET ?',
+                           (policy.max_rows - 1,)).fetchone()
+        if row is not None:
+            cutoff = row[0] if cutoff is None else max(cutoff, row[0])
+    if cutoff is not None and policy.archive_dir:
+        # Only whole days, so they can be archived one file per day
+        cutoff = int(datetime.fromtimestamp(cutoff).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    return cutoff
+
+
+# This class removes the old RawHistory rows in the background, with its own database connection
+# and thread (every `interval` seconds):
+#   1. each day older than the cutoff is saved to the archive, one file per sensor (if archive_dir is set)
+#   2. its rows are deleted chunk_rows at a time, with a short pause between two transactions
+#   3. the free pages are given back with PRAGMA incremental_vacuum, a few at a time
+# Deleting in small transactions means the sampler thread only waits for one chunk, never for the
+# whole clean up. The timer gets 'delete' and 'vacuum' (time of each transaction).
+class RetentionWorker:
+    def __init__(self, db_path='sensors.db', policy=None, interval=3600.0, start_delay=60.0, timer=None):
+        self.db_path = db_path
+        self.policy = policy or RetentionPolicy()
+        self.timer = timer or StageTimer()
+        self.deleted_rows = 0
+        self.archived_rows = 0
+        self.scheduler = SamplingScheduler(self.run_once, interval=interval, retry_interval=interval,
+                                           timer=self.timer, name="retention", start_delay=start_delay)
+
+    def start(self):
+        self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+
+    def stopping(self):
+        return self.scheduler.stop_requested()
+
+    def run_once(self, now=None):
+        # This runs in the retention thread, with a connection of its own (opened for each run,
+        # this runs once an hour)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            deleted, archived = self.remove_old_rows(conn, now)
+            if deleted:
+                freed = self.vacuum(conn)
+                print(f"Retention: {deleted} old readings removed ({archived} archived), {freed} pages freed")
+        finally:
+            conn.close()
+        return True
+
+    def remove_old_rows(self, conn, now=None):
+        policy = self.policy
+        cutoff = retention_cutoff(conn, policy, now)
+        if cutoff is None:
+            return 0, 0
+        first = conn.execute('SELECT min(ts) FROM RawHistory').fetchone()[0]
+        if first is None or first >= cutoff:
+            return 0, 0
+
+        deleted = archived = 0
+        if policy.archive_dir:
+            from archive import archive_day, day_path
+
+            # One day at a time: save it, then delete it
+            os.makedirs(policy.archive_dir, exist_ok=True)
+            day = datetime.fromtimestamp(first).replace(hour=0, minute=0, second=0, microsecond=0)
+            while day.timestamp() < cutoff and not self.stopping():
+                next_day = day + timedelta(days=1)
+                start, end = int(day.timestamp()), int(next_day.timestamp())
+                for (sensor_id,) in conn.execute('SELECT DISTINCT sensor_id FROM RawHistory WHERE ts >= ? AND ts < ?',
+                                                 (start, end)).fetchall():
+                    path = day_path(policy.archive_dir, day, sensor_id)
+                    # If the file is there, the day was saved whole by a run that stopped while deleting
+                    if not os.path.exists(path):
+                        archived += archive_day(conn, path, start, end, sensor_id)
+                deleted += self.delete_range(conn, start, end)
+                day = next_day
+        else:
+            deleted = self.delete_range(conn, first, cutoff)
+
+        self.deleted_rows += deleted
+        self.archived_rows += archived
+        return deleted, archived
+
+    def delete_range(self, conn, start, end):
+        # Delete the readings with start <= ts < end, chunk_rows per transaction
+        deleted = 0
+        while not self.stopping():
+            with self.timer.stage('delete'):
+                with conn:
+                    count = conn.execute('''
+                    DELETE FROM RawHistory WHERE id IN (
+                        SELECT id FROM RawHistory WHERE ts >= ? AND ts < ? LIMIT ?
+                    )''', (start, end, self.policy.chunk_rows)).rowcount
+            deleted += count
+            if count < self.policy.chunk_rows:
+                break
+            time.sleep(self.policy.pause)
+        return deleted
+
+    def vacuum(self, conn):
+        # Give the free pages back to the file system, vacuum_pages per step. Only works when the
+        # database uses auto_vacuum=INCREMENTAL (new databases do, see SensorStore); otherwise
+        # the free pages are simply reused for the new readings and the file stops growing.
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return 0
+        start_free = free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        while free and not self.stopping():
+            with self.timer.stage('vacuum'):
+                # executescript runs the pragma to the end (execute() would free only one page)
+                conn.executescript(f'PRAGMA incremental_vacuum({self.policy.vacuum_pages})')
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            time.sleep(self.policy.pause)
+        return start_free - free
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the in-memory buffer of the latest readings of the dht11 APP, used by the live graph.
+
+import numpy as np
+
+
+# This class keeps the latest `capacity` readings in a fixed NumPy array, so memory does not
+# grow while the app runs for weeks. Each row is (epoch time, temperature, humidity).
+#
+# Every reading is written twice, at position i and i + capacity. Because of that the latest
+# n readings are always one contiguous slice of the array, so window() and since() return
+# NumPy views (no copy) that the plotting code can use directly.
+class RingBuffer:
+    TIME, TEMPERATURE, HUMIDITY = 0, 1, 2
+
+    def __init__(self, capacity=1024, columns=3):
+        self.capacity = capacity
+        self._data = np.zeros((columns, 2 * capacity), dtype=float)
+        self._next = 0  # position where the next reading goes (0 .. capacity-1)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, *values):
+        # Add one reading, the oldest one is overwritten when the buffer is full
+        i = self._next
+        self._data[:, i] = values
+        self._data[:, i + self.capacity] = values
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def clear(self):
+        self._next = 0
+        self._size = 0
+
+    def window(self, n=None):
+        # View of the latest n readings (all of them if n is None), oldest first.
+        # The result has one row per column: window()[RingBuffer.TIME] are the times.
+        n = self._size if n is None else min(n, self._size)
+        end = self._next + self.capacity
+        return self._data[:, end - n:end]
+
+    def since(self, start_time):
+        # View of the readings with time >= start_time (times are in increasing order)
+        view = self.window()
+        first = np.searchsorted(view[self.TIME], start_time, side='left')
+        return view[:, first:]
+
+    def last(self):
+        # The latest reading as a tuple, None if the buffer is empty
+        if self._size == 0:
+            return None
+        return tuple(self._data[:, self._next + self.capacity - 1].tolist())
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the rollup part of the local database of the dht11 APP: the readings are also summed
+# per minute, per hour and per day, so a graph of weeks or months reads a few hundred rows
+# instead of millions of raw readings.
+#
+# Each tier is a table with one row per sensor and bucket (the epoch seconds at the start of the
+# minute, hour or local day). A row keeps the number of samples, the sums and the min/max, so a new
+# reading is added to a row without reading the samples again, and rows can be merged.
+
+import time
+from datetime import datetime, timedelta
+
+from sensors import DEFAULT_SENSOR
+
+# Tier name -> (table, bucket size in seconds, how long rows are kept in seconds or None for ever)
+TIERS = {
+    'minute': ('rollup_minute', 60, 14 * 86400),
+    'hour': ('rollup_hour', 3600, 2 * 365 * 86400),
+    'day': ('rollup_day', 86400, None),
+}
+
+# Add rows to a tier, or merge them into the row of the same bucket
+UPSERT = '''
+INSERT INTO {table} (sensor_id, bucket, samples, temp_sum, temp_min, temp_max, hum_sum, hum_min, hum_max)
+{values}
+ON CONFLICT(sensor_id, bucket) DO UPDATE SET
+    samples = samples + excluded.samples,
+    temp_sum = temp_sum + excluded.temp_sum,
+    temp_min = min(temp_min, excluded.temp_min),
+    temp_max = max(temp_max, excluded.temp_max),
+    hum_sum = hum_sum + excluded.hum_sum,
+    hum_min = min(hum_min, excluded.hum_min),
+    hum_max = max(hum_max, excluded.hum_max)
+'''
+
+# SQL for the local midnight of an epoch time (the day bucket)
+LOCAL_DAY_SQL = "CAST(strftime('%s', {ts}, 'unixepoch', 'localtime', 'start of day', 'utc') AS INTEGER)"
+
+
+# Function to create the rollup tables if they don't exist
+def create_rollup_tables(conn):
+    for table, _, _ in TIERS.values():
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            sensor_id TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            temp_sum REAL NOT NULL,
+            temp_min REAL NOT NULL,
+            temp_max REAL NOT NULL,
+            hum_sum REAL NOT NULL,
+            hum_min REAL NOT NULL,
+            hum_max REAL NOT NULL,
+            PRIMARY KEY (sensor_id, bucket)
+        ) WITHOUT ROWID
+        ''')
+
+
+# Function to move the rollup tables of a database made before sensor_id (one row per bucket) to
+# the layout above, the rows go to the default sensor. The tables are small (at most 14 days of
+# minutes), so they are copied in one transaction.
+def add_sensor_to_rollups(conn, sensor_id=DEFAULT_SENSOR):
+    for table, _, _ in TIERS.values():
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if not columns or 'sensor_id' in columns:
+            continue
+        with conn:
+            conn.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+            create_rollup_tables(conn)
+            conn.execute(f'''
+            INSERT INTO {table} (sensor_id, bucket, samples, temp_sum, temp_min, temp_max, hum_sum, hum_min, hum_max)
+            SELECT ?, bucket, samples, temp_sum, temp_min, temp_max, hum_sum, hum_min, hum_max FROM {table}_old
+            ''', (sensor_id,))
+            conn.execute(f'DROP TABLE {table}_old')
+
+
+# This class adds the new readings to the three tiers. It runs inside the transaction of the
+# readings (SensorStore.commit), so the rollups always match RawHistory, even after a crash.
+# Readings of the same sensor and bucket are first summed in memory (with group commit, one row
+# per bucket is written instead of one per reading).
+class RollupWriter:
+    def __init__(self):
+        # Local midnight of the current day and of the next one, so the day bucket of a
+        # reading is found without a date conversion each time
+        self.day_start = None
+        self.day_end = None
+
+    def day_bucket(self, ts):
+        if self.day_start is None or not self.day_start <= ts < self.day_end:
+            start = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+            self.day_start = int(start.timestamp())
+            self.day_end = int((start + timedelta(days=1)).timestamp())
+        return self.day_start
+
+    def add(self, conn, readings):
+        # readings are (sensor_id, ts, temperature, humidity)
+        for tier, (table, size, _) in TIERS.items():
+            buckets = {}
+            for sensor_id, ts, temperature, humidity in readings:
+                bucket = self.day_bucket(ts) if tier == 'day' else ts - ts % size
+                row = buckets.get((sensor_id, bucket))
+                if row is None:
+                    buckets[sensor_id, bucket] = [sensor_id, bucket, 1, temperature, temperature, temperature,
+                                                  humidity, humidity, humidity]
+                else:
+                    row[2] += 1
+                    row[3] += temperature
+                    row[4] = min(row[4], temperature)
+                    row[5] = max(row[5], temperature)
+                    row[6] += humidity
+                    row[7] = min(row[7], humidity)
+                    row[8] = max(row[8], humidity)
+            conn.executemany(UPSERT.format(table=table, values='VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'),
+                             list(buckets.values()))
+
+
+# Function to build the rollups from the RawHistory rows with start <= ts < end (all of them by
+# default), one day of readings per transaction. Used when the tables are added to an existing
+# database. The hour and day tiers are built from the minute rows (a cascade), not from the raw rows.
+# Rows already in the tiers are merged, so it must only be run on readings not rolled up yet.
+def backfill(conn, start=None, end=None, chunk_seconds=86400, progress=None):
+    if start is None or end is None:
+        first, last = conn.execute('SELECT min(ts), max(ts) FROM RawHistory').fetchone()
+        if first is None:
+            return
+        start = first if start is None else start
+        end = last + 1 if end is None else end
+    minute_table = TIERS['minute'][0]
+    # Chunks are whole minutes, so no minute row is split between two chunks
+    chunk_seconds = max(60, chunk_seconds - chunk_seconds % 60)
+    for chunk_start in range(start - start % 60, end, chunk_seconds):
+        chunk_end = min(end, chunk_start + chunk_seconds)
+        with conn:
+            conn.execute(UPSERT.format(table=minute_table, values='''
+            SELECT sensor_id, ts - ts % 60, count(*), sum(temperature), min(temperature), max(temperature),
+                   sum(humidity), min(humidity), max(humidity)
+            FROM RawHistory WHERE ts >= ? AND ts < ? GROUP BY 1, 2'''), (max(start, chunk_start), chunk_end))
+            for tier in ('hour', 'day'):
+                table, size, _ = TIERS[tier]
+                bucket = LOCAL_DAY_SQL.format(ts='bucket') if tier == 'day' else f'bucket - bucket % {size}'
+                # Minute rows of this chunk only (the hour and day rows are merged with upsert)
+                conn.execute(UPSERT.format(table=table, values=f'''
+                SELECT sensor_id, {bucket}, sum(samples), sum(temp_sum), min(temp_min), max(temp_max),
+                       sum(hum_sum), min(hum_min), max(hum_max)
+                FROM {minute_table} WHERE bucket >= ? AND bucket < ? GROUP BY 1, 2'''),
+                             (chunk_start, chunk_end))
+        if progress is not None:
+            progress('rollups', min(end, chunk_end) - start, end - start)
+
+
+# Function to delete the rows older than the retention of each tier
+def prune(conn, now=None):
+    now = time.time() if now is None else now
+    deleted = 0
+    with conn:
+        for table, _, keep in TIERS.values():
+            if keep is not None:
+                deleted += conn.execute(f'DELETE FROM {table} WHERE bucket < ?', (int(now - keep),)).rowcount
+    return deleted
+
+
+# Function to choose the finest tier that gives at most max_points rows for start..end
+# (and still has the data: a tier is not used for times older than its retention)
+def choose_tier(start, end, max_points=1000, now=None):
+    now = time.time() if now is None else now
+    for tier, (_, size, keep) in TIERS.items():
+        if (end - start) / size <= max_points and (keep is None or start >= now - keep):
+            return tier
+    return 'day'
+
+
+# Function to read the rollup rows of one sensor for the buckets in start..end (epoch seconds),
+# oldest first, as (bucket, samples, mean_temp, min_temp, max_temp, mean_hum, min_hum, max_hum).
+# The tier is chosen from the time span if not given.
+def read_rollup(conn, start, end, tier=None, max_points=1000, sensor_id=DEFAULT_SENSOR):
+    tier = tier or choose_tier(start, end, max_points)
+    table, size, _ = TIERS[tier]
+    # bucket > start - size also takes the bucket that start falls in
+    return conn.execute(f'''
+    SELECT bucket, samples, temp_sum / samples, temp_min, temp_max, hum_sum / samples, hum_min, hum_max
+    FROM {table} WHERE sensor_id = ? AND bucket > ? AND bucket < ? ORDER BY bucket''',
+                        (sensor_id, int(start - size), int(end)))
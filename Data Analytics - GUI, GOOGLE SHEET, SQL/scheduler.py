@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the timing part of the dht11 APP: the sensor is sampled by its own thread on a fixed
+# clock, and every step of the program can be timed so slow steps and jitter can be seen.
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# This class keeps the duration of each stage of the program (read, sqlite, render ...) in
+# milliseconds, the last `keep` values per stage. It can be used from several threads.
+class StageTimer:
+    def __init__(self, keep=1000):
+        self.keep = keep
+        self.stages = {}
+
+    def record(self, stage, milliseconds):
+        times = self.stages.get(stage)
+        if times is None:
+            times = self.stages.setdefault(stage, deque(maxlen=self.keep))
+        times.append(milliseconds)
+
+    @contextmanager
+    def stage(self, stage):
+        # Time the code inside a "with timer.stage('name'):" block
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000.0)
+
+    def stats(self):
+        # {stage: {'count', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms'}}
+        result = {}
+        for stage, times in list(self.stages.items()):
+            times = sorted(times)
+            if not times:
+                continue
+            result[stage] = {
+                'count': len(times),
+                'mean_ms': sum(times) / len(times),
+                'p50_ms': times[len(times) // 2],
+                'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))],
+                'max_ms': times[-1],
+            }
+        return result
+
+    def format(self):
+        return "; ".join(
+            f"{stage} mean {s['mean_ms']:.1f} ms p99 {s['p99_ms']:.1f} ms max {s['max_ms']:.1f} ms"
+            for stage, s in self.stats().items()
+        ) or "no data yet"
+
+
+# This class calls sample_fn from its own thread every `interval` seconds.
+# The times are fixed on a monotonic clock (start, start + interval, start + 2 * interval ...),
+# so a slow sample doesn't push all the next samples later. If a sample takes longer than the
+# interval, the missed times are skipped. sample_fn returns False when the read failed; it is
+# then tried again after retry_interval seconds (but not later than the next sample time), at
+# most max_retries times (None: until the next sample time). `skipped` counts the sample times
+# given up because all their tries failed.
+# With start_delay the first call is made start_delay seconds after start() instead of at once.
+# The timer gets:
+#   'interval' - time between two good samples (should stay close to `interval`)
+#   'late'     - how late each sample started compared to its planned time
+class SamplingScheduler:
+    def __init__(self, sample_fn, interval=2.0, retry_interval=1.0, timer=None, name="sampler", start_delay=0.0,
+                 max_retries=None):
+        self.sample_fn = sample_fn
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.max_retries = max_retries
+        self.skipped = 0
+        self.start_delay = start_delay
+        self.timer = timer or StageTimer()
+        self.name = name
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.is_running():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop_requested(self):
+        # True once stop() was called (a long sample_fn can check it to return early)
+        return self._stop_event.is_set()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        start = time.monotonic() + self.start_delay
+        planned = start  # planned time of the current sample
+        attempt_at = start
+        last_good = None
+        retries = 0  # failed tries of the current sample time
+
+        while not self._stop_event.is_set():
+            # Sleep until the next attempt
+            wait = attempt_at - time.monotonic()
+            if wait > 0 and self._stop_event.wait(wait):
+                break
+
+            now = time.monotonic()
+            self.timer.record('late', (now - planned) * 1000.0)
+            try:
+                ok = self.sample_fn()
+            except Exception as ex:
+                print(f"Error: {ex}")
+                ok = False
+
+            now = time.monotonic()
+            next_planned = planned + self.interval
+            if ok:
+                if last_good is not None:
+                    self.timer.record('interval', (now - last_good) * 1000.0)
+                last_good = now
+                # Skip the planned times that are already past
+                if next_planned <= now:
+                    next_planned += math.ceil((now - next_planned) / self.interval) * self.interval
+                planned = next_planned
+                attempt_at = planned
+                retries = 0
+            else:
+                # Retry soon, but stay on the planned times and within the retry budget
+                retries += 1
+                attempt_at = now + self.retry_interval
+                if attempt_at >= next_planned or (self.max_retries is not None and retries > self.max_retries):
+                    self.skipped += 1
+                    retries = 0
+                    if next_planned <= now:
+                        next_planned += math.ceil((now - next_planned) / self.interval) * self.interval
+                    planned = next_planned
+                    attempt_at = planned
+
+
+# Function to get the memory used by this process (resident set size) in MB
+def process_rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # Not on Linux: use the peak RSS instead
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# Function to print how long the app took to start and how much memory it uses
+# (started is the time.monotonic() value taken at the very start of the program)
+def report_startup(mode, started):
+    print(f"Startup ({mode}): {time.monotonic() - started:.2f} s, RSS {process_rss_mb():.1f} MB")
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the sensor registry of the dht11 APP: the sensors of the Pi are listed in sensors.json,
+# each one is read by its own thread in the collector and has its own sensor_id in the database
+# and in google sheets. Example sensors.json:
+#     [
+#         {"id": "dht11", "type": "dht11", "pin": 4},
+#         {"id": "kitchen", "type": "dht11", "pin": 17, "interval": 5}
+#     ]
+# "interval" (seconds between two readings) is optional. Without sensors.json the app reads one
+# DHT11 on pin 4, with the id "dht11" (the id given to the readings saved before this file existed).
+#
+# Each sensor type is a backend class (see SENSOR_TYPES) with read() and close(). Besides the
+# DHT11 there is a simulator, so the whole app can run and be load tested on any computer:
+#     {"id": "sim", "type": "simulator", "interval": 0.001, "seed": 1, "noise": 0.3,
+#      "invalid_rate": 0.05, "error_codes": [1, 2]}
+# The other keys of a sensor (here seed, noise ...) are the options of its backend. Two options
+# are used for every type (see reader.py and the collector): "read_timeout" (seconds a read may
+# take, 0.5) and "retries" (tries after a failed read before the sample is given up, 2).
+
+import json
+import math
+import os
+import random
+import re
+import time
+import zlib
+
+SENSORS_FILE = 'sensors.json'
+DEFAULT_SENSOR = 'dht11'
+
+# sensor_id is used in file names (archive) and in the sheets, so only simple names are allowed
+SENSOR_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,32}')
+
+
+# Settings of one sensor from sensors.json
+class SensorConfig:
+    def __init__(self, sensor_id=DEFAULT_SENSOR, type='dht11', pin=4, interval=2.0, options=None):
+        if not SENSOR_ID_PATTERN.fullmatch(sensor_id):
+            raise ValueError(f"Sensor id '{sensor_id}' must be 1 to 32 letters, digits, '-' or '_'")
+        if type not in SENSOR_TYPES:
+            raise ValueError(f"Sensor '{sensor_id}': unknown type '{type}' (known: {', '.join(SENSOR_TYPES)})")
+        self.sensor_id = sensor_id
+        self.type = type
+        self.pin = int(pin)
+        self.interval = float(interval)
+        self.options = dict(options or {})
+
+    def __repr__(self):
+        return f"SensorConfig({self.sensor_id!r}, type={self.type!r}, pin={self.pin}, interval={self.interval})"
+
+
+# Function to read the sensors of sensors.json (one DHT11 on pin 4 if the file doesn't exist).
+# A wrong file raises ValueError, so the collector doesn't start with a half-read configuration
+def load_sensors(path=SENSORS_FILE, default_interval=2.0):
+    if not os.path.exists(path):
+        return [SensorConfig(DEFAULT_SENSOR, 'dht11', pin=4, interval=default_interval)]
+    with open(path, encoding='utf-8') as file:
+        try:
+            entries = json.load(file)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path} is not valid JSON: {str(e)}")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path} must be a list of sensors")
+
+    sensors = []
+    for entry in entries:
+        try:
+            options = {key: value for key, value in entry.items() if key not in ('id', 'type', 'pin', 'interval')}
+            sensors.append(SensorConfig(entry['id'], entry.get('type', 'dht11'), entry.get('pin', 4),
+                                        entry.get('interval', default_interval), options))
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError(f"{path}: each sensor needs at least an \"id\": {entry!r}")
+    ids = [sensor.sensor_id for sensor in sensors]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"{path}: sensor ids must be different")
+    return sensors
+
+
+# Function to get the sensor ids of sensors.json (for the GUI), without checking the hardware
+def sensor_ids(path=SENSORS_FILE):
+    return [sensor.sensor_id for sensor in load_sensors(path)]
+
+
+#----------------------------------------------------------------------------
+# Sensor backends. A backend is created from its SensorConfig and has:
+#   read()  - one reading, a result with is_valid(), error_code, temperature and humidity
+#             (the result of the dht11 library, or SensorResult)
+#   close() - release the hardware
+#   min_interval - shortest time between two reads, in seconds (retries wait at least that long)
+#----------------------------------------------------------------------------
+
+# Error codes of the dht11 library
+ERR_NO_ERROR = 0
+ERR_MISSING_DATA = 1
+ERR_CRC = 2
+
+
+# Result of one reading, same interface as the result of the dht11 library
+class SensorResult:
+    __slots__ = ('error_code', 'temperature', 'humidity')
+
+    def __init__(self, error_code=ERR_NO_ERROR, temperature=-1, humidity=-1):
+        self.error_code = error_code
+        self.temperature = temperature
+        self.humidity = humidity
+
+    def is_valid(self):
+        return self.error_code == ERR_NO_ERROR
+
+
+# A DHT11 on a GPIO pin (GPIO is imported here, so only the collector on the Pi needs it)
+class DHT11Sensor:
+    min_interval = 1.0  # the DHT11 needs 1 second between two reads
+
+    def __init__(self, config):
+        import RPi.GPIO as GPIO
+        import dht11
+
+        GPIO.setwarnings(True)
+        GPIO.setmode(GPIO.BCM)
+        self.pin = config.pin
+        self.instance = dht11.DHT11(pin=config.pin)
+
+    def read(self):
+        return self.instance.read()
+
+    def close(self):
+        import RPi.GPIO as GPIO
+        GPIO.cleanup(self.pin)
+
+
+# A simulated sensor for tests and benchmarks. The readings only depend on the seed and on the
+# number of the reading (not on the clock), so two runs with the same options give the same
+# readings. Options (all optional):
+#   seed         - random seed (default: from the sensor id)
+#   temperature, humidity - mean values (25, 60)
+#   amplitude    - size of the slow sine wave on both values (2.0), period - its length in readings (1800)
+#   noise        - standard deviation of the random noise (0.2)
+#   resolution   - values are rounded to this step (0.1; the DHT11 gives whole degrees and %)
+#   invalid_rate - share of the reads that fail (0.0), with one of error_codes ([1, 2])
+#   read_delay   - seconds each read takes (0.0; a DHT11 read takes about 0.02 s)
+class SimulatedSensor:
+    min_interval = 0.0
+
+    def __init__(self, config):
+        options = config.options
+        seed = options.get('seed', zlib.crc32(config.sensor_id.encode()))
+        self.random = random.Random(seed)
+        self.temperature = float(options.get('temperature', 25.0))
+        self.humidity = float(options.get('humidity', 60.0))
+        self.amplitude = float(options.get('amplitude', 2.0))
+        self.period = max(1, int(options.get('period', 1800)))
+        self.noise = float(options.get('noise', 0.2))
+        self.resolution = float(options.get('resolution', 0.1))
+        self.invalid_rate = float(options.get('invalid_rate', 0.0))
+        self.error_codes = list(options.get('error_codes', [ERR_MISSING_DATA, ERR_CRC]))
+        self.read_delay = float(options.get('read_delay', 0.0))
+        if not 0.0 <= self.invalid_rate <= 1.0:
+            raise ValueError(f"Sensor '{config.sensor_id}': invalid_rate must be between 0 and 1")
+        if self.invalid_rate and not self.error_codes:
+            raise ValueError(f"Sensor '{config.sensor_id}': error_codes can't be empty with an invalid_rate")
+        self.reads = 0
+
+    def read(self):
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        self.reads += 1
+        # The random numbers are drawn the same way for every read, so the sequence stays the
+        # same whatever the share of failed reads
+        fail, error, temperature_noise, humidity_noise = (self.random.random(), self.random.randrange(1 << 16),
+                                                          self.random.gauss(0.0, 1.0), self.random.gauss(0.0, 1.0))
+        if fail < self.invalid_rate:
+            return SensorResult(self.error_codes[error % len(self.error_codes)])
+        wave = self.amplitude * math.sin(2 * math.pi * self.reads / self.period)
+        return SensorResult(ERR_NO_ERROR,
+                            self.round(self.temperature + wave + self.noise * temperature_noise),
+                            self.round(min(100.0, max(0.0, self.humidity - wave + self.noise * humidity_noise))))
+
+    def round(self, value):
+        if self.resolution <= 0:
+            return value
+        return round(round(value / self.resolution) * self.resolution, 6)
+
+    def close(self):
+        pass
+
+
+# Sensor type -> backend class
+SENSOR_TYPES = {
+    'dht11': DHT11Sensor,
+    'simulator': SimulatedSensor,
+}
+
+
+# Function to create the backend of a SensorConfig
+def create_sensor(config):
+    return SENSOR_TYPES[config.type](config)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the data analytics part for the rows read back from google sheets (the `values` of a
+# values().get response: a list of rows, each a list of text cells, rows may be shorter than the
+# header when their last cells are empty).
+#
+# Each column is converted at once with NumPy into a typed masked array: the mask marks the cells
+# that are empty or not valid, so one bad cell only hides that cell and never shifts the other
+# values of its row into the wrong column.
+
+import numpy as np
+
+# Column types of the sheets used by the app: "time", "float" or "text"
+SHEET_SCHEMAS = {
+    "RawHistory": [("Time", "time"), ("Temperature", "float"), ("Humidity", "float"), ("Sensor", "text"),
+                   ("Row Id", "text")],
+    "Monitoring": [("Time", "time"), ("Temperature", "float"), ("Humidity", "float"), ("Sensor", "text"),
+                   ("Row Id", "text")],
+    "History": [("Time", "time"), ("Mean Temperature", "float"), ("Max Temperature", "float"),
+                ("Min Temperature", "float"), ("Mean Humidity", "float"),
+                ("Max Humidity", "float"), ("Min Humidity", "float"), ("Sensor", "text"),
+                ("Row Id", "text")],
+}
+
+NUMPY_TYPES = {"float": "float64", "time": "datetime64[s]", "text": "str"}
+
+
+# Function to convert text cells one by one (for the cells NumPy could not convert at once).
+# Each distinct text is converted once (a sensor column has few distinct values), not valid ones
+# become NaN / NaT.
+def convert_cells(cells, kind):
+    converted = {}
+    for cell in set(cells):
+        try:
+            converted[cell] = float(cell) if kind == "float" else np.datetime64(str(cell).strip(), "s")
+        except (TypeError, ValueError):
+            converted[cell] = np.nan if kind == "float" else np.datetime64("NaT")
+    return np.array([converted[cell] for cell in cells], dtype=NUMPY_TYPES[kind])
+
+
+# Function to convert times written "YYYY-MM-DD HH:MM:SS" (the format of the app) with integer
+# operations on the characters, much faster than the date parser of NumPy. Returns the times and
+# a mask of the cells that are not in this format (they are left for convert_cells).
+def parse_app_times(text):
+    times = np.full(len(text), np.datetime64("NaT"), dtype=NUMPY_TYPES["time"])
+    if len(text) == 0 or text.itemsize < 19 * 4:
+        return times, np.ones(len(text), dtype=bool)
+    chars = text.view(np.uint32).reshape(len(text), -1)
+    ok = (chars[:, 19:] == 0).all(axis=1)
+    for position, separator in ((4, "-"), (7, "-"), (10, " "), (13, ":"), (16, ":")):
+        ok &= chars[:, position] == ord(separator)
+
+    def number(first, last):
+        # Number written by the characters first..last-1 (they must be digits)
+        nonlocal ok
+        value = np.zeros(len(text), dtype=np.int64)
+        for position in range(first, last):
+            digit = chars[:, position].astype(np.int64) - ord("0")
+            ok &= (digit >= 0) & (digit <= 9)
+            value = value * 10 + digit
+        return value
+
+    year, month, day = number(0, 4), number(5, 7), number(8, 10)
+    hour, minute, second = number(11, 13), number(14, 16), number(17, 19)
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60) & (second < 60)
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + np.where(ok, day - 1, 0)
+    # A day after the end of its month (2024-02-30) is not valid
+    ok &= days.astype("datetime64[M]") == months
+    times[ok] = (days.astype(NUMPY_TYPES["time"]) + (hour * 3600 + minute * 60 + second))[ok]
+    return times, ~ok
+
+
+# Function to convert one column of text cells to a masked array of the given type ("float",
+# "time" or "text"). NumPy converts the whole column at once; only the cells it can't convert
+# (empty, bad or other time formats) are converted one by one. The mask marks the cells that are
+# not valid (empty for a text column).
+def parse_column(cells, kind):
+    if kind == "text":
+        data = np.char.strip(np.asarray(cells, dtype=str))
+        missing = data == ""
+    elif kind == "float":
+        try:
+            data = np.array(cells, dtype=NUMPY_TYPES[kind])
+        except (TypeError, ValueError):
+            data = convert_cells(cells, kind)
+        missing = ~np.isfinite(data)
+    else:
+        text = np.asarray(cells, dtype=str)
+        data, other = parse_app_times(text)
+        if other.any():
+            data[other] = convert_cells(text[other].tolist(), kind)
+        missing = np.isnat(data)
+    return np.ma.MaskedArray(data, mask=missing)
+
+
+# Function to convert the `values` of a sheet to {column name: masked array}.
+# schema is a list of (name, kind), or a sheet name of SHEET_SCHEMAS. By default the first column
+# is a time and the others are numbers. A first row equal to the column names (the header row of
+# the sheet) is skipped. kinds (e.g. ("float",)) keeps only the columns of these kinds: the
+# other columns are not converted at all (the times take most of the parse time).
+def parse_sheet_values(values, schema=None, kinds=None):
+    if isinstance(schema, str):
+        schema = SHEET_SCHEMAS[schema]
+    if schema is None:
+        width = max((len(row) for row in values), default=1)
+        schema = [("Time", "time")] + [(f"Column {i + 1}", "float") for i in range(1, width)]
+    names = [name for name, _ in schema]
+    if values and [str(cell) for cell in values[0][:len(names)]] == names[:len(values[0])]:
+        values = values[1:]
+
+    columns = {}
+    for i, (name, kind) in enumerate(schema):
+        if kinds is not None and kind not in kinds:
+            continue
+        # Missing cells at the end of a short row are empty
+        cells = [row[i] if len(row) > i else "" for row in values]
+        columns[name] = parse_column(cells, kind)
+    return columns
+
+
+# Function to get the statistics of each number column of parse_sheet_values():
+# {name: {'count', 'missing', 'mean', 'min', 'max', 'std', 'p5', 'p25', 'p50', 'p75', 'p95'}}
+# Only valid cells are counted. A column without valid cells has count 0 and None elsewhere.
+def summarize_columns(columns, percentiles=(5, 25, 50, 75, 95)):
+    summary = {}
+    for name, column in columns.items():
+        if column.dtype.kind != 'f':
+            continue
+        valid = column.compressed()
+        stats = {'count': int(valid.size), 'missing': int(column.size - valid.size)}
+        if valid.size:
+            stats.update({
+                'mean': float(valid.mean()),
+                'min': float(valid.min()),
+                'max': float(valid.max()),
+                'std': float(valid.std(ddof=1)) if valid.size > 1 else 0.0,
+            })
+            for p, value in zip(percentiles, np.percentile(valid, percentiles)):
+                stats[f'p{p}'] = float(value)
+        else:
+            stats.update({'mean': None, 'min': None, 'max': None, 'std': None})
+            stats.update({f'p{p}': None for p in percentiles})
+        summary[name] = stats
+    return summary
+
+
+# Function to get the statistics of the number columns of a sheet `values` (see summarize_columns).
+# Only the number columns are parsed.
+def summarize_sheet_values(values, schema=None, percentiles=(5, 25, 50, 75, 95)):
+    return summarize_columns(parse_sheet_values(values, schema, kinds=("float",)), percentiles)
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the local database part of the dht11 APP. All writes of sensor readings to sensors.db
+# go through the SensorStore class below, and the functions at the end read time ranges back.
+#
+# Every table has the time as text (as shown in the app and sent to google sheets) and as epoch
+# seconds in the indexed `ts` column, used for all time range queries. Each row also has the
+# sensor_id of the sensor it comes from (see sensors.py).
+
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import alerts
+import rollups
+from sensors import DEFAULT_SENSOR
+
+# Version of the database layout, kept in PRAGMA user_version:
+#   0 - time as TEXT only
+#   1 - `ts` epoch seconds column and index on monitoring, RawHistory and history
+#   2 - minute, hour and day rollup tables (see rollups.py)
+#   3 - sensor_id column on every table (readings of earlier versions are DEFAULT_SENSOR)
+SCHEMA_VERSION = 3
+
+# Tables with their text time column
+TIME_COLUMNS = {'monitoring': 'time', 'RawHistory': 'time', 'history': 'date'}
+
+HISTORY_VALUES = 'mean_temperature, max_temperature, min_temperature, mean_humidity, max_humidity, min_humidity'
+
+
+# Function to convert the text time of the app ("YYYY-MM-DD HH:MM:SS", local time) to epoch seconds
+def to_epoch(time_text):
+    return int(datetime.strptime(time_text, "%Y-%m-%d %H:%M:%S").timestamp())
+
+
+# This class is the write path to the SQLite database.
+# - journal_mode WAL: a commit appends to the -wal file instead of rewriting the database pages,
+#   and the History page can read while the app writes
+# - synchronous NORMAL: in WAL mode the database can't be corrupted by a power cut, only the
+#   last commits may be lost, and a commit needs no fsync (the fsync happens at checkpoints)
+# - monitoring and RawHistory (and the outbox rows for google sheets) are written in one
+#   transaction, so one commit per sample instead of two
+# - group_commit > 1 keeps that many samples in memory and writes them in one transaction
+#   (fewer writes on the SD card, but up to group_commit samples are lost if the Pi crashes)
+# - the minute, hour and day rollups are updated in the same transaction as the readings
+# - readings left out by the compression (see compression.py) only go to the rollups, with the
+#   next commit, so they don't cost a write of their own
+# - alerts that fire or clear (see alerts.py) are saved in the transaction of their reading
+class SensorStore:
+    def __init__(self, db_path='sensors.db', journal_mode='WAL', synchronous='NORMAL', group_commit=1,
+                 outbox=None):
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.group_commit = max(1, group_commit)
+
+        # Optional uplink Outbox, its rows are saved in the same transaction as the readings
+        self.outbox = outbox
+
+        # Connect to SQLite database and set the journal and sync modes.
+        # The connection may be used from more than one thread, the caller makes sure only one
+        # thread uses it at a time
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        # Incremental vacuum lets the retention worker give the space of deleted readings back to
+        # the file system (only takes effect on a new database, see migrate_db.py --vacuum)
+        self.conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self.conn.execute(f'PRAGMA journal_mode={journal_mode}')
+        self.conn.execute(f'PRAGMA synchronous={synchronous}')
+        self.create_tables()
+        migrate(self.conn)
+        self.rollups = rollups.RollupWriter()
+
+        # Samples and outbox rows waiting for the next group commit, and the readings for the
+        # rollups, (sensor_id, ts, temperature, humidity), and the alerts
+        self.pending_readings = []
+        self.pending_outbox = []
+        self.pending_rollups = []
+        self.pending_alerts = []
+
+        # Commit latencies in milliseconds (the last 1000 commits)
+        self.commit_times = deque(maxlen=1000)
+        self.commit_count = 0
+
+    def create_tables(self):
+        # Create the necessary SQlite database tables if it doesn't exist
+        self.conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS monitoring (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            time TEXT NOT NULL,
+            temperature REAL NOT NULL,
+            humidity REAL NOT NULL,
+            ts INTEGER,
+            sensor_id TEXT NOT NULL DEFAULT '{DEFAULT_SENSOR}'
+        )
+        ''')
+        self.conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            mean_temperature REAL,
+            max_temperature REAL,
+            min_temperature REAL,
+            mean_humidity REAL,
+            max_humidity REAL,
+            min_humidity REAL,
+            ts INTEGER,
+            sensor_id TEXT NOT NULL DEFAULT '{DEFAULT_SENSOR}'
+        )
+        ''')
+        self.conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS RawHistory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            time TEXT NOT NULL,
+            temperature REAL NOT NULL,
+            humidity REAL NOT NULL,
+            ts INTEGER,
+            sensor_id TEXT NOT NULL DEFAULT '{DEFAULT_SENSOR}'
+        )
+        ''')
+        rollups.create_rollup_tables(self.conn)
+        alerts.create_alerts_table(self.conn)
+
+        # Commit the tables creation to the database
+        self.conn.commit()
+
+    def insert_reading(self, time_text, temperature, humidity, outbox_items=(), ts=None, sensor_id=DEFAULT_SENSOR,
+                       rollup=True):
+        # Add one sample of a sensor to monitoring and RawHistory (and its rows to the outbox).
+        # ts is the time in epoch seconds (taken from time_text if not given).
+        # It is written now, or with the next group commit if group_commit > 1.
+        # rollup=False when the reading was already given to add_to_rollups
+        if ts is None:
+            ts = to_epoch(time_text)
+        self.pending_readings.append((time_text, temperature, humidity, int(ts), sensor_id))
+        if rollup:
+            self.pending_rollups.append((sensor_id, int(ts), temperature, humidity))
+        self.pending_outbox.extend(outbox_items)
+        if len(self.pending_readings) >= self.group_commit:
+            self.commit()
+
+    def add_to_rollups(self, temperature, humidity, ts, sensor_id=DEFAULT_SENSOR):
+        # Add a reading that is not saved (compression) to the rollups. It is written with the
+        # next commit, up to the next saved reading or summary
+        self.pending_rollups.append((sensor_id, int(ts), temperature, humidity))
+
+    def add_alerts(self, fired):
+        # Add the alerts that fired or cleared with a reading (alerts.Alert). They are written with
+        # the reading, call commit() if the reading is not saved (compression)
+        self.pending_alerts.extend(fired)
+
+    def commit(self):
+        # Write the pending samples in a single transaction
+        if not (self.pending_readings or self.pending_outbox or self.pending_rollups or self.pending_alerts):
+            return
+        start = time.perf_counter()
+        with self.conn:
+            self.conn.executemany('''
+            INSERT INTO monitoring (time, temperature, humidity, ts, sensor_id) VALUES (?, ?, ?, ?, ?)
+            ''', self.pending_readings)
+            self.conn.executemany('''
+            INSERT INTO RawHistory (time, temperature, humidity, ts, sensor_id) VALUES (?, ?, ?, ?, ?)
+            ''', self.pending_readings)
+            self.rollups.add(self.conn, self.pending_rollups)
+            if self.pending_alerts:
+                alerts.insert_alerts(self.conn, self.pending_alerts)
+            if self.outbox is not None and self.pending_outbox:
+                self.outbox.add(self.pending_outbox, commit=False, conn=self.conn)
+        self.record_commit_time(start)
+        self.pending_readings = []
+        self.pending_outbox = []
+        self.pending_rollups = []
+        self.pending_alerts = []
+
+    def add_summary(self, history_data, outbox_items=(), sensor_id=DEFAULT_SENSOR):
+        # Save a history row and empty the monitoring table in one transaction
+        self.add_summaries([(history_data, sensor_id)], outbox_items)
+
+    def add_summaries(self, summaries, outbox_items=()):
+        # Save the history rows of several sensors, (history_data, sensor_id), and empty the
+        # monitoring table in one transaction
+        self.commit()
+        start = time.perf_counter()
+        with self.conn:
+            self.conn.executemany('''
+            INSERT INTO history (date, mean_temperature, max_temperature, min_temperature, mean_humidity, max_humidity, min_humidity, ts, sensor_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [tuple(history_data) + (to_epoch(history_data[0]), sensor_id)
+                  for history_data, sensor_id in summaries])
+            self.conn.execute('DELETE FROM monitoring')
+            if self.outbox is not None and outbox_items:
+                self.outbox.add(outbox_items, commit=False, conn=self.conn)
+        self.record_commit_time(start)
+
+    def window_start(self):
+        # Start of the current summary window (epoch seconds): the time of the last history row,
+        # or of the first reading in monitoring before the first summary. None without readings
+        row = self.conn.execute('SELECT max(ts) FROM history').fetchone()
+        if row[0] is None:
+            row = self.conn.execute('SELECT min(ts) FROM monitoring').fetchone()
+        return row[0]
+
+    def clear_monitoring(self):
+        # Empty the monitoring table (when there was nothing to summarize)
+        self.commit()
+        with self.conn:
+            self.conn.execute('DELETE FROM monitoring')
+
+    def prune_rollups(self, now=None):
+        # Delete the rollup rows older than the retention of their tier (rollups.TIERS)
+        self.commit()
+        return rollups.prune(self.conn, now)
+
+    def record_commit_time(self, start):
+        self.commit_times.append((time.perf_counter() - start) * 1000.0)
+        self.commit_count += 1
+
+    def commit_stats(self):
+        # Commit latency of the recent commits, in milliseconds
+        times = sorted(self.commit_times)
+        if not times:
+            return {'mode': f"{self.journal_mode}/{self.synchronous}/group {self.group_commit}", 'commits': 0}
+        return {
+            'mode': f"{self.journal_mode}/{self.synchronous}/group {self.group_commit}",
+            'commits': self.commit_count,
+            'mean_ms': sum(times) / len(times),
+            'p50_ms': times[len(times) // 2],
+            'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))],
+            'max_ms': times[-1],
+        }
+
+    def format_commit_stats(self):
+        stats = self.commit_stats()
+        if not stats['commits']:
+            return f"{stats['mode']}: no commits yet"
+        return (f"{stats['mode']}: {stats['commits']} commits, mean {stats['mean_ms']:.2f} ms, "
+                f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+
+    def close(self):
+        # Write what is still pending and close the database
+        self.commit()
+        self.conn.close()
+
+
+# Function to bring a database to SCHEMA_VERSION, in place, one version at a time.
+# progress(step, done, total) is called after each chunk.
+def migrate(conn, chunk_size=10000, progress=None):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < 1:
+        add_epoch_columns(conn, chunk_size, progress)
+        with conn:
+            conn.execute('PRAGMA user_version = 1')
+    if version < 3:
+        # Before the rollups of version 2, as they are built per sensor
+        add_sensor_columns(conn)
+    if version < 2:
+        # The rollup tables are created empty (SensorStore.create_tables), fill them from RawHistory.
+        # Started again from empty if a previous run was interrupted
+        rollups.create_rollup_tables(conn)
+        with conn:
+            for table, _, _ in rollups.TIERS.values():
+                conn.execute(f'DELETE FROM {table}')
+        if [row for row in conn.execute('PRAGMA table_info(RawHistory)')]:
+            rollups.backfill(conn, progress=progress)
+        with conn:
+            conn.execute('PRAGMA user_version = 2')
+    if version < 3:
+        with conn:
+            conn.execute('PRAGMA user_version = 3')
+
+
+# Version 1: old tables get the `ts` column, which is filled from the text time chunk_size rows
+# at a time (one transaction per chunk, so memory stays small, a collector writing at the same
+# time only waits for one chunk, and an interrupted migration goes on where it stopped).
+# The indexes are created once the column is filled.
+def add_epoch_columns(conn, chunk_size, progress):
+    for table, time_column in TIME_COLUMNS.items():
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if not columns:
+            continue  # the table doesn't exist (it is created by SensorStore)
+        if 'ts' not in columns:
+            with conn:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN ts INTEGER')
+
+        # Fill ts by id ranges, the text is local time ('utc' converts it like datetime.timestamp())
+        first_id, last_id = conn.execute(f'SELECT min(id), max(id) FROM {table} WHERE ts IS NULL').fetchone()
+        if first_id is not None:
+            total = last_id - first_id + 1
+            for start in range(first_id, last_id + 1, chunk_size):
+                with conn:
+                    conn.execute(f"""
+                    UPDATE {table} SET ts = CAST(strftime('%s', {time_column}, 'utc') AS INTEGER)
+                    WHERE id >= ? AND id < ? AND ts IS NULL
+                    """, (start, start + chunk_size))
+                if progress is not None:
+                    progress(table, min(total, start + chunk_size - first_id), total)
+
+        with conn:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table.lower()}_ts ON {table}(ts)')
+    with conn:
+        conn.execute('DROP INDEX IF EXISTS history_date')
+
+
+# Version 3: old tables get the sensor_id column. ADD COLUMN with a default doesn't rewrite the
+# table (the old rows read the default), so this is fast whatever the size of the table. The
+# rollup tables get sensor_id in their primary key (see rollups.add_sensor_to_rollups).
+def add_sensor_columns(conn):
+    for table in TIME_COLUMNS:
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if not columns:
+            continue
+        with conn:
+            if 'sensor_id' not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN sensor_id TEXT NOT NULL DEFAULT '{DEFAULT_SENSOR}'")
+            # For the time range queries of one sensor
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table.lower()}_sensor_ts ON {table}(sensor_id, ts)')
+    rollups.add_sensor_to_rollups(conn)
+
+
+#----------------------------------------------------------------------------
+# Time range queries. They use the ts index and return the rows oldest first:
+#   monitoring, RawHistory: (id, ts, temperature, humidity, sensor_id)
+#   history:                (id, ts, mean_temperature, max_temperature, min_temperature,
+#                            mean_humidity, max_humidity, min_humidity, sensor_id)
+# sensor_id None reads the rows of all the sensors.
+# The result is a cursor, so a long range is not loaded into memory at once.
+#----------------------------------------------------------------------------
+
+# Function to read the rows with start <= ts < end (epoch seconds)
+def read_range(conn, start, end, table='RawHistory', sensor_id=None):
+    values = HISTORY_VALUES if table == 'history' else 'temperature, humidity'
+    if sensor_id is None:
+        return conn.execute(f'SELECT id, ts, {values}, sensor_id FROM {table} WHERE ts >= ? AND ts < ? ORDER BY ts',
+                            (int(start), int(end)))
+    return conn.execute(f'SELECT id, ts, {values}, sensor_id FROM {table} '
+                        f'WHERE sensor_id = ? AND ts >= ? AND ts < ? ORDER BY ts', (sensor_id, int(start), int(end)))
+
+
+# Function to read the rows of the last `minutes` minutes
+def read_last_minutes(conn, minutes, table='RawHistory', now=None, sensor_id=None):
+    now = time.time() if now is None else now
+    return read_range(conn, now - minutes * 60, now + 1, table, sensor_id)
+
+
+# Function to read the rows of one day (a date, or "YYYY-MM-DD"), from local midnight to midnight
+def read_day(conn, day, table='RawHistory', sensor_id=None):
+    if isinstance(day, str):
+        day = datetime.strptime(day, "%Y-%m-%d").date()
+    start = datetime.combine(day, datetime.min.time())
+    return read_range(conn, start.timestamp(), (start + timedelta(days=1)).timestamp(), table, sensor_id)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Tests of aggregates.py: the running statistics must give the values of the statistics module.
+# Run them in this folder:  python -m pytest test_aggregates.py
+
+import random
+import statistics
+
+import pytest
+
+from aggregates import RunningStats, WindowAggregator
+
+
+def make_values(count, seed=1):
+    random.seed(seed)
+    return [25 + random.gauss(0, 3) for _ in range(count)]
+
+
+def stats_of(values):
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+
+def test_running_stats_match_statistics():
+    values = make_values(1000)
+    stats = stats_of(values)
+    assert stats.count == len(values)
+    assert stats.min == min(values)
+    assert stats.max == max(values)
+    assert stats.average() == pytest.approx(statistics.fmean(values))
+    assert stats.variance() == pytest.approx(statistics.pvariance(values))
+    assert stats.variance(ddof=1) == pytest.approx(statistics.variance(values))
+    assert stats.stddev(ddof=1) == pytest.approx(statistics.stdev(values))
+
+
+def test_running_stats_stay_accurate_with_a_large_offset():
+    # The naive sum of squares loses every digit here, Welford's method does not
+    values = [1e9 + value for value in make_values(1000)]
+    assert stats_of(values).variance(ddof=1) == pytest.approx(statistics.variance(values), rel=1e-6)
+
+
+def test_merge_is_the_same_as_adding_every_value():
+    values = make_values(500)
+    merged = stats_of(values[:200])
+    merged.merge(stats_of(values[200:]))
+    merged.merge(RunningStats())
+    assert merged.count == len(values)
+    assert merged.min == min(values) and merged.max == max(values)
+    assert merged.average() == pytest.approx(statistics.fmean(values))
+    assert merged.variance(ddof=1) == pytest.approx(statistics.variance(values))
+
+    empty = RunningStats()
+    empty.merge(stats_of(values))
+    assert empty.variance() == pytest.approx(statistics.pvariance(values))
+
+
+def test_no_values():
+    stats = RunningStats()
+    assert stats.average() is None
+    assert stats.variance() is None
+    assert stats.stddev(ddof=1) is None
+    assert stats_of([3.0]).variance(ddof=1) is None
+
+
+def test_from_totals_keeps_count_mean_min_max():
+    values = make_values(60)
+    stats = RunningStats.from_totals(len(values), sum(values), min(values), max(values))
+    assert stats.count == len(values)
+    assert stats.average() == pytest.approx(statistics.fmean(values))
+    assert (stats.min, stats.max) == (min(values), max(values))
+    assert RunningStats.from_totals(0, 0.0, None, None).count == 0
+
+
+def test_window_summary_row():
+    window = WindowAggregator()
+    assert window.summary_row("2024-01-01") is None
+    for temperature, humidity in [(20.0, 50.0), (22.0, 60.0), (24.0, 55.0)]:
+        window.add(temperature, humidity)
+    assert window.summary_row("2024-01-01") == ("2024-01-01", 22.0, 24.0, 20.0, 55.0, 60.0, 50.0)
+    window.reset()
+    assert window.count() == 0
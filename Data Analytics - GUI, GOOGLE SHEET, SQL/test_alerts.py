@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Tests of alerts.py: when an alert fires and clears, with the hysteresis ("clear"), the debounce
+# ("for") and the window stats.
+# Run them in this folder:  python -m pytest test_alerts.py
+
+import json
+import sqlite3
+
+import pytest
+
+from alerts import (CLEARED, FIRED, AlertEngine, AlertRule, create_alerts_table, insert_alerts, load_rules,
+                    read_active_alerts)
+
+
+def run(engine, temperatures, sensor_id='dht11', step=2.0, humidity=50.0):
+    # (index of the reading, state) of each alert, one reading every `step` seconds
+    events = []
+    for i, temperature in enumerate(temperatures):
+        for alert in engine.add(sensor_id, 1700000000 + i * step, temperature, humidity):
+            events.append((i, alert.state))
+    return events
+
+
+def test_hysteresis():
+    engine = AlertEngine([AlertRule('hot', above=30, clear=29)])
+    # Going up and down around 30 fires once, it only clears below 29
+    events = run(engine, [28, 30.5, 29.8, 30.2, 29.5, 30.1, 28.9, 29.5, 30.5])
+    assert events == [(1, FIRED), (6, CLEARED), (8, FIRED)]
+
+
+def test_below_rule():
+    engine = AlertEngine([AlertRule('dry', 'humidity', below=30, clear=33)])
+    events = []
+    for i, humidity in enumerate([40, 29, 31, 32, 34, 25]):
+        events += [(i, alert.state) for alert in engine.add('dht11', i * 2.0, 20.0, humidity)]
+    assert events == [(1, FIRED), (4, CLEARED), (5, FIRED)]
+
+
+def test_debounce():
+    engine = AlertEngine([AlertRule('hot', above=30, clear=29, debounce=6)])
+    # A spike of two readings (2 s) doesn't fire, four readings past the level for 6 s do
+    events = run(engine, [28, 31, 31, 28, 31, 31, 31, 31, 31, 28, 28, 28, 28, 28])
+    assert events == [(7, FIRED), (12, CLEARED)]
+
+
+def test_window_mean():
+    engine = AlertEngine([AlertRule('warm', stat='mean', window=10, above=28)])
+    # No stat before the window is full, then the mean of the last 10 s
+    events = run(engine, [30] * 3 + [27] * 10 + [29] * 10)
+    assert events[0] == (5, FIRED)
+    assert events[1][1] == CLEARED
+
+
+def test_sensors_and_restart():
+    rule = AlertRule('hot', above=30, sensors=['kitchen'])
+    engine = AlertEngine([rule])
+    assert run(engine, [35], sensor_id='dht11') == []
+    alerts = engine.add('kitchen', 0.0, 35, 50)
+    assert [alert.state for alert in alerts] == [FIRED]
+    assert engine.active() == [('kitchen', 'hot', rule.message)]
+
+    # After a restart the active alert doesn't fire again
+    conn = sqlite3.connect(':memory:')
+    create_alerts_table(conn)
+    insert_alerts(conn, alerts)
+    assert [row[:2] for row in read_active_alerts(conn)] == [('kitchen', 'hot')]
+    restarted = AlertEngine([rule])
+    assert restarted.load(conn) == 1
+    assert restarted.add('kitchen', 2.0, 35, 50) == []
+    assert [alert.state for alert in restarted.add('kitchen', 4.0, 20, 50)] == [CLEARED]
+
+
+def test_wrong_rules():
+    with pytest.raises(ValueError):
+        AlertRule('both', above=30, below=10)
+    with pytest.raises(ValueError):
+        AlertRule('clear', above=30, clear=31)
+    with pytest.raises(ValueError):
+        AlertRule('window', stat='mean', above=30)
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / 'alerts.json'
+    assert [rule.name for rule in load_rules(str(path))] == ['temperature', 'humidity']
+    path.write_text(json.dumps([{"name": "dry", "value": "humidity", "below": 30, "clear": 33, "for": 60}]))
+    rule, = load_rules(str(path))
+    assert (rule.value, rule.above, rule.level, rule.clear, rule.debounce) == ('humidity', False, 30, 33, 60)
+    path.write_text(json.dumps([{"name": "a", "above": 1}, {"name": "a", "above": 2}]))
+    with pytest.raises(ValueError):
+        load_rules(str(path))
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Tests of archive.py: readings written to a day file must be read back as they were (values
+# rounded to 1/100), and only the asked time range is returned.
+# Run them in this folder:  python -m pytest test_archive.py
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from archive import (ArchiveReader, MAGIC, day_path, decode_values, encode_values, parse_archive_name,
+                     write_archive)
+from sensors import DEFAULT_SENSOR
+
+DAY = datetime(2024, 3, 10)
+
+
+def make_day(step=2, seed=1):
+    rng = np.random.default_rng(seed)
+    start = int(DAY.timestamp())
+    ts = np.arange(start, start + 86400, step, dtype=np.int64)
+    temperature = np.round(25 + np.cumsum(rng.normal(0, 0.05, len(ts))), 1)
+    humidity = np.round(60 + np.cumsum(rng.normal(0, 0.1, len(ts))), 1)
+    return ts, temperature, humidity
+
+
+def test_encode_decode_round_trip():
+    values = np.array([25.0, 25.1, 25.1, -10.25, np.nan, 0.0, 99.99, -40.0, 327.67])
+    decoded = decode_values(encode_values(values))
+    assert np.isnan(decoded[4])
+    np.testing.assert_allclose(np.delete(decoded, 4), np.delete(values, 4), atol=0.005)
+
+
+def test_encode_decode_large_steps():
+    # A difference larger than int16 wraps around, the running sum wraps back
+    values = np.array([-300.0, 300.0, -300.0, 0.0])
+    np.testing.assert_allclose(decode_values(encode_values(values)), values)
+
+
+def test_write_and_read_a_day(tmp_path):
+    ts, temperature, humidity = make_day()
+    path = day_path(str(tmp_path), DAY, 'room')
+    write_archive(path, ts, temperature, humidity)
+    with open(path, 'rb') as file:
+        assert file.read(4) == MAGIC
+    assert not os.path.exists(path + '.tmp')
+
+    reader = ArchiveReader(str(tmp_path), sensor_id='room')
+    try:
+        read_ts, read_temperature, read_humidity = reader.read(ts[0], ts[-1] + 1)
+        np.testing.assert_array_equal(read_ts, ts)
+        np.testing.assert_allclose(read_temperature, temperature, atol=0.005)
+        np.testing.assert_allclose(read_humidity, humidity, atol=0.005)
+
+        # A range that starts and ends inside blocks
+        start, end = ts[0] + 5000, ts[0] + 9001
+        part_ts, part_temperature, _ = reader.read(start, end)
+        wanted = (ts >= start) & (ts < end)
+        np.testing.assert_array_equal(part_ts, ts[wanted])
+        np.testing.assert_allclose(part_temperature, temperature[wanted], atol=0.005)
+
+        assert reader.first_day() == DAY.timestamp()
+    finally:
+        reader.close()
+
+    # The files of another sensor are not read
+    other = ArchiveReader(str(tmp_path), sensor_id=DEFAULT_SENSOR)
+    assert len(other.read(ts[0], ts[-1] + 1)[0]) == 0
+    assert other.first_day() is None
+
+
+def test_bad_file(tmp_path):
+    path = day_path(str(tmp_path), DAY)
+    with open(path, 'wb') as file:
+        file.write(b'\0' * 64)
+    reader = ArchiveReader(str(tmp_path))
+    with pytest.raises(ValueError):
+        reader.read(DAY.timestamp(), DAY.timestamp() + 3600)
+
+
+def test_archive_names():
+    assert parse_archive_name(os.path.basename(day_path('a', DAY))) == (DEFAULT_SENSOR, '2024-03-10')
+    assert parse_archive_name(os.path.basename(day_path('a', DAY, 'room-2'))) == ('room-2', '2024-03-10')
+    assert parse_archive_name('notes.txt') is None
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Tests of compression.py: the series rebuilt from the kept readings must stay within the
+# deviation of every reading, for both methods.
+# Run them in this folder:  python -m pytest test_compression.py
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from compression import METHODS, CompressionPolicy, interpolate
+
+TOLERANCE = 1e-9
+
+
+def make_readings(n=5000, step=2.0, seed=1):
+    # (time, temperature, humidity): a slow wave with noise, and a step in the middle
+    random.seed(seed)
+    readings = []
+    for i in range(n):
+        time = 1700000000 + i * step
+        temperature = 25 + math.sin(i / 200) * 3 + random.uniform(-0.2, 0.2) + (4 if i > n // 2 else 0)
+        humidity = 60 + math.cos(i / 300) * 10 + random.uniform(-0.5, 0.5)
+        readings.append((time, round(temperature, 1), round(humidity, 1)))
+    return readings
+
+
+def compress(policy, readings):
+    compressor = policy.compressor()
+    kept = []
+    for reading in readings:
+        kept += compressor.add(*reading, item=reading)
+    kept += compressor.flush()
+    return compressor, kept
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_rebuilt_series_within_the_deviation(method):
+    policy = CompressionPolicy(method, temperature=0.5, humidity=1.0)
+    readings = make_readings()
+    compressor, kept = compress(policy, readings)
+    assert len(kept) < len(readings) / 3
+    assert compressor.written == len(kept) and compressor.readings == len(readings)
+    assert kept[0] == readings[0] and kept[-1] == readings[-1]
+
+    times = [reading[0] for reading in readings]
+    kept_times = [reading[0] for reading in kept]
+    assert kept_times == sorted(set(kept_times))
+    for column, deviation in ((1, 0.5), (2, 1.0)):
+        rebuilt = interpolate(kept_times, [reading[column] for reading in kept], times, policy.rebuild(),
+                              policy.max_gap)
+        error = np.abs(rebuilt - [reading[column] for reading in readings])
+        assert not np.isnan(rebuilt).any()
+        assert error.max() <= deviation + TOLERANCE
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_max_gap(method):
+    # Readings that never change are still kept every max_gap seconds
+    policy = CompressionPolicy(method, max_gap=60.0)
+    readings = [(1700000000 + i * 2.0, 20.0, 50.0) for i in range(300)]
+    _, kept = compress(policy, readings)
+    gaps = np.diff([reading[0] for reading in kept])
+    assert gaps.max() <= 60.0
+    assert len(kept) <= 600 / 60 + 2
+
+
+def test_interpolate_holes_and_ends():
+    times = [0.0, 10.0, 20.0, 1000.0, 1010.0]
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    query = [-5.0, 0.0, 5.0, 20.0, 500.0, 1005.0, 1010.0, 1020.0]
+    linear = interpolate(times, values, query, 'linear', max_gap=300.0)
+    np.testing.assert_allclose(linear, [np.nan, 1.0, 1.5, 3.0, np.nan, 4.5, 5.0, np.nan])
+    previous = interpolate(times, values, query, 'previous', max_gap=300.0)
+    np.testing.assert_allclose(previous, [np.nan, 1.0, 1.0, 3.0, np.nan, 4.0, 5.0, np.nan])
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        CompressionPolicy('zip')
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Tests of downsample.py: the number of points kept, the first and last points, and the peaks.
+# Run them in this folder:  python -m pytest test_downsample.py
+
+import numpy as np
+import pytest
+
+from downsample import lttb, minmax
+
+
+def make_line(n=10000, seed=1):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float) * 2.0
+    y = 25 + np.sin(x / 500) + rng.normal(0, 0.1, n)
+    return x, y
+
+
+@pytest.mark.parametrize('threshold', [3, 10, 500, 9999])
+def test_lttb_size_and_endpoints(threshold):
+    x, y = make_line()
+    kept = lttb(x, y, threshold)
+    assert len(kept) == threshold
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    # Sorted indexes, each point once
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_keeps_every_point_when_there_are_few():
+    x, y = make_line(100)
+    np.testing.assert_array_equal(lttb(x, y, 100), np.arange(100))
+    np.testing.assert_array_equal(lttb(x, y, 500), np.arange(100))
+    np.testing.assert_array_equal(lttb(x, y, 2), np.arange(100))
+
+
+def test_lttb_keeps_a_spike():
+    x, y = make_line()
+    y[4321] = 40.0
+    assert 4321 in lttb(x, y, 200)
+
+
+def test_minmax_keeps_the_extremes():
+    x, y = make_line()
+    kept = minmax(x, y, 100)
+    assert len(kept) <= 200
+    assert np.all(np.diff(kept) > 0)
+    assert np.argmin(y) in kept and np.argmax(y) in kept
+    np.testing.assert_array_equal(minmax(x, y, len(x)), np.arange(len(x)))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Tests of rollups.py: the tiers rebuilt from RawHistory by backfill() must be the same as the ones
+# written reading by reading by RollupWriter.
+# Run them in this folder:  python -m pytest test_rollups.py
+
+import random
+import sqlite3
+
+import pytest
+
+import rollups
+from rollups import TIERS, RollupWriter, backfill, choose_tier, prune, read_rollup
+
+START = 1700000000  # epoch seconds, not on a minute
+
+
+def make_readings(days=3, seed=1):
+    # (sensor_id, ts, temperature, humidity) of two sensors, every 7 seconds
+    random.seed(seed)
+    return [(sensor_id, ts, round(20 + random.uniform(-5, 5), 1), round(55 + random.uniform(-10, 10), 1))
+            for ts in range(START, START + days * 86400, 7) for sensor_id in ('dht11', 'room')]
+
+
+def make_db(readings):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE RawHistory (id INTEGER PRIMARY KEY AUTOINCREMENT, ts INTEGER, '
+                 'temperature REAL, humidity REAL, sensor_id TEXT)')
+    rollups.create_rollup_tables(conn)
+    conn.executemany('INSERT INTO RawHistory (sensor_id, ts, temperature, humidity) VALUES (?, ?, ?, ?)',
+                     readings)
+    return conn
+
+
+def tier_rows(conn, table):
+    return conn.execute(f'SELECT * FROM {table} ORDER BY sensor_id, bucket').fetchall()
+
+
+def assert_same_rows(rows, expected):
+    assert len(rows) == len(expected)
+    for row, other in zip(rows, expected):
+        # sensor_id, bucket and samples are exact, the sums only up to the rounding of the additions
+        assert row[:3] == other[:3]
+        assert row[3:] == pytest.approx(other[3:])
+
+
+def test_backfill_matches_the_rollup_writer():
+    readings = make_readings()
+    incremental = make_db(readings)
+    writer = RollupWriter()
+    # Batches of a few readings, like the group commits of SensorStore
+    for i in range(0, len(readings), 37):
+        writer.add(incremental, readings[i:i + 37])
+
+    rebuilt = make_db(readings)
+    # Chunks that don't start on an hour or a day: the hour and day rows are merged between chunks
+    backfill(rebuilt, chunk_seconds=5 * 3600 + 17)
+
+    for table, _, _ in TIERS.values():
+        assert_same_rows(tier_rows(rebuilt, table), tier_rows(incremental, table))
+    samples, = rebuilt.execute(f"SELECT sum(samples) FROM {TIERS['day'][0]}").fetchone()
+    assert samples == len(readings)
+
+
+def test_backfill_of_a_time_range():
+    readings = make_readings(days=1)
+    conn = make_db(readings)
+    backfill(conn, START + 3600, START + 7200)
+    samples, = conn.execute(f"SELECT sum(samples) FROM {TIERS['minute'][0]}").fetchone()
+    assert samples == sum(1 for _, ts, _, _ in readings if START + 3600 <= ts < START + 7200)
+
+
+def test_read_rollup():
+    readings = make_readings(days=1)
+    conn = make_db(readings)
+    backfill(conn)
+    rows = read_rollup(conn, START, START + 3600, tier='minute', sensor_id='room').fetchall()
+    # The minute START falls in, and the 60 minutes after it (START is not on a minute)
+    assert len(rows) == 61
+    bucket, samples, mean_temp, min_temp, max_temp, _, _, _ = rows[1]
+    values = [temperature for sensor_id, ts, temperature, _ in readings
+              if sensor_id == 'room' and bucket <= ts < bucket + 60]
+    assert samples == len(values)
+    assert mean_temp == pytest.approx(sum(values) / len(values))
+    assert (min_temp, max_temp) == (min(values), max(values))
+
+
+def test_prune_keeps_the_rows_within_the_retention():
+    conn = make_db(make_readings(days=1))
+    backfill(conn)
+    table, _, keep = TIERS['minute']
+    now = START + keep + 12 * 3600
+    assert prune(conn, now) > 0
+    first, = conn.execute(f'SELECT min(bucket) FROM {table}').fetchone()
+    assert first >= now - keep
+    assert conn.execute(f"SELECT count(*) FROM {TIERS['day'][0]}").fetchone()[0] > 0
+
+
+def test_choose_tier():
+    now = START + 86400
+    assert choose_tier(now - 3600, now, now=now) == 'minute'
+    assert choose_tier(now - 30 * 86400, now, now=now) == 'hour'
+    assert choose_tier(now - 5 * 365 * 86400, now, now=now) == 'day'
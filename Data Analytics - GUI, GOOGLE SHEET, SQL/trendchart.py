@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the trend graph of the history page of the dht11 APP: temperature and humidity of one
+# sensor over hours to months, with zoom and pan (matplotlib toolbar).
+#
+# The time axis is cut in tiles. The tile size is the power of two seconds just above the shown
+# span, so a zoom level always uses the same tiles and panning only needs the next tile. Each
+# tile is read once and downsampled to about one point per pixel (see downsample.py), then kept
+# in a small cache:
+#   - short tiles come from the raw readings (RawHistory and the archive, see archive.read_raw),
+#     downsampled with LTTB (or min/max). With compression the series is first rebuilt from the
+#     kept readings (see compression.read_interpolated)
+#   - long tiles come from the rollup tables (see rollups.py): the mean is drawn as the line and
+#     the min/max of each bucket as a band around it
+
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter, date2num
+
+from archive import ARCHIVE_DIR, ArchiveReader, read_raw
+from compression import read_interpolated
+from downsample import lttb, minmax
+from rollups import TIERS, read_rollup
+from sensors import DEFAULT_SENSOR
+
+MIN_TILE_SECONDS = 64
+EPOCH_MDATE = date2num(datetime(1970, 1, 1))  # matplotlib date of the epoch
+
+
+# Function to convert epoch seconds to matplotlib dates in local time (the offset of each time
+# is used, so a graph over months stays right across a daylight saving change)
+def epoch_to_local_mdates(times):
+    offsets = np.array([time.localtime(t).tm_gmtoff for t in np.asarray(times, dtype=float).tolist()], dtype=float)
+    return EPOCH_MDATE + (np.asarray(times, dtype=float) + offsets) / 86400.0
+
+
+# Function to convert a matplotlib date in local time back to epoch seconds
+def local_mdate_to_epoch(mdate):
+    seconds = (mdate - EPOCH_MDATE) * 86400.0
+    return seconds - time.localtime(seconds).tm_gmtoff
+
+
+# One series of a tile: times (epoch seconds), mean values and the low/high band (the same as the
+# mean for raw readings)
+class TrendSeries:
+    __slots__ = ('times', 'mean', 'low', 'high')
+
+    def __init__(self, times, mean, low=None, high=None):
+        self.times = times
+        self.mean = mean
+        self.low = mean if low is None else low
+        self.high = mean if high is None else high
+
+    def __len__(self):
+        return len(self.times)
+
+    def take(self, index):
+        return TrendSeries(self.times[index], self.mean[index], self.low[index], self.high[index])
+
+    @staticmethod
+    def join(parts):
+        if not parts:
+            empty = np.empty(0)
+            return TrendSeries(empty, empty)
+        return TrendSeries(*(np.concatenate([getattr(part, name) for part in parts]) for name in TrendSeries.__slots__))
+
+
+# This class reads the tiles of the trend graph and keeps the last max_tiles of them.
+# Tiles that are not over yet (they end in the future) are read again each time.
+# method is 'lttb' or 'minmax' (how the raw readings are downsampled). A tile is read from the
+# raw readings when it has at most raw_per_point readings per point, from the rollups otherwise.
+# compression is the CompressionPolicy of the collector (None if every reading is saved).
+class TrendTiles:
+    def __init__(self, conn, archive_dir=ARCHIVE_DIR, max_tiles=64, method='lttb', raw_per_point=20,
+                 compression=None):
+        self.conn = conn
+        self.compression = compression
+        self.archive_dir = archive_dir
+        self.max_tiles = max_tiles
+        self.method = method
+        self.raw_per_point = raw_per_point
+        self.cache = OrderedDict()  # (sensor_id, tile_seconds, index, points) -> (temperature, humidity)
+        self.readers = {}           # sensor_id -> ArchiveReader
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+        self.cache.clear()
+
+    @staticmethod
+    def tile_seconds(start, end):
+        return 2 ** max(int(math.log2(MIN_TILE_SECONDS)), math.ceil(math.log2(max(end - start, 1))))
+
+    @staticmethod
+    def points_per_tile(pixels):
+        # Rounded up, so a small resize of the window still uses the cached tiles
+        return max(100, math.ceil(pixels / 100) * 100)
+
+    def view(self, sensor_id, start, end, pixels):
+        # (temperature, humidity) TrendSeries of the tiles covering start..end (epoch seconds)
+        size = self.tile_seconds(start, end)
+        points = self.points_per_tile(pixels)
+        tiles = [self.tile(sensor_id, size, index, points)
+                 for index in range(int(start // size), int(end // size) + 1)]
+        return tuple(TrendSeries.join([tile[i] for tile in tiles if len(tile[i])]) for i in range(2))
+
+    def prefetch(self, sensor_id, start, end, pixels):
+        # Read the tiles just before and after start..end, so panning doesn't have to wait
+        size = self.tile_seconds(start, end)
+        points = self.points_per_tile(pixels)
+        for index in (int(start // size) - 1, int(end // size) + 1):
+            if index * size < time.time():
+                self.tile(sensor_id, size, index, points)
+
+    def tile(self, sensor_id, size, index, points):
+        key = (sensor_id, size, index, points)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        self.misses += 1
+        start, end = index * size, (index + 1) * size
+        if self.raw_count(sensor_id, start, end) <= points * self.raw_per_point:
+            tile = self.read_raw_tile(sensor_id, start, end, points)
+        else:
+            tile = self.read_rollup_tile(sensor_id, start, end, points)
+        if end < time.time():
+            self.cache[key] = tile
+            if len(self.cache) > self.max_tiles:
+                self.cache.popitem(last=False)
+        return tile
+
+    def raw_count(self, sensor_id, start, end):
+        # Number of readings of start..end, from the minute rollup (a few hundred rows at most).
+        # Older than the minute rollup, the readings are only read through the other rollups
+        table, _, keep = TIERS['minute']
+        if keep is not None and start < time.time() - keep:
+            return math.inf
+        row = self.conn.execute(f'SELECT SUM(samples) FROM {table} WHERE sensor_id = ? AND bucket >= ? AND bucket < ?',
+                                (sensor_id, int(start) - 60, int(end))).fetchone()
+        return row[0] or 0
+
+    def read_raw_tile(self, sensor_id, start, end, points):
+        reader = self.readers.get(sensor_id)
+        if reader is None:
+            reader = self.readers[sensor_id] = ArchiveReader(self.archive_dir, sensor_id)
+        if self.compression is None:
+            times, temperature, humidity = read_raw(self.conn, start, end, reader, sensor_id)
+        else:
+            # Rebuilt as often as the raw readings can be (the number of readings of the tile is
+            # counted by the rollups, which get every reading)
+            step = max(1.0, (end - start) / (points * self.raw_per_point))
+            times, temperature, humidity = read_interpolated(self.conn, start, end, step, self.compression,
+                                                             reader, sensor_id)
+        tile = []
+        for values in (temperature, humidity):
+            valid = np.isfinite(values)
+            series = TrendSeries(times[valid], values[valid])
+            if self.method == 'minmax':
+                tile.append(series.take(minmax(series.times, series.mean, points // 2)))
+            else:
+                tile.append(series.take(lttb(series.times, series.mean, points)))
+        return tuple(tile)
+
+    def read_rollup_tile(self, sensor_id, start, end, points):
+        # A finer tier than `points` buckets is read (a few thousand rows at most), then groups of
+        # buckets are merged to one point per pixel: weighted mean, lowest min and highest max
+        rows = read_rollup(self.conn, start, end, max_points=4 * points, sensor_id=sensor_id).fetchall()
+        data = np.array(rows, dtype=float).reshape(-1, 8)
+        # Only the buckets that start in this tile, so two tiles never show the same bucket
+        data = data[(data[:, 0] >= start) & (data[:, 0] < end)]
+        groups = np.arange(0, len(data), max(1, math.ceil(len(data) / points)))
+        if not len(groups):
+            empty = TrendSeries(np.empty(0), np.empty(0))
+            return empty, empty
+        samples = np.add.reduceat(data[:, 1], groups)
+        tile = []
+        for mean, low, high in ((2, 3, 4), (5, 6, 7)):
+            tile.append(TrendSeries(data[groups, 0], np.add.reduceat(data[:, mean] * data[:, 1], groups) / samples,
+                                    np.minimum.reduceat(data[:, low], groups),
+                                    np.maximum.reduceat(data[:, high], groups)))
+        return tuple(tile)
+
+
+# This class draws the trend graph on two axes (temperature and humidity, sharing the time axis)
+# and reloads the tiles when the time range changes (zoom or pan with the toolbar). The reload
+# waits delay_ms after the last change, so dragging doesn't read the database for every step.
+class TrendChart:
+    COLORS = ('red', 'blue')
+
+    def __init__(self, figure, axes, canvas, tiles, sensor_id=DEFAULT_SENSOR, delay_ms=150):
+        self.figure = figure
+        self.axes = axes
+        self.canvas = canvas
+        self.tiles = tiles
+        self.sensor_id = sensor_id
+
+        self.lines = [axis.plot([], [], color=color, linewidth=1)[0] for axis, color in zip(axes, self.COLORS)]
+        self.bands = [None, None]
+        axes[0].set_ylabel("Temperature (C)")
+        axes[1].set_ylabel("Humidity (%)")
+        locator = AutoDateLocator()
+        for axis in axes:
+            axis.grid(True)
+            axis.xaxis.set_major_locator(locator)
+            axis.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+
+        self.points = 0  # points given to matplotlib by the last refresh
+        self.refresh_timer = canvas.new_timer(interval=delay_ms)
+        self.refresh_timer.single_shot = True
+        self.refresh_timer.add_callback(self.refresh)
+        self.prefetch_timer = canvas.new_timer(interval=2 * delay_ms)
+        self.prefetch_timer.single_shot = True
+        self.prefetch_timer.add_callback(self.prefetch)
+        self.refreshing = False
+        axes[0].callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    def show_range(self, start, end):
+        # Show start..end (epoch seconds)
+        self.refreshing = True
+        try:
+            self.axes[0].set_xlim(epoch_to_local_mdates([start, end]))
+        finally:
+            self.refreshing = False
+        self.refresh()
+
+    def time_range(self):
+        low, high = self.axes[0].get_xlim()
+        return local_mdate_to_epoch(low), local_mdate_to_epoch(high)
+
+    def on_xlim_changed(self, axis):
+        if not self.refreshing:
+            self.refresh_timer.stop()
+            self.refresh_timer.start()
+
+    def refresh(self):
+        start, end = self.time_range()
+        pixels = max(1, int(self.axes[0].bbox.width))
+        series = self.tiles.view(self.sensor_id, start, end, pixels)
+        self.points = 0
+        for i, (axis, line, data) in enumerate(zip(self.axes, self.lines, series)):
+            dates = epoch_to_local_mdates(data.times)
+            line.set_data(dates, data.mean)
+            if self.bands[i] is not None:
+                self.bands[i].remove()
+                self.bands[i] = None
+            if len(data) and not np.array_equal(data.low, data.high):
+                self.bands[i] = axis.fill_between(dates, data.low, data.high, color=self.COLORS[i], alpha=0.2,
+                                                  linewidth=0)
+            self.points += len(data)
+
+            # y range of the points in the shown time range
+            shown = (data.times >= start) & (data.times <= end)
+            if shown.any():
+                low, high = float(data.low[shown].min()), float(data.high[shown].max())
+                margin = max(0.5, (high - low) * 0.05)
+                axis.set_ylim(low - margin, high + margin)
+        self.axes[0].set_title("" if self.points else "No readings in this range")
+        self.canvas.draw_idle()
+        self.prefetch_timer.stop()
+        self.prefetch_timer.start()
+
+    def prefetch(self):
+        start, end = self.time_range()
+        self.tiles.prefetch(self.sensor_id, start, end, max(1, int(self.axes[0].bbox.width)))
@@ -0,0 +1,533 @@
+# -*- coding: utf-8 -*-
+# Author: Noorul Ghousiah Binti Noordeen Sahib (https://github.com/noorulghousiah)
+# this is the uplink part of the dht11 APP. Rows that go to google sheets are first saved in an
+# outbox table in the local database, then sent by a background thread, so the sensor loop on
+# the GUI never waits for the network and no row is lost when the network or the app goes down.
+
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+# Function to append many rows to a Google Sheets sheet with a single API call
+def append_rows_to_gsheet(service, spreadsheet_id, sheet_name, rows):
+    body = {
+        "values": rows
+    }
+
+    # Append all rows after the last used row in column A
+    return service.spreadsheets().values().append(
+        spreadsheetId=spreadsheet_id,
+        range=f"{sheet_name}!A:A",
+        valueInputOption="USER_ENTERED",
+        body=body
+    ).execute()
+
+
+# Function to get the last row number written by an append, from its response
+# (e.g. updatedRange "RawHistory!A1001:C1010" gives 1010), None if it is not in the response
+def last_appended_row(response):
+    try:
+        updated_range = response['updates']['updatedRange']
+    except (KeyError, TypeError):
+        return None
+    match = re.search(r'(\d+)$', updated_range.split('!')[-1])
+    return int(match.group(1)) if match else None
+
+
+# This class trims the oldest rows of a sheet (e.g. 'RawHistory') without reading the sheet.
+# The sheetId is fetched once, and the number of rows is kept up to date from the append
+# responses of the uplink, so a deleteDimension is only sent when the count goes over max_rows.
+class SheetTrimmer:
+    def __init__(self, service, spreadsheet_id, sheet_name, max_rows=200, extra_rows=20):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.max_rows = max_rows
+        self.extra_rows = extra_rows  # trim this many more rows so we don't trim on every append
+
+        self.sheet_id = None
+        self.row_count = None  # rows in the sheet including the header, None until the first append
+
+    def load_sheet_id(self):
+        # Get the sheetId of the sheet (only the sheet properties are requested)
+        try:
+            sheet_metadata = self.service.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                fields="sheets.properties(sheetId,title)"
+            ).execute()
+            for sheet in sheet_metadata.get('sheets', []):
+                if sheet['properties']['title'] == self.sheet_name:
+                    self.sheet_id = sheet['properties']['sheetId']
+                    break
+            else:
+                print(f"Sheet ID for '{self.sheet_name}' not found.")
+        except Exception as e:
+            print(f"Failed to get sheet ID for {self.sheet_name}: {str(e)}")
+        return self.sheet_id
+
+    def rows_appended(self, count, last_row=None):
+        # Update the row count after an append, then trim if needed.
+        # The last row number from the append response is exact, the count is only a fallback.
+        if last_row is not None:
+            self.row_count = last_row
+        elif self.row_count is not None:
+            self.row_count += count
+        self.trim()
+
+    def trim(self):
+        # If the number of rows exceeds the maximum, delete the oldest rows (keep the header)
+        if self.row_count is None or self.row_count <= self.max_rows:
+            return
+        if self.sheet_id is None and self.load_sheet_id() is None:
+            return
+
+        rows_to_delete = self.row_count - self.max_rows + self.extra_rows
+        print(f"Trimming {rows_to_delete} rows from {self.sheet_name} sheet")
+        batch_request = [{
+            "deleteDimension": {
+                "range": {
+                    "sheetId": self.sheet_id,
+                    "dimension": "ROWS",
+                    "startIndex": 1,  # Skip the header row
+                    "endIndex": 1 + rows_to_delete
+                }
+            }
+        }]
+        try:
+            self.service.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'requests': batch_request}
+            ).execute()
+        except Exception as e:
+            print(f"Failed to trim data from {self.sheet_name}: {str(e)}")
+            return
+        self.row_count -= rows_to_delete
+        print(f"Trimmed {rows_to_delete} rows from {self.sheet_name} sheet")
+
+
+# This class keeps the rows waiting for google sheets in the 'outbox' table of sensors.db.
+# Every row has an upload state:
+#   pending - saved locally, not sent yet
+#   sending - part of a batch that was handed to the Sheets API, result not known yet
+#   sent    - confirmed by the Sheets API
+# The rows given by claim() and in_flight() end with their outbox id. It is written to the sheet
+# as the row key (the column after the values), so a batch can be found in the sheet later.
+# Each thread gets its own sqlite connection, because sqlite connections can't be shared.
+class Outbox:
+    def __init__(self, db_path='sensors.db'):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.create_table()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        # Close the connection of the calling thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def create_table(self):
+        conn = self.connection()
+        # Same as SensorStore, in case the outbox is the first table of a new database
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sheet TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            batch_id INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created TEXT NOT NULL
+        )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, sheet, id)')
+        conn.commit()
+
+    def add(self, items, commit=True, conn=None):
+        # Save (sheet_name, values) rows as pending.
+        # A caller can pass its own connection to save the rows in its open transaction.
+        created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = conn or self.connection()
+        conn.executemany(
+            'INSERT INTO outbox (sheet, payload, created) VALUES (?, ?, ?)',
+            [(sheet_name, json.dumps(list(values)), created) for sheet_name, values in items]
+        )
+        if commit:
+            conn.commit()
+
+    def last_id(self):
+        row = self.connection().execute('SELECT MAX(id) FROM outbox').fetchone()
+        return row[0] or 0
+
+    def pending_count(self):
+        row = self.connection().execute("SELECT COUNT(*) FROM outbox WHERE state = 'pending'").fetchone()
+        return row[0]
+
+    def unsent_count(self):
+        # Rows not confirmed yet: pending ones and the ones of unsettled batches
+        row = self.connection().execute("SELECT COUNT(*) FROM outbox WHERE state IN ('pending', 'sending')").fetchone()
+        return row[0]
+
+    def pending_sheets(self, max_id=None):
+        # Names of the sheets that still have pending rows (up to max_id if given)
+        sql = "SELECT DISTINCT sheet FROM outbox WHERE state = 'pending'"
+        params = ()
+        if max_id is not None:
+            sql += " AND id <= ?"
+            params = (max_id,)
+        return [row[0] for row in self.connection().execute(sql, params)]
+
+    def claim(self, sheet_name, limit, max_id=None):
+        # Mark the oldest pending rows of a sheet as 'sending' and return (batch_id, rows)
+        conn = self.connection()
+        sql = "SELECT id, payload FROM outbox WHERE state = 'pending' AND sheet = ?"
+        params = [sheet_name]
+        if max_id is not None:
+            sql += " AND id <= ?"
+            params.append(max_id)
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            return None, []
+
+        # The batch id is the id of its first row, so it is unique and needs no extra query
+        batch_id = rows[0][0]
+        conn.execute(
+            "UPDATE outbox SET state = 'sending', batch_id = ?, attempts = attempts + 1 "
+            "WHERE state = 'pending' AND sheet = ? AND id BETWEEN ? AND ?",
+            (batch_id, sheet_name, rows[0][0], rows[-1][0])
+        )
+        conn.commit()
+        return batch_id, [json.loads(payload) + [row_id] for row_id, payload in rows]
+
+    def mark_sent(self, batch_id):
+        conn = self.connection()
+        conn.execute("UPDATE outbox SET state = 'sent' WHERE state = 'sending' AND batch_id = ?", (batch_id,))
+        conn.commit()
+
+    def release(self, batch_id):
+        # Put a batch back to pending (it was checked that it is not in the sheet)
+        conn = self.connection()
+        conn.execute("UPDATE outbox SET state = 'pending', batch_id = NULL WHERE state = 'sending' AND batch_id = ?",
+                     (batch_id,))
+        conn.commit()
+
+    def in_flight(self):
+        # Batches left in 'sending' state by a failed request or a crash, as {batch_id: (sheet_name, rows)}
+        batches = {}
+        for row_id, batch_id, sheet_name, payload in self.connection().execute(
+                "SELECT id, batch_id, sheet, payload FROM outbox WHERE state = 'sending' ORDER BY id"):
+            batches.setdefault(batch_id, (sheet_name, []))[1].append(json.loads(payload) + [row_id])
+        return batches
+
+    def prune_sent(self, keep=1000):
+        # Only keep the newest sent rows, older ones are already safe in the sheet
+        conn = self.connection()
+        conn.execute('''
+        DELETE FROM outbox WHERE state = 'sent' AND id <= (
+            SELECT id FROM outbox WHERE state = 'sent' ORDER BY id DESC LIMIT 1 OFFSET ?
+        )
+        ''', (keep,))
+        conn.commit()
+
+
+# This class sends the rows of the outbox to google sheets from a background thread.
+# Rows are grouped per sheet and sent as one multi-row append when enough rows are waiting
+# (batch_size) or when the oldest waiting row is older than flush_interval seconds.
+# When the network is down, the outbox keeps the rows and the worker tries again with
+# exponential backoff and jitter; when it comes back, the backlog is replayed max_batch rows
+# per request. A batch whose request failed stays in 'sending' state until recover() has found
+# out whether the sheet got it, and no newer row is sent before that.
+# service can be None with a connect() function that returns it: connect is then called in the
+# worker thread (and tried again with backoff until it works), so building the Sheets service
+# and setting up the sheets doesn't slow down the start of the app.
+# With a timer (scheduler.StageTimer), the time of each append request is recorded as 'uplink'.
+class UplinkWorker:
+    def __init__(self, service, spreadsheet_id, outbox, max_queue=1000, batch_size=50, flush_interval=15.0,
+                 max_batch=500, backoff_base=2.0, backoff_max=300.0, keep_sent=1000, after_flush=None,
+                 connect=None, timer=None):
+        self.service = service
+        self.connect = connect
+        self.spreadsheet_id = spreadsheet_id
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.keep_sent = keep_sent
+        self.timer = timer
+
+        # Optional callback, called in the worker thread with {sheet_name: rows_sent} after each flush
+        self.after_flush = after_flush
+
+        # Tasks (e.g. clear_sheet) that must run between two groups of rows, in order, as
+        # {(func, args): outbox id to wait for}. The same call queued again (e.g. a clear of
+        # Monitoring at each summary while offline) is kept once, with the latest outbox id.
+        # _task is the current one, as (func, args, outbox id); both are guarded by _lock
+        self.max_queue = max_queue
+        self.tasks = OrderedDict()
+        self._task = None
+
+        # Rows waiting in the outbox, counted here so the worker doesn't query it every loop
+        self.pending_count = 0
+        self.oldest_pending = None
+
+        # Backoff state after a failed flush or task (task_failures: failed runs of the current task)
+        self.failures = 0
+        self.task_failures = 0
+        self.retry_at = 0.0
+
+        # Simple counters to see how the uplink is doing
+        self.rows_sent = 0
+        self.requests_sent = 0
+
+        # Last row number written in each sheet, from the append responses
+        self.last_row = {}
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Start the worker thread if it is not running yet
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="uplink", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=30.0):
+        # Ask the worker to try one last flush and wait for it to finish.
+        # Rows that can't be sent stay in the outbox and are sent on the next start.
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, sheet_name, values):
+        # Save one row for a sheet, never waits on the network
+        self.submit_many([(sheet_name, values)])
+
+    def submit_many(self, items):
+        # Save several (sheet_name, values) rows at once (one sqlite commit)
+        self.outbox.add(items)
+        self.notify(len(items))
+
+    def notify(self, count):
+        # Tell the worker that count rows were added to the outbox by someone else
+        # (e.g. the storage layer, in the same transaction as the sensor readings)
+        with self._lock:
+            if self.pending_count == 0:
+                self.oldest_pending = time.monotonic()
+            self.pending_count += count
+        self._wake.set()
+
+    def backoff_delay(self, failures):
+        # Exponential backoff with full jitter, capped at backoff_max seconds
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** failures))
+
+    def submit_task(self, func, *args):
+        # Queue a call (e.g. clear_sheet) that must run after the rows saved before it are sent.
+        # If it raises, it is run again after the backoff delay (rows saved after it wait for it)
+        key = (func, args)
+        last_id = self.outbox.last_id()
+        with self._lock:
+            if self._task is not None and self._task[:2] == key:
+                # The same call is waiting to run: it runs once, after the rows saved until now
+                self._task = (func, args, last_id)
+            elif key in self.tasks or len(self.tasks) < self.max_queue:
+                self.tasks.pop(key, None)
+                self.tasks[key] = last_id
+            else:
+                print("Uplink task queue is full, task dropped.")
+        self._wake.set()
+
+    def _run(self):
+        # Connect to google sheets first (rows are kept in the outbox meanwhile)
+        failures = 0
+        while self.service is None and not self._stop_event.is_set():
+            try:
+                self.service = self.connect()
+            except Exception as e:
+                failures += 1
+                delay = self.backoff_delay(failures)
+                print(f"Failed to connect to google sheets, retrying in {delay:.1f} s: {str(e)}")
+                self._stop_event.wait(delay)
+        if self.service is None:
+            self.outbox.close()
+            return
+
+        # Rows left over from the last run (and unsettled batches) are due right away
+        with self._lock:
+            self.pending_count = self.outbox.unsent_count()
+            self.oldest_pending = time.monotonic() - self.flush_interval if self.pending_count else None
+
+        while True:
+            stopping = self._stop_event.is_set()
+            with self._lock:
+                if self._task is None and self.tasks:
+                    (func, args), last_id = self.tasks.popitem(last=False)
+                    self._task = (func, args, last_id)
+                count = self.pending_count
+                oldest = self.oldest_pending
+            due = count >= self.batch_size or self._task is not None or stopping or \
+                (oldest is not None and time.monotonic() - oldest >= self.flush_interval)
+
+            if due and (stopping or time.monotonic() >= self.retry_at):
+                self.flush()
+                if self._task is not None and self.failures == 0:
+                    # Rows queued before the task have been sent, now the task can run
+                    if self.run_task():
+                        continue
+
+            if stopping:
+                break
+
+            # Sleep until a row arrives, a flush is due or the backoff delay is over
+            wait = self.flush_interval
+            if oldest is not None:
+                wait = oldest + self.flush_interval - time.monotonic()
+            if self.failures:
+                wait = self.retry_at - time.monotonic()
+            self._wake.wait(max(0.05, wait))
+            self._wake.clear()
+
+        self.outbox.close()
+
+    def run_task(self):
+        # Run the current task, True if it worked. A failed task is kept and run again after the
+        # backoff delay; it has its own failure count, as the flushes before it keep working
+        with self._lock:
+            func, args, last_id = self._task
+        try:
+            func(*args)
+        except Exception as e:
+            self.task_failures += 1
+            self.failures = max(self.failures, 1)
+            delay = self.backoff_delay(self.task_failures)
+            self.retry_at = time.monotonic() + delay
+            print(f"Uplink task failed, retrying in {delay:.1f} s: {str(e)}")
+            return False
+        self.task_failures = 0
+        with self._lock:
+            # Queued again while it ran: it runs once more, after the rows saved since
+            if self._task[2] == last_id:
+                self._task = None
+        return True
+
+    def flush(self):
+        # Send the pending rows, max_batch rows per request and sheet.
+        # If a task is waiting, only the rows saved before it are sent now. Otherwise only the rows
+        # saved before the flush started: with fast sensors new rows arrive during each request,
+        # and the flush would never end (nor the RawHistory trim that runs after it).
+        max_id = self._task[2] if self._task is not None else self.outbox.last_id()
+        sent = {}
+        try:
+            # Settle the batches of a failed request first, so their rows are not sent twice
+            self.recover()
+            for sheet_name in self.outbox.pending_sheets(max_id):
+                while True:
+                    batch_id, rows = self.outbox.claim(sheet_name, self.max_batch, max_id)
+                    if not rows:
+                        break
+                    started = time.perf_counter()
+                    # If the request fails, the sheet may still have got the rows (e.g. a timeout
+                    # after the append was done), so the batch stays in 'sending' for recover()
+                    response = append_rows_to_gsheet(self.service, self.spreadsheet_id, sheet_name, rows)
+                    if self.timer is not None:
+                        self.timer.record('uplink', (time.perf_counter() - started) * 1000.0)
+                    self.outbox.mark_sent(batch_id)
+                    self.last_row[sheet_name] = last_appended_row(response)
+                    print(f"{len(rows)} rows logged to sheet: {sheet_name}")
+                    self.rows_sent += len(rows)
+                    self.requests_sent += 1
+                    sent[sheet_name] = sent.get(sheet_name, 0) + len(rows)
+                    with self._lock:
+                        self.pending_count = max(0, self.pending_count - len(rows))
+        except Exception as e:
+            self.failures += 1
+            delay = self.backoff_delay(self.failures)
+            self.retry_at = time.monotonic() + delay
+            print(f"Failed to log data, retrying in {delay:.1f} s: {str(e)}")
+        else:
+            self.failures = 0
+            self.retry_at = 0.0
+            if self._task is None:
+                # Rows saved while flushing start a new flush window
+                with self._lock:
+                    self.pending_count = self.outbox.unsent_count()
+                    self.oldest_pending = time.monotonic() if self.pending_count else None
+            if sent:
+                self.outbox.prune_sent(self.keep_sent)
+
+        if sent and self.after_flush is not None:
+            try:
+                self.after_flush(sent)
+            except Exception as e:
+                print(f"Uplink after_flush failed: {str(e)}")
+        return sent
+
+    def recover(self):
+        # A failed request or a crash between the append and mark_sent leaves a batch in 'sending'
+        # state. Appends are all-or-nothing and each row carries its outbox id as the row key, so
+        # the batch is in the sheet only if its keys are in the key column. No newer row was sent
+        # after it, so only the last rows of the sheet are read. Errors are raised: the batch stays
+        # in 'sending' and flush() tries again after the backoff delay.
+        for batch_id, (sheet_name, rows) in self.outbox.in_flight().items():
+            key_column = chr(ord("A") + len(rows[0]) - 1)
+            keys = {str(row[0]) for row in self.read_tail(sheet_name, key_column, len(rows) + 50) if row}
+
+            # Any key is enough (the oldest rows of the batch may have been trimmed since)
+            if any(str(row[-1]) in keys for row in rows):
+                self.outbox.mark_sent(batch_id)
+                print(f"Unfinished batch of {len(rows)} rows already in sheet: {sheet_name}")
+            else:
+                self.outbox.release(batch_id)
+                print(f"Unfinished batch of {len(rows)} rows will be sent again to sheet: {sheet_name}")
+
+    def read_tail(self, sheet_name, column, count, block_rows=1000):
+        # The values of the last `count` rows with data in a column of a sheet (without the header
+        # row). The grid can have empty rows after the data (a new sheet has 1000 rows), so it is
+        # read backwards from its last row, block_rows rows per request, until a row has data.
+        sheet_metadata = self.service.spreadsheets().get(
+            spreadsheetId=self.spreadsheet_id,
+            fields="sheets.properties(title,gridProperties.rowCount)"
+        ).execute()
+        end = next(sheet['properties']['gridProperties']['rowCount'] for sheet in sheet_metadata['sheets']
+                   if sheet['properties']['title'] == sheet_name)
+        block_rows = max(block_rows, count)
+        while end >= 2:
+            start = max(2, end - block_rows + 1)
+            values = self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{sheet_name}!{column}{start}:{column}{end}"
+            ).execute().get('values', [])
+            if values:
+                # Empty rows at the end of the range are left out, so the data ends at last_row
+                last_row = start + len(values) - 1
+                first_row = max(2, last_row - count + 1)
+                if first_row >= start:
+                    return values[first_row - start:]
+                # The last rows start in the block before (only if count > the rows read here)
+                return self.service.spreadsheets().values().get(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=f"{sheet_name}!{column}{first_row}:{column}{last_row}"
+                ).execute().get('values', [])
+            end = start - 1
+        return []